@@ -14,43 +14,81 @@ from routes.context import context_bp
 from ocr import ocr_bp
 from routes.claim import claim_bp
 from routes.dashboard import dashboard_bp
-from database import init_db, shutdown_session
+from routes.cohort import cohort_bp
+from routes.onboarding import onboarding_bp
+from routes.storage import storage_bp
+from routes.metrics import metrics_bp
+from database import init_db
+from health_tips import prewarm_health_tips_command
+from cohort_store import refresh_cohort_store_command
+from risk_engine import score_risk_command
+from pricing import install_reload_signal
+from plan_renewal import renew_plans_command
+from prescription_index import index_prescriptions_command
+from request_metrics import init_request_metrics
+from sharding import route_request_to_shard, rebalance_shards_command, move_user_command
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)
-
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize database and migration
-init_db(app)  # This should call db.init_app(app) internally
-migrate = Migrate(app, db)
-
-# Register blueprints
-app.register_blueprint(auth_bp)
-app.register_blueprint(profile_bp)
-app.register_blueprint(health_bp)
-app.register_blueprint(lifestyle_bp)
-app.register_blueprint(prescription_bp)
-app.register_blueprint(context_bp)
-app.register_blueprint(insurance_bp, url_prefix='/insurance')
-app.register_blueprint(ocr_bp, url_prefix='/ocr')
-app.register_blueprint(claim_bp, url_prefix='/claim')
-app.register_blueprint(dashboard_bp)
-
-@app.route('/')
-def home():
-    return jsonify(message="API Working"), 200
-
-# Cleanup database sessions after each request
-@app.teardown_appcontext
-def shutdown_session_on_teardown(exception=None):
-    shutdown_session(exception)
+migrate = Migrate()
+
+def create_app(config=None):
+    # Initialize Flask app
+    app = Flask(__name__)
+    CORS(app)
+
+    # Configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Schema changes normally come from 'flask db upgrade' (see migrations/); this is for throwaway databases
+    app.config['DB_CREATE_ALL'] = os.getenv('DB_CREATE_ALL', '').lower() in ('1', 'true', 'yes')
+    if config:
+        app.config.update(config)
+
+    # Initialize database and migration
+    init_db(app)  # This should call db.init_app(app) internally
+    migrate.init_app(app, db)
+    # Server-Timing headers and /metrics histograms; registered first so they cover the other hooks
+    init_request_metrics(app)
+    # Point db.session at the shard of the user each request is about
+    app.before_request(route_request_to_shard)
+
+    # Register blueprints
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(profile_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(lifestyle_bp)
+    app.register_blueprint(onboarding_bp)
+    app.register_blueprint(prescription_bp)
+    app.register_blueprint(context_bp)
+    app.register_blueprint(insurance_bp, url_prefix='/insurance')
+    app.register_blueprint(ocr_bp, url_prefix='/ocr')
+    app.register_blueprint(claim_bp, url_prefix='/claim')
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(cohort_bp, url_prefix='/cohort')
+    app.register_blueprint(storage_bp, url_prefix='/storage')
+    app.register_blueprint(metrics_bp, url_prefix='/metrics')
+
+    # Reload pricing tables from config.yml on SIGHUP as well as on file change
+    install_reload_signal()
+
+    # CLI commands
+    app.cli.add_command(prewarm_health_tips_command)
+    app.cli.add_command(refresh_cohort_store_command)
+    app.cli.add_command(score_risk_command)
+    app.cli.add_command(renew_plans_command)
+    app.cli.add_command(index_prescriptions_command)
+    app.cli.add_command(rebalance_shards_command)
+    app.cli.add_command(move_user_command)
+
+    @app.route('/')
+    def home():
+        return jsonify(message="API Working"), 200
+
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', debug=True)
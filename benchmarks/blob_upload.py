@@ -0,0 +1,56 @@
+"""Upload latency and throughput against Azure Blob Storage or a local Azurite.
+
+Defaults to Azurite's well-known development account, e.g. started with
+`docker run -p 10000:10000 mcr.microsoft.com/azure-storage/azurite azurite-blob --blobHost 0.0.0.0`.
+Compares a fresh client per upload (the old behaviour) with the pooled client.
+
+Usage: python benchmarks/blob_upload.py [uploads]
+"""
+import io
+import os
+import sys
+import time
+
+AZURITE_CONNECTION_STR = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+os.environ.setdefault('AZURE_CONNECTION_STR', AZURITE_CONNECTION_STR)
+from common import ROOT  # noqa: F401  puts the repo on sys.path
+
+SIZES = [('100 KB', 100 * 1024), ('2 MB', 2 * 1024 * 1024), ('32 MB', 32 * 1024 * 1024)]
+
+def upload_unpooled(name, data):
+    from azure.storage.blob import BlobServiceClient
+    from blob_storage import STORAGE_CONTAINER
+
+    client = BlobServiceClient.from_connection_string(conn_str=os.environ['AZURE_CONNECTION_STR'])
+    client.get_container_client(container=STORAGE_CONTAINER).upload_blob(name=name, data=data, overwrite=True)
+
+def upload_pooled(name, data):
+    from blob_storage import upload_stream
+
+    upload_stream(name, data)
+
+def main():
+    uploads = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    from blob_storage import get_container_client, upload_metrics
+
+    container = get_container_client()
+    if not container.exists():
+        container.create_container()
+
+    for label, size in SIZES:
+        payload = os.urandom(size)
+        for mode, upload in (("new client", upload_unpooled), ("pooled", upload_pooled)):
+            start = time.perf_counter()
+            for index in range(uploads):
+                upload(f"bench/{label.replace(' ', '')}-{index}.bin", io.BytesIO(payload))
+            elapsed = time.perf_counter() - start
+            rate = size * uploads / elapsed / (1024 * 1024)
+            print(f"{label:>7} {mode:<10} {elapsed / uploads * 1000:>8.1f} ms/upload  {rate:>7.1f} MB/s")
+    print(upload_metrics.snapshot())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Benchmarks the columnar cohort store on synthetic MLModelData at population scale.
+
+Usage: python benchmarks/cohort_store.py [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+os.environ['COHORT_STORE_DIR'] = tempfile.mkdtemp()
+import common  # noqa: F401  (puts the repo root on sys.path)
+import cohort_store
+
+def synthetic_columns(rows, rng):
+    return {
+        'user_id': np.arange(1, rows + 1, dtype=np.int64),
+        'model_data_id': np.arange(1, rows + 1, dtype=np.int64),
+        'age': rng.integers(18, 90, rows).astype(np.int16),
+        'gender': rng.integers(0, 2, rows).astype(np.int8),
+        'bmi': rng.normal(25, 4, rows).astype(np.float32),
+        'systolic_bp': rng.normal(125, 15, rows).astype(np.float32),
+        'diastolic_bp': rng.normal(80, 10, rows).astype(np.float32),
+        'cholesterol_total': rng.normal(200, 35, rows).astype(np.float32),
+        'hba1c': rng.normal(5.6, 0.8, rows).astype(np.float32),
+    }
+
+def timed(label, func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label}: {elapsed * 1000:.2f} ms")
+    return result
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    rng = np.random.default_rng(7)
+    columns = synthetic_columns(rows, rng)
+    print(f"rows: {rows}")
+
+    timed("write snapshot", lambda: cohort_store.write_snapshot(columns, {cohort_store.DEFAULT_SOURCE: rows}))
+    snapshot = timed("map snapshot", cohort_store.get_cohort_snapshot)
+    timed("vectorized health scoring (all rows)", lambda: cohort_store.health_percentages(snapshot.columns), repeat=5)
+    timed("population health distribution", cohort_store.health_distribution, repeat=5)
+    timed("cohort health distribution (40-49, Female)", lambda: cohort_store.health_distribution(40, 'Female'), repeat=5)
+    timed("first member percentile (builds sorted indexes)", lambda: cohort_store.member_percentiles(1))
+    user_ids = rng.integers(1, rows + 1, 1000)
+    timed("member percentiles, per lookup (1000 users)", lambda: [cohort_store.member_percentiles(int(u)) for u in user_ids])
+
+if __name__ == '__main__':
+    main()
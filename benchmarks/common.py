@@ -0,0 +1,38 @@
+"""Shared helpers for the benchmark scripts: a throwaway SQLite app and a query counter."""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def make_app(database_uri=None, config=None):
+    # The env var must be set before app is imported, since app.py builds an app at import
+    if database_uri is None:
+        database_uri = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    from app import create_app
+    from models import db
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri, **(config or {})})
+    with app.app_context():
+        db.create_all()
+    return app
+
+@contextmanager
+def count_queries(engine):
+    """Counts the statements executed on engine inside the with block."""
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
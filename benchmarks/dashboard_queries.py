@@ -0,0 +1,59 @@
+"""Measures dashboard query count and latency for a user with thousands of claims.
+
+Usage: python benchmarks/dashboard_queries.py [claims]
+"""
+import sys
+import time
+from datetime import date, timedelta
+from common import make_app, count_queries
+
+def seed(db, claims_count):
+    from models import User, UserProfile, LifestyleInformation, MLModelData, ClaimStatus, InsurancePlans, Prescription
+
+    user = User(email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(UserProfile(user_id=user.user_id, full_name='Bench', age=42, gender='Male', height=175, weight=72, annual_income=900000))
+    db.session.add(LifestyleInformation(user_id=user.user_id, smoking_status='Never', alcohol_consumption='Light', physical_activity='Moderate', stress_level='Low', sleep_hours=7))
+    db.session.add(MLModelData(user_id=user.user_id, Age=42, Gender='Male', BMI=23.5))
+    decisions = ['Claim Approved', 'Claim in review', 'Claim Cancelled']
+    db.session.bulk_insert_mappings(ClaimStatus, [
+        {'user_id': user.user_id, 'decision': decisions[i % 3], 'reason': 'bench', 'bill_name': f'bill_{i}.pdf'}
+        for i in range(claims_count)
+    ])
+    db.session.bulk_insert_mappings(InsurancePlans, [
+        {'user_id': user.user_id, 'company': 'Bench', 'expiration_date': date.today() + timedelta(days=i)}
+        for i in range(50)
+    ])
+    db.session.bulk_insert_mappings(Prescription, [
+        {'user_id': user.user_id, 'clinic_name': 'Clinic', 'filename': f'rx_{i}.pdf', 'description': 'bench',
+         'date': date.today() - timedelta(days=i), 'file_link': 'x'}
+        for i in range(500)
+    ])
+    db.session.commit()
+    return user.user_id
+
+def main():
+    claims_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    app = make_app()
+    from models import db
+    from routes.dashboard import load_dashboard_summary
+    from user_context import _fetch_user_context
+
+    with app.app_context():
+        user_id = seed(db, claims_count)
+        timings = []
+        for _ in range(50):
+            with count_queries(db.engine) as statements:
+                start = time.perf_counter()
+                _fetch_user_context(user_id)
+                summary = load_dashboard_summary(user_id)
+                timings.append(time.perf_counter() - start)
+            db.session.expunge_all()
+        timings.sort()
+        print(f"claims: {claims_count}, summary: {tuple(summary)}")
+        print(f"queries per dashboard: {len(statements)}")
+        print(f"latency: median {timings[len(timings) // 2] * 1000:.2f} ms, p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms")
+
+if __name__ == '__main__':
+    main()
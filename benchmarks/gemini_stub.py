@@ -0,0 +1,117 @@
+"""A local stand-in for the Gemini REST API that injects latency and failures.
+
+Point the app at it with GEMINI_API_ENDPOINT=http://127.0.0.1:8089 (any
+GEMINI_API_KEY works). Behaviour can be changed while it runs:
+
+    curl -X POST 127.0.0.1:8089/stub -d '{"latency": 2, "failure_rate": 0.5}'
+
+Usage: python benchmarks/gemini_stub.py [--port 8089] [--latency S] [--jitter S]
+       [--failure-rate F] [--failure-status 503]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubSettings:
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0, failure_status=503, reply="Stay hydrated."):
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.reply = reply
+        self.requests = 0
+        self.failures = 0
+
+    def update(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                if name in ('latency', 'jitter', 'failure_rate', 'failure_status', 'reply'):
+                    setattr(self, name, value)
+
+    def next_outcome(self):
+        with self._lock:
+            self.requests += 1
+            fail = random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+            return self.latency + random.uniform(0, self.jitter), self.failure_status if fail else None
+
+    def as_dict(self):
+        with self._lock:
+            return {name: getattr(self, name) for name in (
+                'latency', 'jitter', 'failure_rate', 'failure_status', 'requests', 'failures'
+            )}
+
+def make_handler(settings):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._send(200, settings.as_dict())
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.path == '/stub':
+                settings.update(**json.loads(body or b'{}'))
+                self._send(200, settings.as_dict())
+                return
+            if ':generateContent' not in self.path:
+                self._send(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+                return
+            delay, failure_status = settings.next_outcome()
+            time.sleep(delay)
+            if failure_status:
+                self._send(failure_status, {'error': {'code': failure_status, 'message': 'Injected failure', 'status': 'UNAVAILABLE'}})
+                return
+            self._send(200, {
+                'candidates': [{
+                    'content': {'parts': [{'text': settings.reply}], 'role': 'model'},
+                    'finishReason': 'STOP',
+                    'index': 0
+                }],
+                'usageMetadata': {'promptTokenCount': len(body) // 4, 'candidatesTokenCount': 4, 'totalTokenCount': len(body) // 4 + 4}
+            })
+
+    return Handler
+
+def start_stub(port=0, **settings):
+    """Starts the stub in a daemon thread; returns (server, settings). Port 0 picks a free port."""
+    stub_settings = StubSettings(**settings)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(stub_settings))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stub_settings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--failure-status', type=int, default=503)
+    args = parser.parse_args()
+    server, _ = start_stub(args.port, latency=args.latency, jitter=args.jitter,
+                           failure_rate=args.failure_rate, failure_status=args.failure_status)
+    print(f"Gemini stub listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Simulates a login spike and measures its effect on other endpoints.
+
+Runs the spike twice: with bcrypt on the request threads (BCRYPT_WORKERS=0)
+and with the process pool. Reports login throughput and the p50/p99 latency
+of a cheap endpoint served alongside the logins.
+
+Usage: python benchmarks/login_spike.py [logins] [threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+from common import make_app
+
+PASSWORD = 'spike-password'
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def register_users(client, count):
+    for index in range(count):
+        client.post('/register', json={'email': f'spike{index}@example.com', 'password': PASSWORD})
+
+def run_spike(app, logins, threads, users):
+    done = threading.Event()
+    latencies = []
+
+    def probe():
+        client = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            client.get('/')
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    def login(index):
+        client = app.test_client()
+        response = client.post('/login', json={'email': f'spike{index % users}@example.com', 'password': PASSWORD})
+        return response.status_code
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        statuses = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+    failed = sum(status != 200 for status in statuses)
+    return logins / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), failed
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    users = min(logins, 20)
+    app = make_app()
+    import passwords
+    from clients import reset_client
+
+    pool_workers = passwords.POOL_WORKERS or os.cpu_count() or 1
+    register_users(app.test_client(), users)
+    print(f"{logins} logins on {threads} threads, bcrypt cost {passwords.BCRYPT_ROUNDS}")
+    for label, workers in (("inline", 0), (f"pool ({pool_workers})", pool_workers)):
+        passwords.POOL_WORKERS = workers
+        reset_client('bcrypt_pool')
+        rate, p50, p99, failed = run_spike(app, logins, threads, users)
+        print(f"{label:<12} {rate:>7.1f} logins/s  other p50 {p50 * 1000:>7.1f} ms  p99 {p99 * 1000:>7.1f} ms  failed {failed}")
+
+if __name__ == '__main__':
+    main()
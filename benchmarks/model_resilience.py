@@ -0,0 +1,70 @@
+"""Drives the Gemini client layer against the local stub through healthy, slow, flaky and
+down phases, while timing an endpoint that never calls the model.
+
+Shows that calls stop at their deadline, that transient failures are retried,
+that the breaker fails fast during an outage and recovers after it, and that
+a model outage no longer stalls the rest of the API.
+
+Usage: python benchmarks/model_resilience.py [calls_per_phase]
+"""
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini_stub import start_stub
+
+server, stub = start_stub()
+os.environ['GEMINI_API_ENDPOINT'] = f"http://127.0.0.1:{server.server_address[1]}"
+os.environ['GEMINI_API_KEY'] = 'stub'
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ.setdefault('GEMINI_DEADLINE', '1.5')
+os.environ.setdefault('GEMINI_BREAKER_RESET_SECONDS', '2')
+os.environ.setdefault('GEMINI_RETRY_BASE_DELAY', '0.1')
+from common import make_app
+
+PHASES = (
+    ('healthy', {'latency': 0.05, 'failure_rate': 0.0}),
+    ('slow', {'latency': 3.0, 'failure_rate': 0.0}),
+    ('flaky', {'latency': 0.05, 'failure_rate': 0.3}),
+    ('down', {'latency': 0.05, 'failure_rate': 1.0}),
+    ('recovered', {'latency': 0.05, 'failure_rate': 0.0}),
+)
+
+def call(generate_content, ModelUnavailable):
+    start = time.perf_counter()
+    try:
+        generate_content("Give me a health tip.")
+        outcome = 'ok'
+    except ModelUnavailable:
+        outcome = 'unavailable'
+    return outcome, time.perf_counter() - start
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    app = make_app()
+    from model_client import generate_content, ModelUnavailable, model_metrics, BREAKER_RESET_SECONDS
+
+    client = app.test_client()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        for name, settings in PHASES:
+            if name == 'recovered':
+                time.sleep(BREAKER_RESET_SECONDS)
+            stub.update(**settings)
+            futures = [pool.submit(call, generate_content, ModelUnavailable) for _ in range(calls)]
+            # The rest of the API must stay fast while model calls are stuck
+            start = time.perf_counter()
+            for _ in range(50):
+                client.get('/')
+            other_ms = (time.perf_counter() - start) * 1000 / 50
+            results = [future.result() for future in futures]
+            ok = sum(1 for outcome, _ in results if outcome == 'ok')
+            slowest = max(seconds for _, seconds in results)
+            snapshot = model_metrics.snapshot()
+            print(f"{name:<10} ok {ok:>3}/{calls}  slowest call {slowest:>5.2f}s  other endpoint {other_ms:>5.2f} ms  "
+                  f"breaker {snapshot['breaker_state']:<9} retries {snapshot['retries']:>3}  rejected {snapshot['rejected_open']:>3}")
+    print(model_metrics.snapshot())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Compares onboarding throughput: one /onboarding call vs the three per-section calls.
+
+Gemini is not called and each user is onboarded once per path.
+
+Usage: python benchmarks/onboarding.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ.pop('GEMINI_API_KEY', None)
+from common import make_app, count_queries
+
+PROFILE = {
+    'full_name': 'Bench User', 'dob': '1985-06-15', 'age': 40, 'gender': 'Male', 'phone_number': '9999999999',
+    'district': 'Pune', 'state': 'Maharashtra', 'occupation': 'Engineer', 'annual_income': 1200000,
+    'height': 175, 'weight': 72
+}
+HEALTH = {'medical_history': 'No major issues', 'allergies': 'None', 'family_medical_history': 'None', 'current_medications': 'None'}
+LIFESTYLE = {
+    'smoking_status': 'Never', 'alcohol_consumption': 'Light', 'physical_activity': 'Moderate', 'family_history_CVD': False,
+    'family_history_diabetes': False, 'family_history_cancer': False, 'stress_level': 'Low', 'sleep_hours': 7
+}
+
+def create_users(db, count, prefix):
+    from models import User
+
+    users = [User(email=f'{prefix}{index}@example.com', password_hash='x') for index in range(count)]
+    db.session.add_all(users)
+    db.session.commit()
+    return [user.user_id for user in users]
+
+def onboard_separately(client, user_id):
+    client.post('/user-profile', json=dict(PROFILE, user_id=user_id))
+    client.post('/health-information', json=dict(HEALTH, user_id=user_id))
+    client.post('/lifestyle-information', json=dict(LIFESTYLE, user_id=user_id))
+
+def onboard_combined(client, user_id):
+    client.post('/onboarding', json={'user_id': user_id, 'profile': PROFILE, 'health': HEALTH, 'lifestyle': LIFESTYLE})
+
+def run(label, client, engine, user_ids, onboard):
+    with count_queries(engine) as statements:
+        start = time.perf_counter()
+        for user_id in user_ids:
+            onboard(client, user_id)
+        elapsed = time.perf_counter() - start
+    print(f"{label:<12} {len(user_ids) / elapsed:>8.0f} users/s  {len(statements) / len(user_ids):>5.1f} queries/user")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app = make_app()
+    from models import db
+
+    with app.app_context():
+        separate_ids = create_users(db, count, 'separate')
+        combined_ids = create_users(db, count, 'combined')
+        engine = db.engine
+    client = app.test_client()
+
+    run("three calls", client, engine, separate_ids, onboard_separately)
+    run("onboarding", client, engine, combined_ids, onboard_combined)
+
+if __name__ == '__main__':
+    main()
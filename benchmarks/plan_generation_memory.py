@@ -0,0 +1,43 @@
+"""Checks that memory stays flat across many insurance plan generations.
+
+Usage: python benchmarks/plan_generation_memory.py [plans]
+"""
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+import common  # noqa: F401  (puts the repo root on sys.path)
+from routes.insurance import InsurancePlanGenerator
+
+def sample_inputs():
+    user_profile = SimpleNamespace(age=52, annual_income=1200000)
+    health_info = SimpleNamespace(medical_history="Hypertension")
+    lifestyle_info = SimpleNamespace(smoking_status="Former", alcohol_consumption="Light")
+    ml_model_data = SimpleNamespace(BMI=27.1, Systolic_BP=138, Diastolic_BP=88)
+    risk_predictions = [
+        SimpleNamespace(condition_name='Heart_Disease_Risk', risk_level='High'),
+        SimpleNamespace(condition_name='Diabetes', risk_level='Medium'),
+        SimpleNamespace(condition_name='Cancer_Risk', risk_level='Low'),
+    ]
+    return user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions
+
+def main():
+    plans = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    inputs = sample_inputs()
+    generator = InsurancePlanGenerator()
+    generator.generate_plan(*inputs)
+
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    for index in range(1, plans + 1):
+        plan = InsurancePlanGenerator().generate_plan(*inputs)
+        if index % (plans // 5 or 1) == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{index:>8} plans: traced {current / 1024:.1f} KiB, coverage items {len(plan['coverage_details'])}")
+    elapsed = time.perf_counter() - start
+    growth = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    print(f"{plans / elapsed:,.0f} plans/s, net growth {growth / 1024:.1f} KiB")
+
+if __name__ == '__main__':
+    main()
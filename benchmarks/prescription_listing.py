@@ -0,0 +1,79 @@
+"""Latency of /get_prescriptions for a user with many prescriptions.
+
+Walks every page at the maximum page size, so each run signs every link.
+
+Links are signed locally, so no storage account or network is needed; the
+Azurite development account only provides a signing key.
+
+Usage: python benchmarks/prescription_listing.py [prescriptions]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+from blob_upload import AZURITE_CONNECTION_STR
+os.environ.setdefault('AZURE_CONNECTION_STR', AZURITE_CONNECTION_STR)
+from common import make_app
+
+def seed(db, count):
+    from models import User, Prescription
+
+    user = User(email='listing@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.bulk_insert_mappings(Prescription, [
+        {
+            'user_id': user.user_id, 'clinic_name': 'City Clinic', 'filename': f'scan-{index}.pdf',
+            'description': 'Follow-up', 'date': date(2024, 1, 1), 'file_link': f'scan-{index}.pdf'
+        }
+        for index in range(count)
+    ])
+    db.session.commit()
+    return user.user_id
+
+def timed(client, path):
+    start = time.perf_counter()
+    response = client.get(path)
+    return (time.perf_counter() - start) * 1000, response
+
+def walk_pages(client, path):
+    # Returns (ms, bytes, responses) for reading the whole listing
+    total_ms, size, responses = 0.0, 0, []
+    cursor = None
+    while True:
+        elapsed, response = timed(client, f"{path}&cursor={cursor}" if cursor else path)
+        total_ms += elapsed
+        size += len(response.get_data())
+        responses.append(response)
+        cursor = response.get_json()['next_cursor']
+        if not cursor:
+            return total_ms, size, responses
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    app = make_app()
+    from models import db
+    from response_cache import invalidate_user
+
+    with app.app_context():
+        user_id = seed(db, count)
+    client = app.test_client()
+    path = f'/get_prescriptions/{user_id}?limit=200'
+
+    cold, size, responses = walk_pages(client, path)
+    print(f"{count} prescriptions, {len(responses)} pages, {size} bytes")
+    print(f"cold signing cache   {cold:>8.1f} ms")
+    invalidate_user(user_id)
+    warm, _, _ = walk_pages(client, path)
+    print(f"warm signing cache   {warm:>8.1f} ms")
+    cached, _, responses = walk_pages(client, path)
+    print(f"cached responses     {cached:>8.1f} ms")
+    start = time.perf_counter()
+    response = client.get(path, headers={'If-None-Match': responses[0].headers['ETag']})
+    print(f"conditional ({response.status_code})    {(time.perf_counter() - start) * 1000:>8.1f} ms  (first page)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Prescription listing and search latency with a large Prescriptions table.
+
+Seeds `rows` prescriptions (default one million) across many users on SQLite,
+so search goes through the PrescriptionTerms inverted index. Point
+SQLALCHEMY_DATABASE_URI at a MySQL database to measure the FULLTEXT path.
+
+Usage: python benchmarks/prescription_search.py [rows] [users]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ.setdefault('STORAGE_BACKEND', 'local')
+os.environ.setdefault('STORAGE_SIGNING_KEY', 'benchmark-signing-key')
+from common import make_app
+
+CLINICS = ['City Clinic', 'Apollo Hospital', 'Sunrise Diagnostics', 'Green Valley Medical', 'Lotus Eye Care']
+WORDS = [
+    'fever', 'cough', 'diabetes', 'insulin', 'hypertension', 'cholesterol', 'statin', 'antibiotic',
+    'follow', 'review', 'thyroid', 'vitamin', 'asthma', 'inhaler', 'migraine', 'allergy', 'dermatitis',
+    'fracture', 'physiotherapy', 'cardiology', 'dosage', 'tablet', 'syrup', 'injection', 'monthly'
+]
+SEED_CHUNK = 20000
+
+def seed(db, rows, users):
+    from sqlalchemy import insert
+    from models import User, Prescription
+    from prescription_index import reindex_prescriptions
+
+    rng = random.Random(7)
+    db.session.execute(insert(User), [{'email': f'search{index}@example.com', 'password_hash': 'x'} for index in range(users)])
+    user_ids = [user_id for (user_id,) in db.session.query(User.user_id)]
+    start_date = date(2015, 1, 1)
+    for offset in range(0, rows, SEED_CHUNK):
+        db.session.execute(insert(Prescription), [
+            {
+                'user_id': rng.choice(user_ids), 'clinic_name': rng.choice(CLINICS), 'filename': 'scan.pdf',
+                'description': ' '.join(rng.choices(WORDS, k=12)),
+                'date': start_date + timedelta(days=rng.randrange(3650)), 'file_link': 'bench/scan.pdf'
+            }
+            for _ in range(min(SEED_CHUNK, rows - offset))
+        ])
+        db.session.commit()
+    reindex_prescriptions()
+    # The busiest user, so pages and searches have real work to do
+    return db.session.query(Prescription.user_id).group_by(Prescription.user_id).order_by(
+        db.func.count().desc()
+    ).limit(1).scalar()
+
+def measure(client, user_id, label, path, repeat=20):
+    from response_cache import invalidate_user
+
+    timings = []
+    for _ in range(repeat):
+        # Skip the response cache so every run hits the database
+        invalidate_user(user_id)
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    body = response.get_json()
+    print(f"{label:<26} p50 {timings[len(timings) // 2]:>7.1f} ms  p99 {timings[-1]:>7.1f} ms  "
+          f"{len(body['prescriptions'])} rows")
+    return body
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    app = make_app()
+    from models import db, Prescription
+
+    start = time.perf_counter()
+    with app.app_context():
+        user_id = seed(db, rows, users)
+        owned = Prescription.query.filter_by(user_id=user_id).count()
+    print(f"Seeded {rows} prescriptions in {time.perf_counter() - start:.1f}s; user {user_id} has {owned}")
+
+    client = app.test_client()
+    base = f'/get_prescriptions/{user_id}'
+    first = measure(client, user_id, "first page", f"{base}?limit=50")
+    cursor = first['next_cursor']
+    for _ in range(20):
+        page = client.get(f"{base}?limit=200&cursor={cursor}").get_json()
+        cursor = page['next_cursor'] or cursor
+    measure(client, user_id, "page ~21 (keyset)", f"{base}?limit=50&cursor={cursor}")
+    measure(client, user_id, "full view", f"{base}?limit=50&view=full")
+    measure(client, user_id, "search: one word", f"{base}?limit=50&q=insulin")
+    measure(client, user_id, "search: three words", f"{base}?limit=50&q=insulin+thyroid+apollo")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Shows reads moving between a primary and a replica, using two SQLite files.
+
+The replica is a copy of the primary taken after seeding and never updated,
+so it behaves like a replica with unbounded lag: a read that returns the old
+name came from the replica. Response caching is disabled so every request
+reaches the database.
+
+Usage: python benchmarks/replica_routing.py [reads]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ['RESPONSE_CACHE_TTL'] = '0'
+os.environ.setdefault('READ_YOUR_WRITES_SECONDS', '1')
+from common import make_app, count_queries
+
+PROFILE = {
+    'dob': '1985-06-15', 'age': 40, 'gender': 'Female', 'phone_number': '9999999999', 'district': 'Pune',
+    'state': 'Maharashtra', 'occupation': 'Engineer', 'annual_income': 1200000, 'height': 165, 'weight': 60
+}
+
+def main():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    directory = tempfile.mkdtemp()
+    primary_path = os.path.join(directory, 'primary.db')
+    replica_path = os.path.join(directory, 'replica.db')
+    app = make_app(f"sqlite:///{primary_path}", {'REPLICA_DATABASE_URIS': [f"sqlite:///{replica_path}"]})
+    from models import db, User
+    from read_routing import READ_YOUR_WRITES_SECONDS
+
+    client = app.test_client()
+    with app.app_context():
+        user = User(email='replica@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.user_id
+    client.post('/user-profile', json=dict(PROFILE, user_id=user_id, full_name='Before'))
+    with app.app_context():
+        db.engine.dispose()
+        shutil.copyfile(primary_path, replica_path)
+        primary, replica = db.engines[None], db.engines['replica_0']
+
+    def read(label):
+        with count_queries(primary) as on_primary, count_queries(replica) as on_replica:
+            name = client.get(f'/user-details-status/{user_id}').get_json()['FullName']
+        print(f"{label:<34} {name:<7} primary {len(on_primary)} queries, replica {len(on_replica)} queries")
+
+    client.post('/user-profile', json=dict(PROFILE, user_id=user_id, full_name='After'))
+    read("right after the user's write")
+    time.sleep(READ_YOUR_WRITES_SECONDS + 0.1)
+    read(f"{READ_YOUR_WRITES_SECONDS:g}s later")
+
+    with count_queries(primary) as on_primary, count_queries(replica) as on_replica:
+        start = time.perf_counter()
+        for _ in range(reads):
+            client.get(f'/user-details-status/{user_id}')
+        elapsed = time.perf_counter() - start
+    print(f"{reads} reads in {elapsed:.2f}s: primary {len(on_primary)} queries, replica {len(on_replica)} queries")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Shows the Server-Timing header and /metrics output, and what the instrumentation costs.
+
+Times /user-details-status with the request hooks installed, then with them
+removed, on the same SQLite database. Response caching is disabled so every
+request reaches the database.
+
+Usage: python benchmarks/request_timing.py [requests]
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ['RESPONSE_CACHE_TTL'] = '0'
+from common import make_app
+from onboarding import PROFILE, HEALTH, LIFESTYLE
+
+def run(client, path, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(path)
+    return count / (time.perf_counter() - start)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app = make_app()
+    from models import db, User
+    from request_metrics import _start_request, _finish_request
+
+    with app.app_context():
+        user = User(email='timing@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.user_id
+    client = app.test_client()
+    client.post('/onboarding', json={'user_id': user_id, 'profile': PROFILE, 'health': HEALTH, 'lifestyle': LIFESTYLE})
+    path = f'/user-details-status/{user_id}'
+
+    print("Server-Timing:", client.get(path).headers['Server-Timing'])
+    instrumented = run(client, path, count)
+    app.before_request_funcs[None].remove(_start_request)
+    app.after_request_funcs[None].remove(_finish_request)
+    bare = run(client, path, count)
+    print(f"instrumented {instrumented:>8.0f} req/s")
+    print(f"bare         {bare:>8.0f} req/s  ({(bare - instrumented) / bare:+.1%} overhead)")
+
+    lines = client.get('/metrics').get_data(as_text=True).splitlines()
+    print("\n".join(line for line in lines if line.startswith(('caresync_request_seconds_count', 'caresync_sql_statements_total'))))
+
+if __name__ == '__main__':
+    main()
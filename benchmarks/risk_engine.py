@@ -0,0 +1,80 @@
+"""Measures risk-scoring throughput in users per second.
+
+Scores with a synthetic model artifact (random weights), since only the speed is measured.
+
+Usage: python benchmarks/risk_engine.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import yaml
+from common import make_app
+
+# Population mean and spread of each feature the engine reads
+FEATURES = {
+    'age': [45, 15], 'bmi': [25, 4], 'systolic_bp': [125, 15], 'diastolic_bp': [80, 10],
+    'cholesterol_total': [200, 35], 'cholesterol_hdl': [50, 12], 'cholesterol_ldl': [130, 30],
+    'triglycerides': [150, 50], 'blood_glucose_fasting': [95, 15], 'hba1c': [5.6, 0.8],
+    'smoking': [0.3, 0.4], 'alcohol': [1, 1], 'physical_activity': [1.5, 1], 'stress': [1, 0.8],
+    'sleep_hours': [7, 1.2], 'family_history_cvd': [0.2, 0.4], 'family_history_diabetes': [0.2, 0.4],
+    'family_history_cancer': [0.15, 0.35]
+}
+
+def write_synthetic_model(rng):
+    path = os.path.join(tempfile.mkdtemp(), 'risk_model.yml')
+    conditions = {
+        condition: {'intercept': -2.0, 'weights': {name: round(float(rng.normal(0, 0.4)), 3) for name in FEATURES}}
+        for condition in ('Heart_Disease_Risk', 'Diabetes', 'Cancer_Risk')
+    }
+    with open(path, 'w') as file:
+        yaml.safe_dump({'thresholds': {'Medium': 0.3, 'High': 0.6}, 'features': FEATURES, 'conditions': conditions}, file)
+    return path
+
+def seed(db, users, rng):
+    from models import User, MLModelData, LifestyleInformation
+
+    db.session.bulk_insert_mappings(User, [
+        {'user_id': i, 'email': f'user{i}@example.com', 'password_hash': 'x'} for i in range(1, users + 1)
+    ])
+    db.session.bulk_insert_mappings(MLModelData, [
+        {'user_id': i, 'Age': int(rng.integers(18, 90)), 'Gender': 'Male', 'BMI': float(rng.normal(25, 4)),
+         'Systolic_BP': int(rng.normal(125, 15)), 'Diastolic_BP': int(rng.normal(80, 10)),
+         'Cholesterol_Total': int(rng.normal(200, 35)), 'HbA1c': round(float(rng.normal(5.6, 0.8)), 1)}
+        for i in range(1, users + 1)
+    ])
+    db.session.bulk_insert_mappings(LifestyleInformation, [
+        {'user_id': i, 'smoking_status': 'Never', 'alcohol_consumption': 'Light', 'physical_activity': 'Moderate',
+         'stress_level': 'Medium', 'sleep_hours': 7, 'family_history_CVD': bool(i % 5 == 0),
+         'family_history_diabetes': False, 'family_history_cancer': False}
+        for i in range(1, users + 1)
+    ])
+    db.session.commit()
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = np.random.default_rng(11)
+    # Read when risk_engine is imported, which app does
+    os.environ['RISK_MODEL_PATH'] = write_synthetic_model(rng)
+    app = make_app()
+    from models import db
+    from risk_engine import get_risk_model, score_users
+
+    with app.app_context():
+        model = get_risk_model()
+        features = rng.normal(model.means, model.scales, (1_000_000, len(model.feature_names)))
+        start = time.perf_counter()
+        model.risk_levels(model.predict(features))
+        elapsed = time.perf_counter() - start
+        print(f"model only: {len(features) / elapsed:,.0f} users/s")
+
+        seed(db, users, rng)
+        for label in ("initial scoring", "incremental (no changes)"):
+            start = time.perf_counter()
+            seen, rescored = score_users()
+            elapsed = time.perf_counter() - start
+            print(f"{label}: {rescored}/{seen} rescored, {seen / elapsed:,.0f} users/s end to end")
+
+if __name__ == '__main__':
+    main()
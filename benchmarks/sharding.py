@@ -0,0 +1,86 @@
+"""Spreads users over three SQLite shards, adds a fourth and rebalances online.
+
+Users register through /register and onboard through /onboarding, so every
+write goes through the shard directory. After the fourth shard joins the ring,
+rebalance moves only the users the ring now places there. The script then
+checks that every user's rows live on exactly one shard and that their
+profile still reads back.
+
+Usage: python benchmarks/sharding.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ['RESPONSE_CACHE_TTL'] = '0'
+os.environ.setdefault('BCRYPT_ROUNDS', '4')
+os.environ.pop('GEMINI_API_KEY', None)
+from common import make_app
+from onboarding import PROFILE, HEALTH, LIFESTYLE
+
+def shard_counts(db, shards):
+    from sqlalchemy import func, select
+    from models import User
+
+    return {shard: db.session.connection(bind_arguments={'bind': db.engines[shard]}).scalar(select(func.count(User.user_id))) for shard in shards}
+
+def register(client, count):
+    user_ids = []
+    start = time.perf_counter()
+    for index in range(count):
+        response = client.post('/register', json={'email': f'shard{index}@example.com', 'password': 'secret'})
+        user_id = response.get_json()['UserID']
+        client.post('/onboarding', json={'user_id': user_id, 'profile': PROFILE, 'health': HEALTH, 'lifestyle': LIFESTYLE})
+        user_ids.append(user_id)
+    elapsed = time.perf_counter() - start
+    print(f"registered and onboarded {count} users in {elapsed:.2f}s ({count / elapsed:.0f} users/s)")
+    return user_ids
+
+def check_reads(client, user_ids):
+    start = time.perf_counter()
+    missing = [user_id for user_id in user_ids if client.get(f'/user-details-status/{user_id}').status_code != 200]
+    elapsed = time.perf_counter() - start
+    print(f"read {len(user_ids)} users in {elapsed * 1000:.0f} ms, {len(missing)} missing")
+    return missing
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    directory = tempfile.mkdtemp()
+    directory_uri = f"sqlite:///{os.path.join(directory, 'directory.db')}"
+    shard_uris = [f"sqlite:///{os.path.join(directory, f'shard{index}.db')}" for index in range(4)]
+
+    app = make_app(directory_uri, {'SHARD_DATABASE_URIS': shard_uris[:3], 'DB_CREATE_ALL': True})
+    from models import db, ShardUser
+    from sharding import get_ring, rebalance
+
+    client = app.test_client()
+    user_ids = register(client, count)
+    with app.app_context():
+        print("three shards:", shard_counts(db, ['shard_0', 'shard_1', 'shard_2']))
+    check_reads(client, user_ids)
+
+    # The same directory and shards, plus an empty fourth shard joining the ring
+    app = make_app(directory_uri, {'SHARD_DATABASE_URIS': shard_uris, 'DB_CREATE_ALL': True})
+    client = app.test_client()
+    shards = ['shard_0', 'shard_1', 'shard_2', 'shard_3']
+    with app.app_context():
+        planned, _ = rebalance(dry_run=True)
+        print(f"ring moves {len(planned)} of {count} users ({len(planned) / count:.0%}, ideal {1 / len(shards):.0%})")
+        start = time.perf_counter()
+        planned, moved = rebalance(settle=0)
+        print(f"moved {moved} users in {time.perf_counter() - start:.2f}s")
+        counts = shard_counts(db, shards)
+        print("four shards:", counts)
+        placements = Counter(shard for (shard,) in db.session.query(ShardUser.shard))
+        ring = get_ring()
+        misplaced = sum(1 for user_id in user_ids if ring.shard_for(user_id) != db.session.get(ShardUser, user_id).shard)
+    assert sum(counts.values()) == count, "a user's rows exist on more than one shard, or on none"
+    assert dict(placements) == {shard: counts[shard] for shard in shards if counts[shard]}, "directory disagrees with shard contents"
+    assert misplaced == 0, f"{misplaced} users are not where the ring places them"
+    assert not check_reads(client, user_ids), "some users can no longer be read"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Reports how long it takes to import the app and to serve its first request.
+
+Usage: python benchmarks/startup.py [path]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+response = client.get({path!r})
+served = time.perf_counter()
+print(f"{{imported - start:.4f}} {{served - imported:.4f}} {{response.status_code}}")
+"""
+
+def run_probe(path):
+    # A fresh interpreter per run so module caches don't hide the real import cost
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(path=path)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    import_time, first_request_time, status = output.split()
+    return float(import_time), float(first_request_time), int(status)
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else '/'
+    runs = [run_probe(path) for _ in range(5)]
+    import_times = sorted(run[0] for run in runs)
+    request_times = sorted(run[1] for run in runs)
+    print(f"path: {path} (status {runs[-1][2]})")
+    print(f"import time: median {import_times[2] * 1000:.1f} ms, max {import_times[-1] * 1000:.1f} ms")
+    print(f"time to first request: median {request_times[2] * 1000:.1f} ms, max {request_times[-1] * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Upload and download throughput of the local filesystem and Azure storage drivers.
+
+The Azure side runs against Azurite unless AZURE_CONNECTION_STR is set (see
+blob_upload.py). Local downloads go through the /storage/files endpoint,
+including a ranged read of the last megabyte.
+
+Usage: python benchmarks/storage_drivers.py [files] [size_mb]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ['STORAGE_BACKEND'] = 'local'
+os.environ['LOCAL_STORAGE_DIR'] = tempfile.mkdtemp()
+os.environ.setdefault('STORAGE_SIGNING_KEY', 'benchmark-signing-key')
+from blob_upload import AZURITE_CONNECTION_STR
+os.environ.setdefault('AZURE_CONNECTION_STR', AZURITE_CONNECTION_STR)
+from common import make_app
+
+def report(label, operation, files, size, elapsed):
+    print(f"{label:<6} {operation:<14} {files * size / elapsed / (1024 * 1024):>8.1f} MB/s  {elapsed / files * 1000:>8.1f} ms/file")
+
+def upload_all(storage, names, payload):
+    start = time.perf_counter()
+    for name in names:
+        storage.upload(name, io.BytesIO(payload), len(payload), 'application/octet-stream')
+    return time.perf_counter() - start
+
+def download_local(client, urls, headers=None):
+    start = time.perf_counter()
+    for url in urls:
+        parsed = urlparse(url)
+        response = client.get(f"{parsed.path}?{parsed.query}", headers=headers or {})
+        # Drain the body the way a server would, without joining it
+        for _ in response.response:
+            pass
+        response.close()
+    return time.perf_counter() - start
+
+def download_azure(urls, headers=None):
+    import requests
+
+    session = requests.Session()
+    start = time.perf_counter()
+    for url in urls:
+        with session.get(url, headers=headers or {}, stream=True) as response:
+            response.raise_for_status()
+            for _ in response.iter_content(1024 * 1024):
+                pass
+    return time.perf_counter() - start
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    size = int(float(sys.argv[2]) * 1024 * 1024) if len(sys.argv) > 2 else 8 * 1024 * 1024
+    app = make_app()
+    from blob_storage import AzureBlobStorage, get_storage, get_container_client
+
+    payload = os.urandom(size)
+    names = [f"bench/file-{index}.bin" for index in range(files)]
+    last_megabyte = {'Range': f"bytes={max(size - 1024 * 1024, 0)}-"}
+    expiry = int(time.time()) + 3600
+
+    local = get_storage()
+    client = app.test_client()
+    report("local", "upload", files, size, upload_all(local, names, payload))
+    urls = [local.sign(name, expiry) for name in names]
+    report("local", "download", files, size, download_local(client, urls))
+    report("local", "range (1 MB)", files, min(size, 1024 * 1024), download_local(client, urls, last_megabyte))
+
+    try:
+        container = get_container_client()
+        if not container.exists():
+            container.create_container()
+    except Exception as e:
+        print(f"azure  skipped: {e}")
+        return
+    azure = AzureBlobStorage()
+    report("azure", "upload", files, size, upload_all(azure, names, payload))
+    urls = [azure.sign(name, expiry) for name in names]
+    report("azure", "download", files, size, download_azure(urls))
+    report("azure", "range (1 MB)", files, min(size, 1024 * 1024), download_azure(urls, last_megabyte))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import hashlib
+import hmac
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote, urlparse
+from flask import has_request_context, request
+from clients import get_client
+from response_cache import RESPONSE_CACHE_TTL
+from request_metrics import record_storage
+
+# 'azure' or 'local'; the local driver keeps files under LOCAL_STORAGE_DIR and serves them itself
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'azure')
+LOCAL_STORAGE_DIR = os.getenv('LOCAL_STORAGE_DIR', os.path.join(tempfile.gettempdir(), 'caresync-storage'))
+LOCAL_DOWNLOAD_PATH = '/storage/files'
+STORAGE_CONTAINER = os.getenv('AZURE_STORAGE_CONTAINER', 'storage-container')
+# Files above this size go up as blocks in parallel; smaller ones in a single request
+PARALLEL_UPLOAD_THRESHOLD = int(os.getenv('BLOB_PARALLEL_THRESHOLD', str(8 * 1024 * 1024)))
+UPLOAD_BLOCK_SIZE = int(os.getenv('BLOB_BLOCK_SIZE', str(4 * 1024 * 1024)))
+UPLOAD_CONCURRENCY = int(os.getenv('BLOB_UPLOAD_CONCURRENCY', '4'))
+CONNECTION_POOL_SIZE = int(os.getenv('BLOB_CONNECTION_POOL_SIZE', '32'))
+# Cached responses embed signed links, so a link must outlive any response that holds it
+SAS_MIN_REMAINING = RESPONSE_CACHE_TTL + 300
+SAS_TTL = max(int(os.getenv('BLOB_SAS_TTL', str(6 * 3600))), SAS_MIN_REMAINING + 600)
+SAS_EXPIRY_STEP = 600
+SAS_CACHE_SIZE = int(os.getenv('BLOB_SAS_CACHE_SIZE', '50000'))
+
+def _build_blob_service():
+    import requests
+    from azure.core.pipeline.transport import RequestsTransport
+    from azure.storage.blob import BlobServiceClient
+
+    connection_str = os.getenv('AZURE_CONNECTION_STR')
+    if not connection_str:
+        raise ValueError("AZURE_CONNECTION_STR is not set in the environment variables.")
+    # One keep-alive session for the whole process, large enough for every parallel block upload
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=CONNECTION_POOL_SIZE, pool_maxsize=CONNECTION_POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return BlobServiceClient.from_connection_string(
+        conn_str=connection_str,
+        transport=RequestsTransport(session=session, session_owner=False),
+        max_single_put_size=PARALLEL_UPLOAD_THRESHOLD,
+        max_block_size=UPLOAD_BLOCK_SIZE
+    )
+
+def get_blob_service():
+    return get_client('blob_service', _build_blob_service)
+
+def get_container_client(container=STORAGE_CONTAINER):
+    return get_blob_service().get_container_client(container=container)
+
+class UploadMetrics:
+    """Running totals and recent durations of blob uploads in this process."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.uploads = 0
+        self.failures = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.skipped = 0
+        self.skipped_bytes = 0
+
+    def record(self, size, seconds, ok=True):
+        with self._lock:
+            if not ok:
+                self.failures += 1
+                return
+            self.uploads += 1
+            self.bytes += size
+            self.seconds += seconds
+            self._recent.append(seconds)
+
+    def record_skipped(self, size):
+        # Content already stored, so the transfer never happened
+        with self._lock:
+            self.skipped += 1
+            self.skipped_bytes += size
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            uploads, failures, size, seconds = self.uploads, self.failures, self.bytes, self.seconds
+            skipped, skipped_bytes = self.skipped, self.skipped_bytes
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(len(recent) * fraction))] * 1000, 1) if recent else None
+
+        return {
+            'uploads': uploads,
+            'failures': failures,
+            'bytes': size,
+            'seconds': round(seconds, 3),
+            'throughput_mb_s': round(size / seconds / (1024 * 1024), 2) if seconds else None,
+            'p50_ms': percentile(0.5),
+            'p99_ms': percentile(0.99),
+            'skipped': skipped,
+            'bandwidth_saved_bytes': skipped_bytes
+        }
+
+upload_metrics = UploadMetrics()
+
+def stream_length(stream):
+    # Uploaded files are spooled by werkzeug, so they are seekable; measure without reading
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    length = stream.tell() - position
+    stream.seek(position)
+    return length
+
+class AzureBlobStorage:
+    """Stores documents in an Azure Blob container and links to them with SAS URLs."""
+
+    def __init__(self, container=STORAGE_CONTAINER):
+        self.container = container
+
+    def upload(self, name, stream, length, content_type=None):
+        from azure.storage.blob import ContentSettings
+
+        get_container_client(self.container).get_blob_client(name).upload_blob(
+            stream,
+            length=length,
+            overwrite=True,
+            max_concurrency=UPLOAD_CONCURRENCY if length > PARALLEL_UPLOAD_THRESHOLD else 1,
+            content_settings=ContentSettings(content_type=content_type) if content_type else None
+        )
+
+    def sign(self, name, expiry):
+        from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+
+        blob_service_client = get_blob_service()
+        # Signing is a local HMAC over the account key; nothing goes over the network
+        sas_token = generate_blob_sas(
+            account_name=blob_service_client.account_name,
+            container_name=self.container,
+            blob_name=name,
+            account_key=blob_service_client.credential.account_key,
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.fromtimestamp(expiry, tz=timezone.utc)
+        )
+        return f"{get_container_client(self.container).url}/{quote(name)}?{sas_token}"
+
+    def delete(self, name):
+        get_container_client(self.container).delete_blob(name)
+
+class LocalFileStorage:
+    """Stores documents on the local filesystem; the app serves them from LOCAL_DOWNLOAD_PATH."""
+
+    def __init__(self, root, signing_key):
+        self.root = os.path.realpath(root)
+        self.signing_key = signing_key.encode('utf-8')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, name):
+        path = os.path.realpath(os.path.join(self.root, name))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Invalid storage path: {name}")
+        return path
+
+    def upload(self, name, stream, length, content_type=None):
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write beside the target and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                self._copy(stream, out, length)
+            os.replace(temp_path, path)
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    @staticmethod
+    def _copy(stream, out, length):
+        # Small spooled uploads are still in memory; asking for their fileno would write them to disk
+        if not getattr(stream, '_rolled', True):
+            shutil.copyfileobj(stream, out)
+            return
+        try:
+            in_fd = stream.fileno()
+        except (AttributeError, io.UnsupportedOperation):
+            shutil.copyfileobj(stream, out)
+            return
+        # Uploads spooled to disk are real files: copy them in the kernel
+        out.flush()
+        offset = stream.tell()
+        remaining = length
+        while remaining > 0:
+            sent = os.sendfile(out.fileno(), in_fd, offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+        stream.seek(offset)
+
+    def signature(self, name, expiry):
+        return hmac.new(self.signing_key, f"{name}\n{expiry}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def verify(self, name, expiry, signature):
+        if expiry is None or expiry < time.time():
+            return False
+        return hmac.compare_digest(self.signature(name, expiry), signature or '')
+
+    def sign(self, name, expiry):
+        base = os.getenv('LOCAL_STORAGE_URL')
+        if not base:
+            base = (request.host_url.rstrip('/') if has_request_context() else '') + LOCAL_DOWNLOAD_PATH
+        return f"{base}/{quote(name)}?expires={expiry}&signature={self.signature(name, expiry)}"
+
+    def delete(self, name):
+        try:
+            os.unlink(self.path(name))
+        except FileNotFoundError:
+            pass
+
+def _build_storage():
+    if STORAGE_BACKEND == 'azure':
+        return AzureBlobStorage()
+    if STORAGE_BACKEND == 'local':
+        signing_key = os.getenv('STORAGE_SIGNING_KEY')
+        if not signing_key:
+            raise ValueError("STORAGE_SIGNING_KEY is not set in the environment variables.")
+        return LocalFileStorage(LOCAL_STORAGE_DIR, signing_key)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+def get_storage():
+    return get_client('storage', _build_storage)
+
+def upload_stream(name, stream, length=None, content_type=None):
+    """Uploads stream to the configured storage without reading it into memory."""
+    if length is None:
+        length = stream_length(stream)
+    start = time.perf_counter()
+    try:
+        get_storage().upload(name, stream, length, content_type)
+    except Exception:
+        upload_metrics.record(length, time.perf_counter() - start, ok=False)
+        record_storage(time.perf_counter() - start)
+        raise
+    elapsed = time.perf_counter() - start
+    upload_metrics.record(length, elapsed)
+    record_storage(elapsed)
+    return name
+
+# Signed URLs keyed by blob name (LRU), each with its expiry as a unix timestamp
+_sas_cache = OrderedDict()
+_sas_cache_lock = threading.Lock()
+
+def blob_name_from_link(link):
+    """Returns the blob name for a stored file_link; older rows hold a full SAS URL."""
+    if not link.startswith(('http://', 'https://')):
+        return link
+    path = urlparse(link).path
+    marker = f"/{STORAGE_CONTAINER}/"
+    return unquote(path[path.index(marker) + len(marker):] if marker in path else path.rsplit('/', 1)[-1])
+
+def sign_blob_url(name):
+    """Returns a signed read-only URL for the blob, reused until near expiry."""
+    now = time.time()
+    with _sas_cache_lock:
+        cached = _sas_cache.get(name)
+        if cached is not None and cached[1] - now > SAS_MIN_REMAINING:
+            _sas_cache.move_to_end(name)
+            return cached[0]
+
+    # Round the expiry up so every worker signing in the same window produces the same URL
+    expiry = (int(now + SAS_TTL) // SAS_EXPIRY_STEP + 1) * SAS_EXPIRY_STEP
+    url = get_storage().sign(name, expiry)
+    with _sas_cache_lock:
+        _sas_cache[name] = (url, expiry)
+        _sas_cache.move_to_end(name)
+        if len(_sas_cache) > SAS_CACHE_SIZE:
+            _sas_cache.popitem(last=False)
+    return url
@@ -0,0 +1,70 @@
+import os
+import threading
+import dotenv
+
+dotenv.load_dotenv()
+
+GEMINI_MODEL_NAME = 'gemini-1.5-flash-latest'
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yml')
+
+# Registry of heavy, shared clients keyed by name. Nothing is built at import time,
+# so gunicorn can fork workers before any socket or gRPC channel is opened.
+_clients = {}
+_lock = threading.Lock()
+
+def _reset_after_fork():
+    # Clients built in the parent must never be shared with a forked worker
+    global _lock
+    _clients.clear()
+    _lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def get_client(name, factory):
+    """Returns the client registered under name, building it with factory on first use."""
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+def reset_client(name=None):
+    """Drops one client (or all of them) so the next lookup rebuilds it."""
+    with _lock:
+        if name is None:
+            _clients.clear()
+        else:
+            _clients.pop(name, None)
+
+def _build_gemini_model():
+    import google.generativeai as genai
+
+    gemini_api_key = os.getenv('GEMINI_API_KEY')
+    if not gemini_api_key:
+        raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
+    endpoint = os.getenv('GEMINI_API_ENDPOINT')
+    if endpoint:
+        # e.g. http://127.0.0.1:8089 for benchmarks/gemini_stub.py; the stub only speaks REST
+        genai.configure(api_key=gemini_api_key, transport='rest', client_options={'api_endpoint': endpoint})
+    else:
+        genai.configure(api_key=gemini_api_key)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+def _build_sql_database(pool):
+    from langchain_community.utilities.sql_database import SQLDatabase
+    from database import get_engine
+
+    # Model-written SQL runs on its own small pool, never the request pool
+    return SQLDatabase(get_engine(pool))
+
+def get_gemini_model():
+    return get_client('gemini_model', _build_gemini_model)
+
+def get_sql_database(shard=None):
+    """The chatbot's database: the primary's 'llm' pool, or that of the shard holding the user's rows."""
+    pool = 'llm' if shard is None else f'llm_{shard}'
+    return get_client(f'sql_database:{pool}', lambda: _build_sql_database(pool))
@@ -0,0 +1,270 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+import click
+from flask.cli import with_appcontext
+from models import db, MLModelData
+from sharding import each_shard
+
+COHORT_STORE_DIR = os.getenv('COHORT_STORE_DIR', os.path.join(tempfile.gettempdir(), 'caresync-cohort-store'))
+FETCH_CHUNK_SIZE = 50000
+GENDER_CODES = {'Male': 0, 'Female': 1, 'Unknown': 2}
+# Watermark key for an unsharded database
+DEFAULT_SOURCE = 'default'
+AGE_BAND_WIDTH = 10
+
+# Stored columns with their dtype and the MLModelData default used for missing values
+COLUMNS = {
+    'user_id': (np.int64, 0),
+    'model_data_id': (np.int64, 0),
+    'age': (np.int16, -1),
+    'gender': (np.int8, GENDER_CODES['Unknown']),
+    'bmi': (np.float32, 24.22),
+    'systolic_bp': (np.float32, 120),
+    'diastolic_bp': (np.float32, 80),
+    'cholesterol_total': (np.float32, 200),
+    'hba1c': (np.float32, 5.5),
+}
+PERCENTILE_METRICS = ('cholesterol_total', 'bmi', 'hba1c')
+
+def _source_columns():
+    return [
+        MLModelData.user_id, MLModelData.model_data_id, MLModelData.Age, MLModelData.Gender,
+        MLModelData.BMI, MLModelData.Systolic_BP, MLModelData.Diastolic_BP,
+        MLModelData.Cholesterol_Total, MLModelData.HbA1c
+    ]
+
+def _rows_to_columns(rows):
+    columns = {}
+    for index, (name, (dtype, default)) in enumerate(COLUMNS.items()):
+        if name == 'gender':
+            values = [GENDER_CODES.get(row[index], default) for row in rows]
+        else:
+            values = [default if row[index] is None else row[index] for row in rows]
+        columns[name] = np.asarray(values, dtype=dtype)
+    return columns
+
+def _latest_per_user(columns):
+    # Each OCR report adds a row; the newest row per user is the one that counts
+    order = np.argsort(columns['model_data_id'], kind='stable')[::-1]
+    _, first = np.unique(columns['user_id'][order], return_index=True)
+    keep = np.sort(order[first])
+    return {name: values[keep] for name, values in columns.items()}
+
+class CohortSnapshot:
+    """Read-only, memory-mapped view of one version of the store."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as file:
+            self.meta = json.load(file)
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in COLUMNS
+        }
+        # Highest model_data_id read per shard; surrogate ids are only ordered within one shard.
+        # Snapshots from before sharding kept a single id
+        self.watermarks = self.meta.get('watermarks') or {DEFAULT_SOURCE: self.meta.get('last_model_data_id', 0)}
+        self._user_index = None
+        self._cohort_ids = None
+        self._sorted = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns['user_id'])
+
+    @property
+    def cohort_ids(self):
+        # One id per (age band, gender) pair; unknown ages share band -1
+        if self._cohort_ids is None:
+            age = self.columns['age'].astype(np.int32)
+            age_band = np.where(age < 0, -1, age // AGE_BAND_WIDTH)
+            self._cohort_ids = (age_band + 1) * len(GENDER_CODES) + self.columns['gender']
+        return self._cohort_ids
+
+    def row_for_user(self, user_id):
+        with self._lock:
+            if self._user_index is None:
+                order = np.argsort(self.columns['user_id'], kind='stable')
+                self._user_index = (self.columns['user_id'][order], order)
+        sorted_ids, order = self._user_index
+        position = np.searchsorted(sorted_ids, user_id)
+        if position == len(sorted_ids) or sorted_ids[position] != user_id:
+            return None
+        return int(order[position])
+
+    def _sorted_metric(self, metric):
+        with self._lock:
+            if metric not in self._sorted:
+                cohorts = self.cohort_ids
+                values = self.columns[metric]
+                order = np.lexsort((values, cohorts))
+                self._sorted[metric] = (cohorts[order], np.asarray(values[order]))
+            return self._sorted[metric]
+
+    def cohort_size(self, cohort_id):
+        cohorts, _ = self._sorted_metric(PERCENTILE_METRICS[0])
+        return int(np.searchsorted(cohorts, cohort_id, side='right') - np.searchsorted(cohorts, cohort_id, side='left'))
+
+    def percentile(self, metric, cohort_id, value):
+        cohorts, values = self._sorted_metric(metric)
+        low = np.searchsorted(cohorts, cohort_id, side='left')
+        high = np.searchsorted(cohorts, cohort_id, side='right')
+        if high == low:
+            return None
+        rank = np.searchsorted(values[low:high], value, side='right')
+        return round(float(rank) * 100.0 / (high - low), 1)
+
+def health_percentages(columns):
+    """Vectorized calculate_health_percentage over snapshot columns."""
+    bmi = columns['bmi']
+    score = np.full(len(bmi), 100, dtype=np.int16)
+    score -= np.where((bmi < 18.5) | (bmi > 24.9), 10, 0).astype(np.int16)
+    score -= np.where((columns['systolic_bp'] > 130) | (columns['diastolic_bp'] > 85), 10, 0).astype(np.int16)
+    score -= np.where(columns['cholesterol_total'] > 240, 10, 0).astype(np.int16)
+    return np.clip(score, 0, 100)
+
+def _current_pointer():
+    return os.path.join(COHORT_STORE_DIR, 'CURRENT')
+
+def _read_current():
+    try:
+        with open(_current_pointer()) as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return None
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+def get_cohort_snapshot():
+    """Returns the latest snapshot, remapping it when a refresh has swapped versions."""
+    global _snapshot
+    version = _read_current()
+    if version is None:
+        return None
+    if _snapshot is None or os.path.basename(_snapshot.path) != version:
+        with _snapshot_lock:
+            if _snapshot is None or os.path.basename(_snapshot.path) != version:
+                _snapshot = CohortSnapshot(os.path.join(COHORT_STORE_DIR, 'snapshots', version))
+    return _snapshot
+
+def write_snapshot(columns, watermarks):
+    """Writes columns as a new version and atomically points CURRENT at it; watermarks maps each
+    shard (DEFAULT_SOURCE when unsharded) to the highest model_data_id read from it."""
+    snapshots_dir = os.path.join(COHORT_STORE_DIR, 'snapshots')
+    os.makedirs(snapshots_dir, exist_ok=True)
+    version = str(time.time_ns())
+    staging = tempfile.mkdtemp(dir=COHORT_STORE_DIR)
+    for name, (dtype, _) in COLUMNS.items():
+        np.save(os.path.join(staging, f"{name}.npy"), np.ascontiguousarray(columns[name], dtype=dtype))
+    with open(os.path.join(staging, 'meta.json'), 'w') as file:
+        json.dump({
+            'watermarks': {source: int(last_id) for source, last_id in watermarks.items()},
+            'rows': int(len(columns['user_id']))
+        }, file)
+    os.rename(staging, os.path.join(snapshots_dir, version))
+
+    fd, tmp_pointer = tempfile.mkstemp(dir=COHORT_STORE_DIR)
+    with os.fdopen(fd, 'w') as file:
+        file.write(version)
+    previous = _read_current()
+    os.replace(tmp_pointer, _current_pointer())
+
+    # Keep the previous version for workers still reading it; mapped files outlive unlink anyway
+    for name in os.listdir(snapshots_dir):
+        if name not in (version, previous):
+            shutil.rmtree(os.path.join(snapshots_dir, name), ignore_errors=True)
+    return version
+
+def _fetch_rows_after(last_id):
+    """Column chunks of the current shard's MLModelData rows past last_id, and the row count."""
+    chunks = []
+    batch = []
+    fetched = 0
+    query = db.session.query(*_source_columns()).filter(
+        MLModelData.model_data_id > last_id
+    ).order_by(MLModelData.model_data_id).yield_per(FETCH_CHUNK_SIZE)
+    for row in query:
+        batch.append(tuple(row))
+        fetched += 1
+        if len(batch) >= FETCH_CHUNK_SIZE:
+            chunks.append(_rows_to_columns(batch))
+            batch = []
+    if batch:
+        chunks.append(_rows_to_columns(batch))
+    return chunks, fetched
+
+def refresh_cohort_store():
+    """Appends MLModelData rows added on every shard since the last snapshot and publishes a new version."""
+    current = get_cohort_snapshot()
+    watermarks = dict(current.watermarks) if current else {}
+
+    chunks = []
+    fetched = 0
+    for shard in each_shard():
+        source = shard or DEFAULT_SOURCE
+        shard_chunks, shard_fetched = _fetch_rows_after(watermarks.get(source, 0))
+        if shard_chunks:
+            watermarks[source] = max(int(chunk['model_data_id'].max()) for chunk in shard_chunks)
+        chunks.extend(shard_chunks)
+        fetched += shard_fetched
+    if not chunks:
+        return 0
+
+    # Ids can't be compared across shards, so a user's new rows (e.g. after a move) replace
+    # whatever the snapshot held for them rather than competing with it by id
+    latest = _latest_per_user({name: np.concatenate([chunk[name] for chunk in chunks]) for name in COLUMNS})
+    if current:
+        kept = ~np.isin(current.columns['user_id'], latest['user_id'])
+        latest = {name: np.concatenate([np.asarray(current.columns[name])[kept], latest[name]]) for name in COLUMNS}
+    write_snapshot(latest, watermarks)
+    return fetched
+
+def member_percentiles(user_id):
+    """Percentile of a member's cholesterol, BMI and HbA1c within their age/gender cohort."""
+    snapshot = get_cohort_snapshot()
+    if snapshot is None:
+        return None
+    row = snapshot.row_for_user(user_id)
+    if row is None:
+        return None
+    cohort_id = snapshot.cohort_ids[row]
+    age = int(snapshot.columns['age'][row])
+    return {
+        'age_band': f"{(age // AGE_BAND_WIDTH) * AGE_BAND_WIDTH}-{(age // AGE_BAND_WIDTH) * AGE_BAND_WIDTH + AGE_BAND_WIDTH - 1}" if age >= 0 else None,
+        'gender': next(name for name, code in GENDER_CODES.items() if code == snapshot.columns['gender'][row]),
+        'cohort_size': snapshot.cohort_size(cohort_id),
+        'percentiles': {
+            metric: snapshot.percentile(metric, cohort_id, snapshot.columns[metric][row])
+            for metric in PERCENTILE_METRICS
+        }
+    }
+
+def health_distribution(age_band=None, gender=None):
+    """Distribution of health percentages across the population or one cohort."""
+    snapshot = get_cohort_snapshot()
+    if snapshot is None:
+        return None
+    mask = np.ones(len(snapshot), dtype=bool)
+    if age_band is not None:
+        mask &= (snapshot.columns['age'] // AGE_BAND_WIDTH) == age_band // AGE_BAND_WIDTH
+    if gender is not None:
+        mask &= snapshot.columns['gender'] == GENDER_CODES[gender]
+    scores = health_percentages({name: values[mask] for name, values in snapshot.columns.items()})
+    values, counts = np.unique(scores, return_counts=True)
+    return {
+        'members': int(mask.sum()),
+        'mean': round(float(scores.mean()), 2) if len(scores) else None,
+        'distribution': {int(value): int(count) for value, count in zip(values, counts)}
+    }
+
+@click.command('refresh-cohort-store')
+@with_appcontext
+def refresh_cohort_store_command():
+    """Append new MLModelData rows to the columnar cohort snapshot."""
+    added = refresh_cohort_store()
+    click.echo(f"Cohort store refreshed with {added} new rows")
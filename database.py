@@ -1,29 +1,249 @@
+from flask import g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import create_engine
-from sqlalchemy.orm import scoped_session, sessionmaker
+from flask_sqlalchemy.session import Session
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from collections import deque
 import os
+import random
+import threading
+import time
+
+# Comma-separated replica URIs; read-only views marked with read_routing.replica_reads use them
+REPLICA_URIS = [uri.strip() for uri in os.getenv('REPLICA_DATABASE_URIS', '').split(',') if uri.strip()]
+# Comma-separated shard URIs, bound as shard_0, shard_1...; the primary then only holds the shard directory
+SHARD_URIS = [uri.strip() for uri in os.getenv('SHARD_DATABASE_URIS', '').split(',') if uri.strip()]
+DIRECTORY_TABLES = frozenset(['ShardDirectory'])
+
+class RoutingSession(Session):
+    """Sends statements to the request's shard, reads to a replica while the request is routed
+    there, and everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        shard = g.get('shard') if has_app_context() else None
+        if bind is None and shard is not None and not self._is_directory(mapper, clause):
+            return db.engines[shard]
+        if bind is None and self._reads_from_replica(clause):
+            return db.engines[self.info['replica_bind']]
+        if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+            # Once this session writes, its later reads must see the write
+            self.info['wrote'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    @staticmethod
+    def _is_directory(mapper, clause):
+        if mapper is not None:
+            return mapper.persist_selectable.name in DIRECTORY_TABLES
+        table = getattr(clause, 'table', None)
+        if table is None and getattr(clause, 'is_select', False):
+            return any(getattr(source, 'name', None) in DIRECTORY_TABLES for source in clause.get_final_froms())
+        return getattr(table, 'name', None) in DIRECTORY_TABLES
+
+    def _reads_from_replica(self, clause):
+        if self._flushing or self.info.get('wrote') or not has_app_context() or g.get('db_route') != 'replica':
+            return False
+        # Locking reads belong on the primary, like writes
+        if clause is not None and (not getattr(clause, 'is_select', False) or getattr(clause, '_for_update_arg', None) is not None):
+            return False
+        if 'replica_bind' not in self.info:
+            # One replica per session, so a request never mixes two replicas' lag
+            replicas = [name for name in db.engines if name and name.startswith('replica_')]
+            self.info['replica_bind'] = random.choice(replicas) if replicas else None
+        return self.info['replica_bind'] is not None
 
 # Create a single SQLAlchemy instance
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Pool settings for every engine the app opens. None is the primary, used by db.session;
+# the named pools are Flask-SQLAlchemy binds, so they can point at other databases or users.
+ENGINE_POOLS = {
+    None: {
+        'pool_size': 10,  # Adjust pool size based on your application's needs
+        'max_overflow': 20,  # Allow some overflow connections
+        'pool_timeout': 30,  # Increase timeout if necessary
+    },
+    # Read-only work; defaults to the first replica, or READONLY_DATABASE_URI
+    'readonly': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30},
+    # Request reads routed to a replica; one pool per REPLICA_DATABASE_URIS entry
+    'replica': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30},
+    # One pool per SHARD_DATABASE_URIS entry; each shard takes its users' full request traffic
+    'shard': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30},
+    # SQL written by the chatbot's model; small, so a runaway query can't take the whole database
+    'llm': {'pool_size': 2, 'max_overflow': 3, 'pool_timeout': 10},
+}
+POOL_URI_ENV = {'readonly': 'READONLY_DATABASE_URI', 'llm': 'LLM_DATABASE_URI'}
+COMMON_POOL_OPTIONS = {
+    'pool_recycle': 3600,  # Recycle connections after an hour
+    'pool_pre_ping': True  # Check connections are alive before using them
+}
+
+class PoolMetrics:
+    """Checkout counts and latencies for one pool."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+
+    def record(self, seconds, waited):
+        with self._lock:
+            self.checkouts += 1
+            self._recent.append(seconds)
+            if waited:
+                self.waits += 1
+                self.wait_seconds += seconds
+
+    def record_timeout(self, seconds):
+        with self._lock:
+            self.timeouts += 1
+            self.waits += 1
+            self.wait_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            checkouts, waits, wait_seconds, timeouts = self.checkouts, self.waits, self.wait_seconds, self.timeouts
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(len(recent) * fraction))] * 1000, 3) if recent else None
+
+        return {
+            'checkouts': checkouts,
+            'waits': waits,
+            'wait_seconds': round(wait_seconds, 3),
+            'timeouts': timeouts,
+            'checkout_p50_ms': percentile(0.5),
+            'checkout_p99_ms': percentile(0.99)
+        }
+
+# Pool name -> (PoolMetrics, pool); the pool is replaced when an engine is disposed
+_pool_metrics = {}
+_pools = {}
 
-# Configure the SQLAlchemy engine
-engine = create_engine(
-    os.getenv('SQLALCHEMY_DATABASE_URI'),  # Fetching from environment variables
-    pool_size=10,  # Adjust pool size based on your application's needs
-    max_overflow=20,  # Allow some overflow connections
-    pool_timeout=30,  # Increase timeout if necessary
-    pool_recycle=3600,  # Recycle connections after an hour
-    pool_pre_ping=True  # Check connections are alive before using them
-)
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that times every checkout; subclassed per name by instrumented_pool_class."""
 
-# Create a configured "Session" class
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    pool_name = 'default'
+
+    def __init__(self, creator, max_overflow=10, **kw):
+        self.max_overflow_limit = max_overflow
+        super().__init__(creator, max_overflow=max_overflow, **kw)
+        _pools[self.pool_name] = self
+
+    def _do_get(self):
+        metrics = _pool_metrics[self.pool_name]
+        # With every connection and all the overflow checked out, this checkout has to queue
+        waited = self.max_overflow_limit >= 0 and self.checkedout() >= self.size() + self.max_overflow_limit
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.record_timeout(time.perf_counter() - start)
+            raise
+        metrics.record(time.perf_counter() - start, waited)
+        return connection
+
+def instrumented_pool_class(name):
+    pool_name = name or 'default'
+    _pool_metrics.setdefault(pool_name, PoolMetrics())
+    # create_engine only takes a class, so the name travels as a class attribute
+    return type(f'InstrumentedQueuePool_{pool_name}', (InstrumentedQueuePool,), {'pool_name': pool_name})
+
+def engine_options(name, uri, settings=None):
+    options = dict(COMMON_POOL_OPTIONS)
+    # In-memory SQLite needs Flask-SQLAlchemy's single static connection, so no sizing there
+    if uri and uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        return {}
+    options.update(ENGINE_POOLS[settings or name])
+    options['poolclass'] = instrumented_pool_class(name)
+    return options
+
+def get_engine(name=None):
+    """The primary engine, or a named pool ('readonly', 'llm', 'replica_0', 'shard_0', 'llm_shard_0'...);
+    needs an app context."""
+    return db.engine if name is None else db.engines[name]
+
+def shard_names():
+    """Bind names of the configured shards, in configuration order; needs an app context."""
+    return sorted((name for name in db.engines if name and name.startswith('shard_')), key=lambda name: int(name[6:]))
+
+def pool_metrics():
+    """Connection usage per pool in this process."""
+    output = {}
+    for name, metrics in _pool_metrics.items():
+        pool = _pools.get(name)
+        stats = metrics.snapshot()
+        if pool is not None:
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': max(pool.overflow(), 0),
+                'idle': pool.checkedin()
+            })
+        output[name] = stats
+    return output
+
+UPSERT_DIALECTS = ('mysql', 'postgresql', 'sqlite')
+
+def upsert(model, values, key_columns):
+    """Inserts a row or updates it on a key conflict in a single statement; does not commit.
+
+    key_columns must be covered by a primary key or unique index, or nothing conflicts.
+    """
+    table = model.__table__
+    update_columns = [name for name in values if name not in key_columns]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(**values)
+        statement = statement.on_duplicate_key_update(**{name: statement.inserted[name] for name in update_columns})
+        # The affected-row count can't tell an insert from a no-op update under CLIENT_FOUND_ROWS
+        # (SQLAlchemy's default), so nothing is derived from it
+        db.session.execute(statement)
+        return
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={name: statement.excluded[name] for name in update_columns}
+        )
+        db.session.execute(statement)
+        return
+    raise ValueError(f"upsert is not supported on {dialect}; supported dialects: {', '.join(UPSERT_DIALECTS)}")
 
 def init_db(app):
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(None, uri))
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    replicas = app.config.setdefault('REPLICA_DATABASE_URIS', REPLICA_URIS)
+    for name, env_name in POOL_URI_ENV.items():
+        # Named pools default to the first replica, else the primary, each with its own connections
+        bind_uri = os.getenv(env_name) or (replicas[0] if replicas else uri)
+        binds.setdefault(name, {'url': bind_uri, **engine_options(name, bind_uri)})
+    for index, replica_uri in enumerate(replicas):
+        binds.setdefault(f'replica_{index}', {'url': replica_uri, **engine_options(f'replica_{index}', replica_uri, 'replica')})
+    for index, shard_uri in enumerate(app.config.setdefault('SHARD_DATABASE_URIS', SHARD_URIS)):
+        binds.setdefault(f'shard_{index}', {'url': shard_uri, **engine_options(f'shard_{index}', shard_uri, 'shard')})
+        # The chatbot's SQL about a user has to run where that user's rows are, on the same small pool size
+        binds.setdefault(f'llm_shard_{index}', {'url': shard_uri, **engine_options(f'llm_shard_{index}', shard_uri, 'llm')})
+
     # Correctly initialize the app with the db instance
     db.init_app(app)
-    with app.app_context():
-        db.create_all()
-
-def shutdown_session(exception=None):
-    SessionLocal.remove()
+    if app.config.get('DB_CREATE_ALL'):
+        with app.app_context():
+            # Every model lives in the default metadata; the other binds are pools and shards
+            db.create_all(bind_key=None)
+            # Shards hold the same tables as the primary; the models carry no bind key for them
+            for name in shard_names():
+                db.metadata.create_all(db.engines[name])
+                db.engines[name].dispose()
+            # Drop the connections opened by create_all so forked workers start clean
+            db.engine.dispose()
@@ -0,0 +1,87 @@
+import hashlib
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from models import db, StoredBlob
+from blob_storage import upload_stream, upload_metrics
+from sharding import each_shard
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def content_hash(stream):
+    """sha256 of a seekable stream, read in chunks; leaves the stream where it started."""
+    position = stream.tell()
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(position)
+    return digest.hexdigest(), size
+
+def blob_name_for(digest):
+    # Two-character prefixes keep any one listing level small
+    return f"sha256/{digest[:2]}/{digest}"
+
+def _add_reference(digest):
+    return StoredBlob.query.filter_by(content_hash=digest).update(
+        {StoredBlob.ref_count: StoredBlob.ref_count + 1}, synchronize_session=False
+    )
+
+def store_document(file):
+    """Stores an uploaded file under its content hash and takes a reference to it; does not commit.
+
+    Content that is already stored is not transferred again. Returns the StoredBlob's hash and name.
+    """
+    digest, size = content_hash(file.stream)
+    blob_name = blob_name_for(digest)
+    if _add_reference(digest):
+        upload_metrics.record_skipped(size)
+        return digest, blob_name
+
+    upload_stream(blob_name, file.stream, length=size, content_type=file.mimetype)
+    try:
+        # A concurrent upload of the same content may have inserted the row meanwhile
+        with db.session.begin_nested():
+            db.session.add(StoredBlob(
+                content_hash=digest, blob_name=blob_name, size=size, content_type=file.mimetype,
+                ref_count=1, created_at=datetime.utcnow()
+            ))
+    except IntegrityError:
+        _add_reference(digest)
+    return digest, blob_name
+
+def _shard_dedup_totals():
+    return db.session.query(
+        func.count(StoredBlob.content_hash),
+        func.coalesce(func.sum(StoredBlob.ref_count), 0),
+        func.coalesce(func.sum(StoredBlob.size), 0),
+        func.coalesce(func.sum(StoredBlob.size * StoredBlob.ref_count), 0)
+    ).one()
+
+def dedup_savings():
+    """Storage saved by deduplication, from the reference counts, summed over every shard.
+
+    Each shard counts its own references, so content held by users on several shards is
+    counted once per shard.
+    """
+    blobs = references = stored = referenced = 0
+    for _ in each_shard():
+        shard_blobs, shard_references, shard_stored, shard_referenced = _shard_dedup_totals()
+        blobs += shard_blobs
+        references += int(shard_references)
+        stored += int(shard_stored)
+        referenced += int(shard_referenced)
+    return {
+        'blobs': blobs,
+        'references': references,
+        'stored_bytes': stored,
+        'referenced_bytes': referenced,
+        'saved_bytes': referenced - stored
+    }
+
+def content_type_for(blob_name):
+    """Content type recorded for a stored blob, or None for blobs stored before hashing."""
+    if not blob_name.startswith('sha256/'):
+        return None
+    return db.session.query(StoredBlob.content_type).filter_by(content_hash=blob_name.rsplit('/', 1)[-1]).scalar()
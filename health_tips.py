@@ -0,0 +1,184 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from flask import current_app, g
+from flask.cli import with_appcontext
+from models import db, HealthTip, UserProfile, LifestyleInformation
+from database import upsert
+from sharding import each_shard, use_shard
+from model_client import generate_content
+from response_cache import invalidate_user, skip_response_cache
+
+FALLBACK_TIP = "Stay active and maintain a balanced diet for optimal health."
+TIP_TTL = timedelta(hours=float(os.getenv('HEALTH_TIP_TTL_HOURS', '24')))
+# A dashboard waiting on a first tip gives up quickly and shows FALLBACK_TIP instead
+TIP_REQUEST_DEADLINE = float(os.getenv('HEALTH_TIP_REQUEST_DEADLINE', '5'))
+
+# Process-local copy of the stored tips: user_id -> (fingerprint, tip, generated_at)
+_tips = {}
+_refreshing = set()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='health-tip')
+
+def tip_inputs(user_profile, lifestyle_info):
+    # Only the fields the prompt uses, so unrelated profile edits keep the cached tip
+    return {
+        'age': user_profile.age,
+        'gender': user_profile.gender,
+        'height': str(user_profile.height),
+        'weight': str(user_profile.weight),
+        'smoking_status': lifestyle_info.smoking_status,
+        'alcohol_consumption': lifestyle_info.alcohol_consumption,
+        'physical_activity': lifestyle_info.physical_activity,
+        'stress_level': lifestyle_info.stress_level,
+        'sleep_hours': lifestyle_info.sleep_hours
+    }
+
+def tip_fingerprint(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def request_health_tip(inputs, deadline=None, retries=None):
+    """Calls Gemini for a tip; raises on failure so callers decide what to cache."""
+    prompt = f"""
+    Based on the following user profile and lifestyle data, generate a personalized health improvement tip.
+    User Profile:
+    - Age: {inputs['age']}
+    - Gender: {inputs['gender']}
+    - Height: {inputs['height']} cm
+    - Weight: {inputs['weight']} kg
+
+    Lifestyle Information:
+    - Smoking Status: {inputs['smoking_status']}
+    - Alcohol Consumption: {inputs['alcohol_consumption']}
+    - Physical Activity: {inputs['physical_activity']}
+    - Stress Level: {inputs['stress_level']}
+    - Sleep Hours: {inputs['sleep_hours']}
+
+    Provide a concise and actionable health tip for the user. Below 200 characters
+    """
+    response = generate_content(prompt, deadline=deadline, retries=retries)
+    return response.text.strip()
+
+def generate_health_tip(user_profile, lifestyle_info):
+    try:
+        return request_health_tip(tip_inputs(user_profile, lifestyle_info))
+    except Exception as e:
+        print(f"AI error: {e}")
+        skip_response_cache()
+        return FALLBACK_TIP
+
+def _store_tip(user_id, fingerprint, tip):
+    generated_at = datetime.utcnow()
+    # One statement, so a request and a background refresh storing the same user's tip can't collide
+    upsert(HealthTip, {'user_id': user_id, 'fingerprint': fingerprint, 'tip': tip, 'generated_at': generated_at}, ['user_id'])
+    db.session.commit()
+    with _lock:
+        _tips[user_id] = (fingerprint, tip, generated_at)
+    # Cached dashboards embed the old tip
+    invalidate_user(user_id)
+
+def _refresh_in_background(app, shard, user_id, inputs, fingerprint):
+    try:
+        tip = request_health_tip(inputs)
+        with app.app_context():
+            # A fresh app context has no g.shard; without it the tip would land on the primary
+            use_shard(shard)
+            _store_tip(user_id, fingerprint, tip)
+    except Exception as e:
+        logging.error(f"Background health tip refresh failed for user {user_id}: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(user_id)
+
+def _schedule_refresh(user_id, inputs, fingerprint):
+    with _lock:
+        if user_id in _refreshing:
+            return
+        _refreshing.add(user_id)
+    _executor.submit(_refresh_in_background, current_app._get_current_object(), g.get('shard'), user_id, inputs, fingerprint)
+
+def get_health_tip(user_id, user_profile, lifestyle_info, wait=True):
+    """Returns the cached tip for a user, serving stale tips while a fresh one is generated.
+
+    With no tip for the user's current data, waits up to TIP_REQUEST_DEADLINE for one, or with
+    wait=False serves FALLBACK_TIP at once and generates the tip in the background.
+    """
+    inputs = tip_inputs(user_profile, lifestyle_info)
+    fingerprint = tip_fingerprint(inputs)
+
+    cached = _tips.get(user_id)
+    if cached is None or cached[0] != fingerprint:
+        stored = db.session.get(HealthTip, user_id)
+        if stored:
+            cached = (stored.fingerprint, stored.tip, stored.generated_at)
+            with _lock:
+                _tips[user_id] = cached
+
+    if cached and cached[0] == fingerprint:
+        if datetime.utcnow() - cached[2] > TIP_TTL:
+            _schedule_refresh(user_id, inputs, fingerprint)
+        return cached[1]
+
+    # No tip yet, or the profile/lifestyle data changed: the old advice no longer applies
+    if not wait:
+        _schedule_refresh(user_id, inputs, fingerprint)
+        skip_response_cache()
+        return FALLBACK_TIP
+    try:
+        tip = request_health_tip(inputs, deadline=TIP_REQUEST_DEADLINE, retries=0)
+    except Exception as e:
+        print(f"AI error: {e}")
+        # Otherwise the cached dashboard would keep the fallback for RESPONSE_CACHE_TTL after Gemini recovers
+        skip_response_cache()
+        return FALLBACK_TIP
+    _store_tip(user_id, fingerprint, tip)
+    return tip
+
+def prewarm_health_tips(rate_per_minute=60, limit=None):
+    """Regenerates stale or outdated tips for users who have used the dashboard."""
+    interval = 60.0 / rate_per_minute if rate_per_minute else 0
+    rows = db.session.query(HealthTip, UserProfile, LifestyleInformation).join(
+        UserProfile, UserProfile.user_id == HealthTip.user_id
+    ).join(
+        LifestyleInformation, LifestyleInformation.user_id == HealthTip.user_id
+    ).order_by(HealthTip.generated_at).all()
+
+    refreshed = 0
+    cutoff = datetime.utcnow() - TIP_TTL
+    for stored, user_profile, lifestyle_info in rows:
+        if limit is not None and refreshed >= limit:
+            break
+        inputs = tip_inputs(user_profile, lifestyle_info)
+        fingerprint = tip_fingerprint(inputs)
+        if stored.fingerprint == fingerprint and stored.generated_at > cutoff:
+            continue
+        started = time.monotonic()
+        try:
+            _store_tip(stored.user_id, fingerprint, request_health_tip(inputs))
+            refreshed += 1
+        except Exception as e:
+            logging.error(f"Health tip prewarm failed for user {stored.user_id}: {e}")
+        # Stay under the model's rate limit
+        remaining = interval - (time.monotonic() - started)
+        if remaining > 0:
+            time.sleep(remaining)
+    return refreshed
+
+@click.command('prewarm-health-tips')
+@click.option('--rate', default=60, help='Maximum Gemini calls per minute.')
+@click.option('--limit', default=None, type=int, help='Maximum number of tips to regenerate.')
+@with_appcontext
+def prewarm_health_tips_command(rate, limit):
+    """Nightly job: regenerate expired health tips for active users."""
+    refreshed = 0
+    for _ in each_shard():
+        refreshed += prewarm_health_tips(rate_per_minute=rate, limit=None if limit is None else limit - refreshed)
+        if limit is not None and refreshed >= limit:
+            break
+    click.echo(f"Regenerated {refreshed} health tips")
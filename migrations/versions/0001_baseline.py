@@ -0,0 +1,211 @@
+"""Schema as created by db.create_all() before migrations were tracked
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+Databases created by the app's old startup create_all() already have these
+tables; on them this revision only records the starting point.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('Users'):
+        return
+    op.create_table('Users',
+    sa.Column('user_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('user_details', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_table('ClaimStatus',
+    sa.Column('claim_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('decision', sa.Enum('Claim Approved', 'Claim Cancelled', 'Claim in review'), nullable=False),
+    sa.Column('reason', sa.Text(), nullable=False),
+    sa.Column('bill_name', sa.Text(), nullable=False),
+    sa.Column('processed_at', sa.TIMESTAMP(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('claim_id')
+    )
+    op.create_table('HealthInformation',
+    sa.Column('health_info_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('medical_history', sa.Text(), nullable=True),
+    sa.Column('family_medical_history', sa.Text(), nullable=True),
+    sa.Column('allergies', sa.Text(), nullable=True),
+    sa.Column('current_medications', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('health_info_id')
+    )
+    op.create_table('InsurancePlans',
+    sa.Column('plan_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('company', sa.String(length=100), nullable=True),
+    sa.Column('plan_name', sa.String(length=100), nullable=True),
+    sa.Column('plan_type', sa.String(length=50), nullable=True),
+    sa.Column('network_type', sa.String(length=20), nullable=True),
+    sa.Column('monthly_premium', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('annual_premium', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('sum_insured', sa.Numeric(precision=15, scale=2), nullable=True),
+    sa.Column('deductible', sa.String(length=20), nullable=True),
+    sa.Column('out_of_pocket_max', sa.String(length=20), nullable=True),
+    sa.Column('effective_date', sa.Date(), nullable=True),
+    sa.Column('expiration_date', sa.Date(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('plan_id')
+    )
+    op.create_table('LifestyleInformation',
+    sa.Column('lifestyle_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('smoking_status', sa.Enum('Never', 'Former', 'Current'), nullable=True),
+    sa.Column('alcohol_consumption', sa.Enum('None', 'Light', 'Moderate', 'Heavy'), nullable=True),
+    sa.Column('physical_activity', sa.Enum('None', 'Light', 'Moderate', 'High'), nullable=True),
+    sa.Column('family_history_CVD', sa.Boolean(), nullable=True),
+    sa.Column('family_history_diabetes', sa.Boolean(), nullable=True),
+    sa.Column('family_history_cancer', sa.Boolean(), nullable=True),
+    sa.Column('stress_level', sa.Enum('Low', 'Medium', 'High'), nullable=True),
+    sa.Column('sleep_hours', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('lifestyle_id')
+    )
+    op.create_table('MLModelData',
+    sa.Column('model_data_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('Age', sa.Integer(), nullable=True),
+    sa.Column('Gender', sa.Enum('Male', 'Female', 'Unknown'), nullable=True),
+    sa.Column('Height', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('Weight', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('BMI', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('Systolic_BP', sa.Integer(), nullable=True),
+    sa.Column('Diastolic_BP', sa.Integer(), nullable=True),
+    sa.Column('Cholesterol_Total', sa.Integer(), nullable=True),
+    sa.Column('Cholesterol_HDL', sa.Integer(), nullable=True),
+    sa.Column('Cholesterol_LDL', sa.Integer(), nullable=True),
+    sa.Column('Triglycerides', sa.Integer(), nullable=True),
+    sa.Column('Blood_Glucose_Fasting', sa.Integer(), nullable=True),
+    sa.Column('HbA1c', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('Smoking_Status', sa.Enum('Never', 'Former', 'Current'), nullable=True),
+    sa.Column('Alcohol_Consumption', sa.Enum('None', 'Light', 'Moderate', 'Heavy'), nullable=True),
+    sa.Column('Physical_Activity', sa.Enum('None', 'Light', 'Moderate', 'High'), nullable=True),
+    sa.Column('Family_History_CVD', sa.Boolean(), nullable=True),
+    sa.Column('Family_History_Diabetes', sa.Boolean(), nullable=True),
+    sa.Column('Family_History_Cancer', sa.Boolean(), nullable=True),
+    sa.Column('Stress_Level', sa.Enum('Low', 'Medium', 'High'), nullable=True),
+    sa.Column('Sleep_Hours', sa.Integer(), nullable=True),
+    sa.Column('Fruits_Veggies_Daily', sa.Integer(), nullable=True),
+    sa.Column('Creatinine', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('eGFR', sa.Integer(), nullable=True),
+    sa.Column('ALT', sa.Integer(), nullable=True),
+    sa.Column('AST', sa.Integer(), nullable=True),
+    sa.Column('TSH', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('T4', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('Vitamin_D', sa.Numeric(precision=4, scale=1), nullable=True),
+    sa.Column('Calcium', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('Hemoglobin', sa.Numeric(precision=4, scale=1), nullable=True),
+    sa.Column('White_Blood_Cell_Count', sa.Numeric(precision=4, scale=1), nullable=True),
+    sa.Column('Platelet_Count', sa.Integer(), nullable=True),
+    sa.Column('C_Reactive_Protein', sa.Integer(), nullable=True),
+    sa.Column('Vitamin_B12', sa.Integer(), nullable=True),
+    sa.Column('Folate', sa.Numeric(precision=4, scale=1), nullable=True),
+    sa.Column('Ferritin', sa.Integer(), nullable=True),
+    sa.Column('Uric_Acid', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('PSA', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.Column('Bone_Density_T_Score', sa.Numeric(precision=3, scale=1), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('model_data_id')
+    )
+    op.create_table('PredictionResults',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('condition_name', sa.String(length=50), nullable=False),
+    sa.Column('probability', sa.Numeric(precision=4, scale=2), nullable=True),
+    sa.Column('risk_level', sa.Enum('Low', 'Medium', 'High'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'condition_name')
+    )
+    op.create_table('Prescriptions',
+    sa.Column('prescription_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('clinic_name', sa.String(length=255), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('file_link', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('prescription_id')
+    )
+    op.create_table('UserProfile',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=True),
+    sa.Column('DOB', sa.Date(), nullable=True),
+    sa.Column('age', sa.Integer(), nullable=True),
+    sa.Column('gender', sa.Enum('Male', 'Female'), nullable=True),
+    sa.Column('phone_number', sa.String(length=20), nullable=True),
+    sa.Column('district', sa.String(length=100), nullable=True),
+    sa.Column('state', sa.String(length=100), nullable=True),
+    sa.Column('occupation', sa.String(length=100), nullable=True),
+    sa.Column('annual_income', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('height', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.Column('weight', sa.Numeric(precision=5, scale=2), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['Users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('AdditionalBenefits',
+    sa.Column('benefit_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=True),
+    sa.Column('benefit_description', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['plan_id'], ['InsurancePlans.plan_id'], ),
+    sa.PrimaryKeyConstraint('benefit_id')
+    )
+    op.create_table('Copayments',
+    sa.Column('copayment_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=True),
+    sa.Column('service', sa.String(length=100), nullable=True),
+    sa.Column('amount', sa.String(length=20), nullable=True),
+    sa.ForeignKeyConstraint(['plan_id'], ['InsurancePlans.plan_id'], ),
+    sa.PrimaryKeyConstraint('copayment_id')
+    )
+    op.create_table('CoverageDetails',
+    sa.Column('coverage_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=True),
+    sa.Column('coverage_item', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['plan_id'], ['InsurancePlans.plan_id'], ),
+    sa.PrimaryKeyConstraint('coverage_id')
+    )
+    op.create_table('PolicyExclusions',
+    sa.Column('exclusion_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=True),
+    sa.Column('general_exclusions', sa.Text(), nullable=True),
+    sa.Column('waiting_periods', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['plan_id'], ['InsurancePlans.plan_id'], ),
+    sa.PrimaryKeyConstraint('exclusion_id')
+    )
+
+
+def downgrade():
+    op.drop_table('PolicyExclusions')
+    op.drop_table('CoverageDetails')
+    op.drop_table('Copayments')
+    op.drop_table('AdditionalBenefits')
+    op.drop_table('UserProfile')
+    op.drop_table('Prescriptions')
+    op.drop_table('PredictionResults')
+    op.drop_table('MLModelData')
+    op.drop_table('LifestyleInformation')
+    op.drop_table('InsurancePlans')
+    op.drop_table('HealthInformation')
+    op.drop_table('ClaimStatus')
+    op.drop_table('Users')
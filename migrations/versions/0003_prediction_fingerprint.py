@@ -0,0 +1,27 @@
+"""Add PredictionResults.input_fingerprint for the risk engine
+
+Revision ID: 0003_prediction_fingerprint
+Revises: 0002_health_tips
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_prediction_fingerprint'
+down_revision = '0002_health_tips'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('PredictionResults')}
+    if 'input_fingerprint' not in columns:
+        op.add_column('PredictionResults', sa.Column('input_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('PredictionResults') as batch_op:
+        batch_op.drop_column('input_fingerprint')
@@ -0,0 +1,27 @@
+"""Add InsurancePlans.input_fingerprint for deterministic plan generation
+
+Revision ID: 0004_plan_fingerprint
+Revises: 0003_prediction_fingerprint
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_plan_fingerprint'
+down_revision = '0003_prediction_fingerprint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('InsurancePlans')}
+    if 'input_fingerprint' not in columns:
+        op.add_column('InsurancePlans', sa.Column('input_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('InsurancePlans') as batch_op:
+        batch_op.drop_column('input_fingerprint')
@@ -0,0 +1,50 @@
+"""One HealthInformation and LifestyleInformation row per user
+
+Revision ID: 0005_unique_user_sections
+Revises: 0004_plan_fingerprint
+Create Date: 2026-10-19 00:00:00
+
+The section routes upsert on user_id, which needs a unique index to conflict on.
+Older code could insert a second row for a user; only the newest (highest id) is kept.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_unique_user_sections'
+down_revision = '0004_plan_fingerprint'
+branch_labels = None
+depends_on = None
+
+SECTIONS = (
+    ('HealthInformation', 'health_info_id', 'uq_HealthInformation_user_id'),
+    ('LifestyleInformation', 'lifestyle_id', 'uq_LifestyleInformation_user_id'),
+)
+
+
+def _has_unique_user_id(inspector, table):
+    constraints = inspector.get_unique_constraints(table)
+    indexes = [index for index in inspector.get_indexes(table) if index.get('unique')]
+    return any(entry['column_names'] == ['user_id'] for entry in constraints + indexes)
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, key, name in SECTIONS:
+        if _has_unique_user_id(inspector, table):
+            continue
+        # The derived table lets MySQL read the table it is deleting from
+        op.execute(
+            f'DELETE FROM {table} WHERE user_id IS NOT NULL AND {key} NOT IN ('
+            f'SELECT newest FROM (SELECT MAX({key}) AS newest FROM {table} '
+            f'WHERE user_id IS NOT NULL GROUP BY user_id) AS keep)'
+        )
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(name, ['user_id'])
+
+
+def downgrade():
+    for table, _, name in SECTIONS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(name, type_='unique')
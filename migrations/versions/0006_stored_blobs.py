@@ -0,0 +1,44 @@
+"""Add StoredBlobs and Prescriptions.content_hash for content-addressed documents
+
+Revision ID: 0006_stored_blobs
+Revises: 0005_unique_user_sections
+Create Date: 2026-10-19 00:00:00
+
+Existing prescriptions keep a NULL content_hash; their file_link still works.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_stored_blobs'
+down_revision = '0005_unique_user_sections'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('StoredBlobs'):
+        op.create_table('StoredBlobs',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('blob_name', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=255), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash')
+        )
+    if 'content_hash' not in {column['name'] for column in inspector.get_columns('Prescriptions')}:
+        with op.batch_alter_table('Prescriptions') as batch_op:
+            batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+            batch_op.create_index('ix_Prescriptions_content_hash', ['content_hash'], unique=False)
+            batch_op.create_foreign_key('fk_Prescriptions_content_hash', 'StoredBlobs', ['content_hash'], ['content_hash'])
+
+
+def downgrade():
+    with op.batch_alter_table('Prescriptions') as batch_op:
+        batch_op.drop_constraint('fk_Prescriptions_content_hash', type_='foreignkey')
+        batch_op.drop_index('ix_Prescriptions_content_hash')
+        batch_op.drop_column('content_hash')
+    op.drop_table('StoredBlobs')
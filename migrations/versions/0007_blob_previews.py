@@ -0,0 +1,30 @@
+"""Add thumbnail and preview names to StoredBlobs
+
+Revision ID: 0007_blob_previews
+Revises: 0006_stored_blobs
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_blob_previews'
+down_revision = '0006_stored_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('StoredBlobs')}
+    if 'thumbnail_name' not in columns:
+        op.add_column('StoredBlobs', sa.Column('thumbnail_name', sa.String(length=255), nullable=True))
+    if 'preview_name' not in columns:
+        op.add_column('StoredBlobs', sa.Column('preview_name', sa.String(length=255), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('StoredBlobs') as batch_op:
+        batch_op.drop_column('preview_name')
+        batch_op.drop_column('thumbnail_name')
@@ -0,0 +1,43 @@
+"""Index prescriptions for keyset pagination and search
+
+Revision ID: 0008_prescription_search
+Revises: 0007_blob_previews
+Create Date: 2026-10-19 00:00:00
+
+MySQL gets a FULLTEXT index; other backends get PrescriptionTerms, which
+`flask index-prescriptions` fills for existing rows.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_prescription_search'
+down_revision = '0007_blob_previews'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    indexes = {index['name'] for index in inspector.get_indexes('Prescriptions')}
+    if 'ix_prescriptions_user_date' not in indexes:
+        op.create_index('ix_prescriptions_user_date', 'Prescriptions', ['user_id', 'date', 'prescription_id'], unique=False)
+    if bind.dialect.name == 'mysql' and 'ft_prescriptions_text' not in indexes:
+        op.create_index('ft_prescriptions_text', 'Prescriptions', ['clinic_name', 'description'], unique=False, mysql_prefix='FULLTEXT')
+    if not inspector.has_table('PrescriptionTerms'):
+        op.create_table('PrescriptionTerms',
+        sa.Column('term', sa.String(length=64), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('prescription_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['prescription_id'], ['Prescriptions.prescription_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('term', 'user_id', 'prescription_id')
+        )
+
+
+def downgrade():
+    op.drop_table('PrescriptionTerms')
+    if op.get_bind().dialect.name == 'mysql':
+        op.drop_index('ft_prescriptions_text', table_name='Prescriptions')
+    op.drop_index('ix_prescriptions_user_date', table_name='Prescriptions')
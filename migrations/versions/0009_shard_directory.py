@@ -0,0 +1,33 @@
+"""Add the ShardDirectory table used when SHARD_DATABASE_URIS is set
+
+Revision ID: 0009_shard_directory
+Revises: 0008_prescription_search
+Create Date: 2026-10-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_shard_directory'
+down_revision = '0008_prescription_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('ShardDirectory'):
+        return
+    op.create_table('ShardDirectory',
+    sa.Column('user_id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('shard', sa.String(length=32), nullable=False),
+    sa.Column('moving', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id'),
+    sa.UniqueConstraint('email')
+    )
+
+
+def downgrade():
+    op.drop_table('ShardDirectory')
@@ -0,0 +1,195 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from clients import get_client, get_gemini_model
+from request_metrics import record_model_call
+
+# Total time a call may take, across retries and waiting for a slot
+MODEL_DEADLINE = float(os.getenv('GEMINI_DEADLINE', '30'))
+MODEL_RETRIES = int(os.getenv('GEMINI_RETRIES', '2'))
+RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', '0.5'))
+RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', '4'))
+# Calls in flight per worker process; the rest wait up to MODEL_QUEUE_TIMEOUT, then fail fast
+MODEL_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+MODEL_QUEUE_TIMEOUT = float(os.getenv('GEMINI_QUEUE_TIMEOUT', '2'))
+# Consecutive failed calls that open the breaker, and how long it stays open before a probe
+BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('GEMINI_BREAKER_RESET_SECONDS', '30'))
+# Matched by name so the REST and gRPC transports' errors are both covered without importing either
+TRANSIENT_ERRORS = frozenset([
+    'ServiceUnavailable', 'DeadlineExceeded', 'ResourceExhausted', 'TooManyRequests', 'InternalServerError',
+    'BadGateway', 'GatewayTimeout', 'RetryError', 'Timeout', 'ReadTimeout', 'ConnectTimeout', 'ConnectionError',
+    'TimeoutError', 'ConnectionResetError', 'ConnectionRefusedError'
+])
+
+class ModelUnavailable(Exception):
+    """Gemini is failing, overloaded or too slow; callers should fall back or answer 503."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after or 1)))}
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for a while, then lets one probe through."""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                # Exactly one caller probes; everyone else keeps failing fast until it reports back
+                self.state = 'half_open'
+                return True
+            return False
+
+    def retry_after(self):
+        with self._lock:
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)) if self.state != 'closed' else 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.opens += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+class ModelCallMetrics:
+    """Outcome counts and recent latencies of Gemini calls in this process."""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rejected_open = 0
+        self.rejected_busy = 0
+        self.in_flight = 0
+
+    def record(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            self._recent.append(seconds)
+            if ok:
+                self.successes += 1
+            else:
+                self.failures += 1
+
+    def count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            counts = {name: getattr(self, name) for name in (
+                'calls', 'successes', 'failures', 'retries', 'timeouts', 'rejected_open', 'rejected_busy', 'in_flight'
+            )}
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(len(recent) * fraction))] * 1000, 1) if recent else None
+
+        breaker = _guard().breaker
+        return dict(counts, breaker_state=breaker.state, breaker_opens=breaker.opens,
+                    p50_ms=percentile(0.5), p99_ms=percentile(0.99))
+
+model_metrics = ModelCallMetrics()
+
+class _ModelGuard:
+    # Per process: the registry drops it after fork, so no worker inherits a held slot or an open breaker
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.slots = threading.BoundedSemaphore(MODEL_MAX_CONCURRENCY)
+
+def _guard():
+    return get_client('gemini_guard', _ModelGuard)
+
+def is_transient(error):
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+def _backoff(attempt):
+    # Full jitter, so workers retrying the same outage don't hit Gemini in lockstep
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+def generate_content(contents, deadline=None, retries=None, **kwargs):
+    """Calls the shared Gemini model under a deadline, with retries, a circuit breaker and a
+    per-process concurrency cap. Raises ModelUnavailable when the call can't be made in time."""
+    deadline = MODEL_DEADLINE if deadline is None else deadline
+    retries = MODEL_RETRIES if retries is None else retries
+    expires = time.monotonic() + deadline
+    guard = _guard()
+
+    if not guard.breaker.allow():
+        model_metrics.count('rejected_open')
+        raise ModelUnavailable("Gemini circuit breaker is open", retry_after=guard.breaker.retry_after())
+    if not guard.slots.acquire(timeout=max(0.0, min(MODEL_QUEUE_TIMEOUT, expires - time.monotonic()))):
+        model_metrics.count('rejected_busy')
+        # A probe that never ran must not leave the breaker half open
+        if guard.breaker.state == 'half_open':
+            guard.breaker.record_failure()
+        raise ModelUnavailable("Too many Gemini calls in flight", retry_after=1)
+
+    model_metrics.count('in_flight')
+    try:
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            start = time.perf_counter()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError(f"Gemini deadline of {deadline}s exceeded")
+                response = get_gemini_model().generate_content(
+                    contents, request_options={'timeout': remaining}, **kwargs
+                )
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                record_model_call(elapsed)
+                model_metrics.record(elapsed, ok=False)
+                if not is_transient(e):
+                    # The request itself is bad (blocked prompt, invalid input); Gemini is healthy
+                    guard.breaker.record_success()
+                    raise
+                if isinstance(e, TimeoutError) or type(e).__name__ in ('DeadlineExceeded', 'Timeout', 'ReadTimeout'):
+                    model_metrics.count('timeouts')
+                delay = _backoff(attempt)
+                if attempt >= retries or time.monotonic() + delay >= expires:
+                    guard.breaker.record_failure()
+                    logging.error(f"Gemini call failed after {attempt + 1} attempts: {e}")
+                    raise ModelUnavailable(f"Gemini is unavailable: {e}", retry_after=guard.breaker.retry_after() or 1) from e
+                model_metrics.count('retries')
+                attempt += 1
+                time.sleep(delay)
+                continue
+            elapsed = time.perf_counter() - start
+            record_model_call(elapsed, getattr(response, 'usage_metadata', None))
+            model_metrics.record(elapsed, ok=True)
+            guard.breaker.record_success()
+            return response
+    finally:
+        model_metrics.count('in_flight', -1)
+        guard.slots.release()
@@ -16,6 +16,14 @@ class User(db.Model):
     user_profile = db.relationship('UserProfile', back_populates='user', uselist=False)
     insurance_plans = db.relationship('InsurancePlans', back_populates='user')
 
+class ShardUser(db.Model):
+    # Lives on the directory database (SQLALCHEMY_DATABASE_URI) when SHARD_DATABASE_URIS is set
+    __tablename__ = 'ShardDirectory'
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    shard = db.Column(db.String(32), nullable=False)
+    moving = db.Column(db.Boolean, nullable=False, default=False)
+
 class UserProfile(db.Model):
     __tablename__ = 'UserProfile'
     user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), primary_key=True)
@@ -36,7 +44,7 @@ class UserProfile(db.Model):
 class HealthInformation(db.Model):
     __tablename__ = 'HealthInformation'
     health_info_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), unique=True)
     medical_history = db.Column(db.Text)
     family_medical_history = db.Column(db.Text)
     allergies = db.Column(db.Text)
@@ -45,7 +53,7 @@ class HealthInformation(db.Model):
 class LifestyleInformation(db.Model):
     __tablename__ = 'LifestyleInformation'
     lifestyle_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), unique=True)
     smoking_status = db.Column(db.Enum('Never', 'Former', 'Current'))
     alcohol_consumption = db.Column(db.Enum('None', 'Light', 'Moderate', 'Heavy'))
     physical_activity = db.Column(db.Enum('None', 'Light', 'Moderate', 'High'))
@@ -64,6 +72,30 @@ class Prescription(db.Model):
     description = db.Column(db.Text, nullable=False)
     date = db.Column(db.Date, nullable=False)
     file_link = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(64), db.ForeignKey('StoredBlobs.content_hash'), index=True)
+    __table_args__ = (
+        # Keyset pagination walks (date, prescription_id) within one user
+        db.Index('ix_prescriptions_user_date', 'user_id', 'date', 'prescription_id'),
+        # Full-text search on MySQL; other backends use PrescriptionTerms instead
+        db.Index('ft_prescriptions_text', 'clinic_name', 'description', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
+
+class PrescriptionTerm(db.Model):
+    __tablename__ = 'PrescriptionTerms'
+    term = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    prescription_id = db.Column(db.Integer, db.ForeignKey('Prescriptions.prescription_id', ondelete='CASCADE'), primary_key=True)
+
+class StoredBlob(db.Model):
+    __tablename__ = 'StoredBlobs'
+    content_hash = db.Column(db.String(64), primary_key=True)
+    blob_name = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(255))
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, nullable=False)
+    thumbnail_name = db.Column(db.String(255))
+    preview_name = db.Column(db.String(255))
 
 class MLModelData(db.Model):
     __tablename__ = 'MLModelData'
@@ -121,12 +153,20 @@ class ClaimStatus(db.Model):
     user = db.relationship('User', back_populates='claim_statuses')
 
 
+class HealthTip(db.Model):
+    __tablename__ = 'HealthTips'
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    tip = db.Column(db.Text, nullable=False)
+    generated_at = db.Column(db.DateTime, nullable=False)
+
 class PredictionResults(db.Model):
     __tablename__ = 'PredictionResults'
     user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), primary_key=True)
     condition_name = db.Column(db.String(50), primary_key=True)
     probability = db.Column(db.Numeric(4, 2))
     risk_level = db.Column(db.Enum('Low', 'Medium', 'High'))
+    input_fingerprint = db.Column(db.String(64))
 
 class InsurancePlans(db.Model):
     __tablename__ = 'InsurancePlans'
@@ -143,6 +183,7 @@ class InsurancePlans(db.Model):
     out_of_pocket_max = db.Column(db.String(20))
     effective_date = db.Column(db.Date)
     expiration_date = db.Column(db.Date)
+    input_fingerprint = db.Column(db.String(64))
 
     user = db.relationship('User', back_populates='insurance_plans')
 
@@ -2,10 +2,12 @@ from flask import Blueprint, request, jsonify
 from PIL import Image
 from io import BytesIO
 import base64
-import os
-import google.generativeai as genai
-from models import db, MLModelData, fetch_user_data, map_tests_to_mlmodeldata
+from model_client import generate_content, ModelUnavailable
+from models import db, MLModelData, map_tests_to_mlmodeldata
+from user_context import load_user_context, forget_user_context
 from utils import safe_float, safe_int, clean_json_response
+from response_cache import invalidate_user
+from risk_engine import score_user
 import dotenv
 
 # Load environment variables
@@ -14,10 +16,6 @@ dotenv.load_dotenv()
 # Initialize blueprint
 ocr_bp = Blueprint('ocr', __name__)
 
-# Configure Generative AI API
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-1.5-flash-latest')
-
 @ocr_bp.route('/process_report', methods=['POST'])
 def process_report():
     try:
@@ -35,7 +33,7 @@ def process_report():
         Provide the output in JSON format, matching the field names exactly as listed.
         """
 
-        genai_response = model.generate_content([prompt, {"mime_type": "application/pdf", "data": pdf_base64}])
+        genai_response = generate_content([prompt, {"mime_type": "application/pdf", "data": pdf_base64}])
 
         if not genai_response or not genai_response.text:
             return jsonify({"error": "No response from Gemini API or response is empty."}), 500
@@ -44,7 +42,10 @@ def process_report():
         if extracted_fields is None:
             return jsonify({"error": "Failed to parse the API response."}), 500
 
-        user_profile, lifestyle_info = fetch_user_data(int(user_id))
+        context = load_user_context(user_id)
+        if not context.has('profile', 'lifestyle'):
+            raise ValueError(f"Missing profile or lifestyle information for user_id {user_id}")
+        user_profile, lifestyle_info = context.profile, context.lifestyle
         test_data = map_tests_to_mlmodeldata(extracted_fields)
 
         ml_model_data = MLModelData(
@@ -93,9 +94,15 @@ def process_report():
 
         db.session.add(ml_model_data)
         db.session.commit()
+        forget_user_context(user_id)
+        score_user(int(user_id))
+        invalidate_user(user_id)
 
         return jsonify({"message": "Data Processed Successfully and Uploaded"}), 200
 
+    except ModelUnavailable as e:
+        print(f"Exception occurred: {str(e)}")
+        return jsonify({"error": "Report processing is temporarily unavailable, please retry"}), 503, e.headers()
     except Exception as e:
         print(f"Exception occurred: {str(e)}")
         return jsonify({"error": str(e)}), 500
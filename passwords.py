@@ -0,0 +1,72 @@
+import logging
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from clients import get_client, reset_client
+
+# bcrypt's own default cost; raising it upgrades stored hashes as users log in
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+# Every web worker process has its own pool, so by default the host's cores are split between
+# them (WEB_CONCURRENCY is gunicorn's worker count). 0 hashes on the calling thread, e.g. for scripts
+WEB_CONCURRENCY = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+POOL_WORKERS = int(os.getenv('BCRYPT_WORKERS', str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+POOL_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', '10'))
+
+class PasswordHashingBusy(Exception):
+    """The bcrypt pool didn't finish within BCRYPT_TIMEOUT; callers should answer 503."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {'Retry-After': str(max(1, math.ceil(self.retry_after or 1)))}
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def _build_pool():
+    # Spawned children start a fresh interpreter, so they never inherit a worker's sockets or
+    # connections. They do re-import __main__: under gunicorn that is its launcher, but with
+    # `python app.py` every child runs create_app() once as it starts
+    return ProcessPoolExecutor(max_workers=POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+
+def _run(function, *args):
+    if POOL_WORKERS <= 0:
+        return function(*args)
+    try:
+        future = get_client('bcrypt_pool', _build_pool).submit(function, *args)
+        return future.result(timeout=POOL_TIMEOUT)
+    except FutureTimeoutError:
+        # The pool is saturated; drop the job if it hasn't started rather than queue behind it
+        future.cancel()
+        logging.warning(f"Password hashing took over {POOL_TIMEOUT}s")
+        raise PasswordHashingBusy("Password hashing is overloaded", retry_after=POOL_TIMEOUT) from None
+    except BrokenProcessPool as e:
+        # A killed child breaks the whole pool; rebuild it for the next call and finish this one inline
+        logging.error(f"Password hashing pool failed, rebuilding it: {e}")
+        reset_client('bcrypt_pool')
+        return function(*args)
+
+def hash_password(password, rounds=None):
+    """Hashes password in the bcrypt pool; returns the hash as a str. Raises PasswordHashingBusy."""
+    return _run(_hashpw, password.encode('utf-8'), rounds or BCRYPT_ROUNDS).decode('utf-8')
+
+def check_password(hashed_password, password):
+    return _run(_checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+def hash_rounds(hashed_password):
+    # Hashes look like $2b$12$<salt and digest>
+    try:
+        return int(hashed_password.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed_password):
+    return hash_rounds(hashed_password) != BCRYPT_ROUNDS
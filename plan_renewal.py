@@ -0,0 +1,227 @@
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+import numpy as np
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from models import db, UserProfile, HealthInformation, LifestyleInformation, MLModelData, PredictionResults, InsurancePlans, CoverageDetails, Copayments, AdditionalBenefits, PolicyExclusions
+from sharding import each_shard
+from pricing import TIERS, get_pricing_tables
+from response_cache import invalidate_user
+from routes.insurance import InsurancePlanGenerator, pricing_fingerprint
+
+RENEWAL_BATCH_SIZE = 1000
+PLAN_TERM = timedelta(days=365)
+
+def _tier_values(tables, name, tier_index):
+    return np.array([tables[name][tier] for tier in TIERS], dtype=np.float64)[tier_index]
+
+def price_batch(inputs, tables):
+    """Vectorized InsurancePlanGenerator pricing for arrays of users; returns arrays keyed by field."""
+    age = inputs['age']
+    high = inputs['high_risk_count']
+
+    # _calculate_risk_score
+    risk_score = 0.5 + high * 0.1 + inputs['medium_risk_count'] * 0.05
+    risk_score += np.where(inputs['smoker'], 0.1, 0.0)
+    risk_score += np.where(inputs['drinker'], 0.05, 0.0)
+    bmi = inputs['bmi']
+    risk_score += np.where((bmi > 30) | (bmi < 18.5), 0.05, 0.0)
+    risk_score += np.where((inputs['systolic_bp'] > 140) | (inputs['diastolic_bp'] > 90), 0.05, 0.0)
+    risk_score += np.select([age > 50, age > 40], [0.1, 0.05], 0.0)
+    risk_score += np.where(inputs['medical_history_flag'], 0.1, 0.0)
+    risk_score = np.minimum(risk_score, 1.0)
+
+    # _determine_coverage_type; indexes into TIERS
+    income = inputs['annual_income']
+    tier_index = np.select(
+        [(risk_score < 0.3) & (income > 1500000), (risk_score < 0.5) & (income > 1000000), (risk_score < 0.7) & (income > 500000)],
+        [TIERS.index('Platinum'), TIERS.index('Gold'), TIERS.index('Silver')],
+        TIERS.index('Bronze')
+    )
+
+    premium = _tier_values(tables, 'base_premium', tier_index) * (1 + (age - 18) * 0.02) * (1 + risk_score * 0.5)
+    monthly_premium = np.round(np.clip(premium, 500, 20000), 2)
+    sum_insured = np.round(np.minimum(income * _tier_values(tables, 'base_multiplier', tier_index) * (1.0 + high * 0.1), 50000000), -5)
+    return {
+        'risk_score': risk_score,
+        'tier_index': tier_index,
+        'monthly_premium': monthly_premium,
+        'annual_premium': monthly_premium * 12,
+        'sum_insured': sum_insured,
+        'deductible': (_tier_values(tables, 'base_deductible', tier_index) * (1 + risk_score)).astype(np.int64),
+        'out_of_pocket_max': (_tier_values(tables, 'base_out_of_pocket_max', tier_index) * (1 + risk_score * 0.5)).astype(np.int64),
+        'plan_type': np.select([age >= 60, high > 0], ['Senior Citizen', 'Critical Illness'], 'Individual')
+    }
+
+def load_renewal_inputs(user_ids):
+    """Loads every pricing input for a batch of users with one query per table.
+
+    Returns the complete users, their inputs as arrays for price_batch, and per user the
+    (profile, health, lifestyle, ml_data, predictions) rows pricing_fingerprint reads.
+    """
+    profiles = {row.user_id: row for row in db.session.query(
+        UserProfile.user_id, UserProfile.age, UserProfile.annual_income
+    ).filter(UserProfile.user_id.in_(user_ids))}
+    health = {}
+    for row in db.session.query(HealthInformation.user_id, HealthInformation.medical_history).filter(
+        HealthInformation.user_id.in_(user_ids)
+    ).order_by(HealthInformation.health_info_id):
+        health.setdefault(row.user_id, row)
+    lifestyle = {}
+    for row in db.session.query(
+        LifestyleInformation.user_id, LifestyleInformation.smoking_status, LifestyleInformation.alcohol_consumption
+    ).filter(LifestyleInformation.user_id.in_(user_ids)).order_by(LifestyleInformation.lifestyle_id):
+        lifestyle.setdefault(row.user_id, row)
+    latest = db.session.query(func.max(MLModelData.model_data_id)).filter(
+        MLModelData.user_id.in_(user_ids)
+    ).group_by(MLModelData.user_id)
+    ml_data = {row.user_id: row for row in db.session.query(
+        MLModelData.user_id, MLModelData.BMI, MLModelData.Systolic_BP, MLModelData.Diastolic_BP
+    ).filter(MLModelData.model_data_id.in_(latest))}
+    predictions = defaultdict(list)
+    for row in db.session.query(
+        PredictionResults.user_id, PredictionResults.condition_name, PredictionResults.risk_level
+    ).filter(PredictionResults.user_id.in_(user_ids)):
+        predictions[row.user_id].append(row)
+
+    # Same completeness rule as the generate_plan endpoint; users missing a value pricing reads
+    # can't be priced, so they keep their plan until their data is filled in
+    complete = [
+        user_id for user_id in user_ids
+        if user_id in profiles and user_id in health and user_id in lifestyle and user_id in ml_data and predictions[user_id]
+        and None not in (profiles[user_id].age, profiles[user_id].annual_income, ml_data[user_id].BMI,
+                         ml_data[user_id].Systolic_BP, ml_data[user_id].Diastolic_BP)
+    ]
+    inputs = {
+        'age': np.array([profiles[u].age for u in complete], dtype=np.float64),
+        'annual_income': np.array([float(profiles[u].annual_income) for u in complete], dtype=np.float64),
+        'medical_history_flag': np.array([health[u].medical_history != "No major issues" for u in complete], dtype=bool),
+        'smoker': np.array([lifestyle[u].smoking_status != "Never" for u in complete], dtype=bool),
+        'drinker': np.array([lifestyle[u].alcohol_consumption in ("Moderate", "Heavy") for u in complete], dtype=bool),
+        'bmi': np.array([float(ml_data[u].BMI) for u in complete], dtype=np.float64),
+        'systolic_bp': np.array([ml_data[u].Systolic_BP for u in complete], dtype=np.float64),
+        'diastolic_bp': np.array([ml_data[u].Diastolic_BP for u in complete], dtype=np.float64),
+        'high_risk_count': np.array([sum(1 for r in predictions[u] if r.risk_level == 'High') for u in complete], dtype=np.float64),
+        'medium_risk_count': np.array([sum(1 for r in predictions[u] if r.risk_level == 'Medium') for u in complete], dtype=np.float64),
+    }
+    records = {u: (profiles[u], health[u], lifestyle[u], ml_data[u], predictions[u]) for u in complete}
+    return complete, inputs, records
+
+def renew_batch(plans, tables):
+    """Reprices one batch of (plan_id, user_id, network_type, expiration_date) rows in a single transaction."""
+    user_ids, inputs, records = load_renewal_inputs(list(dict.fromkeys(plan.user_id for plan in plans)))
+    if not user_ids:
+        return 0
+    priced = price_batch(inputs, tables)
+    user_index = {user_id: index for index, user_id in enumerate(user_ids)}
+
+    today = date.today()
+    plan_updates, coverage_rows, copayment_rows, benefit_rows, exclusion_rows = [], [], [], [], []
+    # A user may hold several plans; each is repriced from the user's one set of inputs
+    for plan in plans:
+        if plan.user_id not in user_index:
+            continue
+        index, user_id = user_index[plan.user_id], plan.user_id
+        tier = TIERS[priced['tier_index'][index]]
+        risk_score = float(priced['risk_score'][index])
+        risks = records[user_id][-1]
+        # Seeded like generate_plan, so an unchanged user's next request serves this plan as is
+        fingerprint = pricing_fingerprint(*records[user_id])
+        generator = InsurancePlanGenerator(seed=f"{user_id}:{fingerprint}")
+        details = generator.plan_details(tier, plan.network_type, risk_score, risks)
+        effective_date = max(plan.expiration_date or today, today)
+        plan_updates.append({
+            'plan_id': plan.plan_id,
+            'plan_name': f"{tier} {plan.network_type} Health Shield",
+            'plan_type': str(priced['plan_type'][index]),
+            'monthly_premium': float(priced['monthly_premium'][index]),
+            'annual_premium': float(priced['annual_premium'][index]),
+            'sum_insured': float(priced['sum_insured'][index]),
+            'deductible': f"₹{int(priced['deductible'][index])}",
+            'out_of_pocket_max': f"₹{int(priced['out_of_pocket_max'][index])}",
+            'effective_date': effective_date,
+            'expiration_date': effective_date + PLAN_TERM,
+            'input_fingerprint': fingerprint
+        })
+        coverage_rows.extend(
+            {'plan_id': plan.plan_id, 'coverage_item': item}
+            for item in details['coverage_details']
+        )
+        copayment_rows.extend(
+            {'plan_id': plan.plan_id, 'service': service, 'amount': amount}
+            for service, amount in details['copayments'].items()
+        )
+        benefit_rows.extend(
+            {'plan_id': plan.plan_id, 'benefit_description': benefit}
+            for benefit in details['additional_benefits']
+        )
+        exclusion_rows.append({
+            'plan_id': plan.plan_id,
+            'general_exclusions': ', '.join(details['general_exclusions']),
+            'waiting_periods': ', '.join([f"{k}: {v} months" for k, v in details['waiting_periods'].items()])
+        })
+
+    plan_ids = [update['plan_id'] for update in plan_updates]
+    try:
+        db.session.bulk_update_mappings(InsurancePlans, plan_updates)
+        for model in (CoverageDetails, Copayments, AdditionalBenefits, PolicyExclusions):
+            model.query.filter(model.plan_id.in_(plan_ids)).delete(synchronize_session=False)
+        db.session.bulk_insert_mappings(CoverageDetails, coverage_rows)
+        db.session.bulk_insert_mappings(Copayments, copayment_rows)
+        db.session.bulk_insert_mappings(AdditionalBenefits, benefit_rows)
+        db.session.bulk_insert_mappings(PolicyExclusions, exclusion_rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for user_id in user_ids:
+        invalidate_user(user_id)
+    return len(plan_updates)
+
+def renew_expiring_plans(days=30, batch_size=RENEWAL_BATCH_SIZE, limit=None):
+    """Renews plans expiring within `days`; returns (plans_seen, plans_renewed)."""
+    tables = get_pricing_tables()
+    cutoff = date.today() + timedelta(days=days)
+    seen = 0
+    renewed = 0
+    after_plan_id = 0
+    while limit is None or seen < limit:
+        size = batch_size if limit is None else min(batch_size, limit - seen)
+        # Company and network are kept on renewal; only the pricing is recomputed
+        plans = db.session.query(
+            InsurancePlans.plan_id, InsurancePlans.user_id, InsurancePlans.network_type, InsurancePlans.expiration_date
+        ).filter(
+            InsurancePlans.expiration_date <= cutoff,
+            InsurancePlans.plan_id > after_plan_id
+        ).order_by(InsurancePlans.plan_id).limit(size).all()
+        if not plans:
+            break
+        renewed += renew_batch(plans, tables)
+        seen += len(plans)
+        after_plan_id = plans[-1].plan_id
+        db.session.expunge_all()
+    return seen, renewed
+
+@click.command('renew-plans')
+@click.option('--days', default=30, help='Renew plans expiring within this many days.')
+@click.option('--batch-size', default=RENEWAL_BATCH_SIZE, help='Plans repriced per transaction.')
+@click.option('--limit', default=None, type=int, help='Maximum number of plans to process.')
+@with_appcontext
+def renew_plans_command(days, batch_size, limit):
+    """Reprice and extend insurance plans nearing their expiration date."""
+    start = time.perf_counter()
+    seen = renewed = 0
+    for _ in each_shard():
+        shard_seen, shard_renewed = renew_expiring_plans(
+            days=days, batch_size=batch_size, limit=None if limit is None else limit - seen
+        )
+        seen += shard_seen
+        renewed += shard_renewed
+        if limit is not None and seen >= limit:
+            break
+    elapsed = time.perf_counter() - start
+    rate = renewed / elapsed if elapsed else 0
+    click.echo(f"Renewed {renewed} of {seen} expiring plans in {elapsed:.2f}s ({rate:.0f} plans/s)")
@@ -0,0 +1,94 @@
+import re
+import time
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, func, insert, or_
+from models import db, Prescription, PrescriptionTerm
+from sharding import each_shard
+
+# InnoDB ignores words shorter than innodb_ft_min_token_size (3), so both backends do the same
+MIN_TERM_LENGTH = 3
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+REINDEX_CHUNK_SIZE = 5000
+
+_word = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text):
+    """Distinct lowercase words of searchable length, in order of first appearance."""
+    terms = []
+    for word in _word.findall((text or '').lower()):
+        if MIN_TERM_LENGTH <= len(word) <= MAX_TERM_LENGTH and word not in terms:
+            terms.append(word)
+    return terms
+
+def uses_fulltext():
+    return db.session.get_bind().dialect.name == 'mysql'
+
+def _term_rows(prescription_id, user_id, clinic_name, description):
+    return [
+        {'term': term, 'user_id': user_id, 'prescription_id': prescription_id}
+        for term in tokenize(f"{clinic_name} {description}")
+    ]
+
+def index_prescription(prescription):
+    """Adds a flushed prescription to the inverted index on backends without FULLTEXT; does not commit."""
+    if uses_fulltext():
+        return
+    rows = _term_rows(prescription.prescription_id, prescription.user_id, prescription.clinic_name, prescription.description)
+    if rows:
+        db.session.execute(insert(PrescriptionTerm), rows)
+
+def search_filter(q, user_id):
+    """SQL condition matching prescriptions that contain every word of q, or None for an empty query."""
+    terms = tokenize(q)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    if uses_fulltext():
+        from sqlalchemy.dialects.mysql import match
+
+        # Boolean mode with every word required, like the inverted index below
+        return match(Prescription.clinic_name, Prescription.description, against=' '.join(f'+{term}' for term in terms)).in_boolean_mode()
+    matching = db.session.query(PrescriptionTerm.prescription_id).filter(
+        PrescriptionTerm.user_id == user_id,
+        PrescriptionTerm.term.in_(terms)
+    ).group_by(PrescriptionTerm.prescription_id).having(func.count(PrescriptionTerm.term) == len(terms))
+    return Prescription.prescription_id.in_(matching)
+
+def after_cursor(last_date, last_id):
+    # Rows strictly after (date, id) in (date DESC, prescription_id DESC) order
+    return or_(
+        Prescription.date < last_date,
+        and_(Prescription.date == last_date, Prescription.prescription_id < last_id)
+    )
+
+def reindex_prescriptions(chunk_size=REINDEX_CHUNK_SIZE):
+    """Rebuilds PrescriptionTerms from every prescription; returns the number indexed."""
+    PrescriptionTerm.query.delete(synchronize_session=False)
+    indexed = 0
+    after_id = 0
+    while True:
+        rows = db.session.query(
+            Prescription.prescription_id, Prescription.user_id, Prescription.clinic_name, Prescription.description
+        ).filter(Prescription.prescription_id > after_id).order_by(Prescription.prescription_id).limit(chunk_size).all()
+        if not rows:
+            break
+        terms = [term for row in rows for term in _term_rows(*row)]
+        if terms:
+            db.session.execute(insert(PrescriptionTerm), terms)
+        db.session.commit()
+        indexed += len(rows)
+        after_id = rows[-1].prescription_id
+    db.session.commit()
+    return indexed
+
+@click.command('index-prescriptions')
+@with_appcontext
+def index_prescriptions_command():
+    """Rebuild the prescription search index used when the database has no FULLTEXT support."""
+    if uses_fulltext():
+        click.echo("MySQL searches the FULLTEXT index directly; nothing to rebuild")
+        return
+    start = time.perf_counter()
+    indexed = sum(reindex_prescriptions() for _ in each_shard())
+    click.echo(f"Indexed {indexed} prescriptions in {time.perf_counter() - start:.2f}s")
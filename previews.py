@@ -0,0 +1,137 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+from PIL import Image, ImageOps, features
+from models import db, StoredBlob, Prescription
+from blob_storage import upload_stream, stream_length
+from response_cache import invalidate_user
+from sharding import use_shard
+
+THUMBNAIL_SIZE = (256, 256)
+PREVIEW_SIZE = (1024, 1024)
+PREVIEW_WORKERS = int(os.getenv('PREVIEW_WORKERS', '2'))
+# Larger documents are left without previews rather than tying up a worker
+MAX_PREVIEW_SOURCE_BYTES = int(os.getenv('MAX_PREVIEW_SOURCE_BYTES', str(50 * 1024 * 1024)))
+
+# (shard, content hash) pairs with a job queued or running, so duplicate uploads don't render twice
+_pending = set()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix='preview')
+
+def _thumbnail_format():
+    return ('WEBP', 'image/webp', 'webp') if features.check('webp') else ('JPEG', 'image/jpeg', 'jpg')
+
+def _open_pdf_page(path):
+    try:
+        import fitz
+    except ImportError:
+        logging.warning("PyMuPDF is not installed; skipping PDF preview")
+        return None
+    with fitz.open(path) as document:
+        if document.page_count == 0:
+            return None
+        page = document[0]
+        # Render straight at preview size instead of rasterising at full resolution first
+        zoom = min(PREVIEW_SIZE[0] / page.rect.width, PREVIEW_SIZE[1] / page.rect.height)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+def _open_image(path):
+    image = Image.open(path)
+    # Lets the JPEG decoder scale down by up to 8x while decoding, far cheaper than a full decode
+    image.draft('RGB', PREVIEW_SIZE)
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+def render_previews(path, content_type):
+    """Returns (preview, thumbnail) PIL images for a stored document, or None if it can't be rendered."""
+    with open(path, 'rb') as file:
+        is_pdf = file.read(5) == b'%PDF-'
+    image = _open_pdf_page(path) if is_pdf or content_type == 'application/pdf' else _open_image(path)
+    if image is None:
+        return None
+    image.thumbnail(PREVIEW_SIZE)
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE)
+    return image, thumbnail
+
+def _encode(image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    length = buffer.tell()
+    buffer.seek(0)
+    return buffer, length
+
+def _generate(app, shard, digest, blob_name, path, content_type):
+    try:
+        rendered = render_previews(path, content_type)
+        if rendered is None:
+            return
+        preview, thumbnail = rendered
+        thumbnail_format, thumbnail_type, extension = _thumbnail_format()
+        # Stored beside the original, so they share its lifetime and naming
+        thumbnail_name = f"{blob_name}.thumb.{extension}"
+        preview_name = f"{blob_name}.preview.jpg"
+        buffer, length = _encode(thumbnail, thumbnail_format, quality=80)
+        upload_stream(thumbnail_name, buffer, length, thumbnail_type)
+        buffer, length = _encode(preview, 'JPEG', quality=80, optimize=True, progressive=True)
+        upload_stream(preview_name, buffer, length, 'image/jpeg')
+
+        with app.app_context():
+            # The upload's shard holds this StoredBlob; a fresh app context would write to the primary
+            use_shard(shard)
+            StoredBlob.query.filter_by(content_hash=digest).update(
+                {StoredBlob.thumbnail_name: thumbnail_name, StoredBlob.preview_name: preview_name},
+                synchronize_session=False
+            )
+            db.session.commit()
+            user_ids = [row.user_id for row in db.session.query(Prescription.user_id).filter_by(content_hash=digest).distinct()]
+        for user_id in user_ids:
+            invalidate_user(user_id)
+    except Exception as e:
+        logging.error(f"Preview generation failed for {blob_name}: {e}")
+    finally:
+        os.unlink(path)
+        with _lock:
+            _pending.discard((shard, digest))
+
+def schedule_previews(digest, blob_name, file):
+    """Queues thumbnail and preview generation for a just-stored upload; call after commit.
+
+    Never raises: the upload has already succeeded, and at worst it goes without previews.
+    """
+    # Each shard has its own StoredBlob row for a document
+    pending_key = (g.get('shard'), digest)
+    queued = False
+    copy_path = None
+    try:
+        file.stream.seek(0)
+        if stream_length(file.stream) > MAX_PREVIEW_SOURCE_BYTES:
+            return False
+        if db.session.query(StoredBlob.thumbnail_name).filter_by(content_hash=digest).scalar():
+            return False
+        with _lock:
+            if pending_key in _pending:
+                return False
+            _pending.add(pending_key)
+        queued = True
+
+        # The request's upload is gone once the response is sent, so the worker gets its own copy
+        with tempfile.NamedTemporaryFile(prefix='preview-', delete=False) as copy:
+            copy_path = copy.name
+            shutil.copyfileobj(file.stream, copy)
+        _executor.submit(_generate, current_app._get_current_object(), pending_key[0], digest, blob_name, copy_path, file.mimetype)
+    except Exception as e:
+        logging.error(f"Unable to queue previews for {blob_name}: {e}")
+        if queued:
+            with _lock:
+                _pending.discard(pending_key)
+        if copy_path is not None:
+            os.unlink(copy_path)
+        return False
+    return True
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from types import MappingProxyType
+import yaml
+from clients import CONFIG_PATH
+
+TIERS = ('Bronze', 'Silver', 'Gold', 'Platinum')
+TIER_TABLES = ('base_premium', 'base_multiplier', 'base_deductible', 'base_out_of_pocket_max', 'base_copay')
+LIST_TABLES = ('companies', 'plan_types', 'network_types', 'benefits', 'exclusions')
+RELOAD_CHECK_INTERVAL = float(os.getenv('PRICING_RELOAD_CHECK_INTERVAL', '2'))
+
+def freeze(value):
+    """Recursively converts dicts and lists into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+def validate_insurance_config(config):
+    for name in LIST_TABLES:
+        if not isinstance(config.get(name), list) or not config[name]:
+            raise ValueError(f"insurance.{name} must be a non-empty list")
+    for name in TIER_TABLES:
+        table = config.get(name)
+        if not isinstance(table, dict) or set(table) != set(TIERS):
+            raise ValueError(f"insurance.{name} must define exactly {', '.join(TIERS)}")
+        for tier, amount in table.items():
+            if not isinstance(amount, (int, float)) or amount < 0:
+                raise ValueError(f"insurance.{name}.{tier} must be a non-negative number")
+    coverage = config.get('coverage')
+    if not isinstance(coverage, dict) or not all(isinstance(coverage.get(key), list) for key in ('basic', 'additional', 'gold_platinum')):
+        raise ValueError("insurance.coverage must define basic, additional and gold_platinum lists")
+    if len(config['benefits']) < 5:
+        raise ValueError("insurance.benefits needs at least 5 entries for Platinum plans")
+    if len(config['exclusions']) < 3:
+        raise ValueError("insurance.exclusions needs at least 3 entries")
+    for key in ('general', 'pre_existing_high', 'pre_existing_low', 'specific_procedures'):
+        if not isinstance(config.get('waiting_periods', {}).get(key), int):
+            raise ValueError(f"insurance.waiting_periods.{key} must be an integer")
+
+def compile_pricing_tables(path=CONFIG_PATH):
+    """Loads, validates and freezes the insurance section of config.yml; returns (tables, digest)."""
+    with open(path, 'r') as file:
+        config = yaml.safe_load(file)['insurance']
+    validate_insurance_config(config)
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+    return freeze(config), digest
+
+_tables = None
+_digest = None
+_mtime = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+def reload_pricing_tables():
+    """Recompiles the tables and swaps them in; keeps the current tables if the file is invalid."""
+    global _tables, _mtime, _digest
+    with _lock:
+        mtime = _mtime
+        try:
+            mtime = os.path.getmtime(CONFIG_PATH)
+            tables, digest = compile_pricing_tables()
+        except Exception as e:
+            logging.error(f"Keeping current pricing tables, reload failed: {e}")
+            if _tables is None:
+                raise
+            # Don't retry the same broken file on every check; wait for the next edit
+            _mtime = mtime
+            return False
+        # A single reference assignment, so readers see either the old or the new tables
+        _tables = tables
+        _digest = digest
+        _mtime = mtime
+        return True
+
+def get_pricing_tables():
+    global _last_check
+    if _tables is None:
+        reload_pricing_tables()
+    now = time.monotonic()
+    if now - _last_check >= RELOAD_CHECK_INTERVAL:
+        _last_check = now
+        try:
+            if os.path.getmtime(CONFIG_PATH) != _mtime:
+                reload_pricing_tables()
+        except OSError as e:
+            logging.error(f"Unable to stat pricing config: {e}")
+    return _tables
+
+def get_pricing_digest():
+    """Content hash of the loaded tables, stable across workers; use it to version derived data."""
+    get_pricing_tables()
+    return _digest
+
+def _request_reload(signum, frame):
+    # Never compile inside the handler: it may interrupt a reload holding the lock
+    global _mtime, _last_check
+    _mtime = None
+    _last_check = 0.0
+
+def install_reload_signal(signal_name=None):
+    """Reloads the tables when the worker receives the given signal (SIGHUP by default)."""
+    signal_name = signal_name or os.getenv('PRICING_RELOAD_SIGNAL', 'SIGHUP')
+    signum = getattr(signal, signal_name, None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, _request_reload)
+    return True
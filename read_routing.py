@@ -0,0 +1,33 @@
+import logging
+import os
+import time
+from functools import wraps
+from flask import g
+from response_cache import get_response_store, cache_user_key
+
+# After a user's own write, their reads stay on the primary this long to cover replica lag
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+
+def wrote_recently(user_id):
+    """True if the user committed a write (see response_cache.invalidate_user) within the window."""
+    try:
+        return time.time() - get_response_store().last_write(cache_user_key(user_id)) < READ_YOUR_WRITES_SECONDS
+    except Exception as e:
+        # Without the write log we can't rule out lag, so stay on the primary
+        logging.error(f"Unable to check recent writes for user {user_id}: {e}")
+        return True
+
+def replica_reads(view):
+    """Routes the view's reads to a replica, unless its user just wrote; writes still go to the primary.
+
+    Responses cached by cached_user_response may hold replica data, so the window must
+    exceed the replicas' lag.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = kwargs.get('user_id')
+        if user_id is None or not wrote_recently(user_id):
+            # Left in place for the rest of the request, so streamed responses keep reading the replica
+            g.db_route = 'replica'
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,242 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Requests slower than this are logged with their SQL and call tree; 0 disables the sampler
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '0'))
+# Fraction of requests profiled for the sampler; profiling costs far more than the counters
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv('SLOW_REQUEST_SAMPLE_RATE', '0.05'))
+SLOW_REQUEST_TOP_CALLS = 30
+SLOW_REQUEST_MAX_STATEMENTS = 200
+# Prometheus' default buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestTiming:
+    """Where one request's time went; lives on flask.g for the request."""
+
+    __slots__ = ('start', 'sql_count', 'sql_seconds', 'model_calls', 'model_seconds', 'storage_seconds',
+                 'statements', 'profiler')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.model_calls = 0
+        self.model_seconds = 0.0
+        self.storage_seconds = 0.0
+        # Only kept while the slow-request sampler watches this request
+        self.statements = None
+        self.profiler = None
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label value."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label -> [bucket counts..., count, sum]
+        self._series = {}
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def series(self):
+        with self._lock:
+            return {label: list(series) for label, series in self._series.items()}
+
+class Counter:
+    """Monotonic totals per label tuple."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+request_seconds = Histogram()
+sql_seconds = Histogram()
+model_seconds = Histogram()
+storage_seconds = Histogram()
+requests_total = Counter()
+sql_statements_total = Counter()
+model_calls_total = Counter()
+model_tokens_total = Counter()
+
+def _blueprint():
+    # Background threads (previews, prewarm jobs) have no request to attribute to
+    if not has_request_context():
+        return 'background'
+    return request.blueprint or 'app'
+
+def _current_timing():
+    return g.get('request_timing') if has_app_context() else None
+
+def record_model_call(seconds, usage=None):
+    """Counts one Gemini call; usage is the response's usage_metadata, when it has one."""
+    blueprint = _blueprint()
+    model_seconds.observe(blueprint, seconds)
+    model_calls_total.inc((blueprint,))
+    if usage is not None:
+        model_tokens_total.inc((blueprint, 'prompt'), getattr(usage, 'prompt_token_count', 0) or 0)
+        model_tokens_total.inc((blueprint, 'completion'), getattr(usage, 'candidates_token_count', 0) or 0)
+    timing = _current_timing()
+    if timing is not None:
+        timing.model_calls += 1
+        timing.model_seconds += seconds
+
+def record_storage(seconds):
+    """Counts time spent talking to document storage."""
+    storage_seconds.observe(_blueprint(), seconds)
+    timing = _current_timing()
+    if timing is not None:
+        timing.storage_seconds += seconds
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    blueprint = _blueprint()
+    sql_seconds.observe(blueprint, elapsed)
+    sql_statements_total.inc((blueprint,))
+    timing = _current_timing()
+    if timing is None:
+        return
+    timing.sql_count += 1
+    timing.sql_seconds += elapsed
+    if timing.statements is not None and len(timing.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+        timing.statements.append((elapsed, statement))
+
+def _start_request():
+    timing = g.request_timing = RequestTiming()
+    if SLOW_REQUEST_SECONDS > 0 and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+        timing.statements = []
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already running in this process (e.g. a concurrent thread's)
+            return
+        timing.profiler = profiler
+
+def _log_slow_request(timing, elapsed):
+    timing.profiler.disable()
+    if elapsed < SLOW_REQUEST_SECONDS:
+        return
+    calls = io.StringIO()
+    pstats.Stats(timing.profiler, stream=calls).sort_stats('cumulative').print_stats(SLOW_REQUEST_TOP_CALLS)
+    statements = "\n".join(f"  {seconds * 1000:8.2f} ms  {' '.join(statement.split())}" for seconds, statement in timing.statements)
+    logging.warning(
+        f"Slow request {request.method} {request.full_path} took {elapsed * 1000:.0f} ms "
+        f"({timing.sql_count} SQL statements, {timing.sql_seconds * 1000:.0f} ms; "
+        f"{timing.model_calls} model calls, {timing.model_seconds * 1000:.0f} ms; "
+        f"storage {timing.storage_seconds * 1000:.0f} ms)\nSQL:\n{statements}\nCalls:\n{calls.getvalue()}"
+    )
+
+def _finish_request(response):
+    timing = g.pop('request_timing', None)
+    if timing is None:
+        return response
+    elapsed = time.perf_counter() - timing.start
+    blueprint = _blueprint()
+    request_seconds.observe(blueprint, elapsed)
+    requests_total.inc((blueprint, str(response.status_code)))
+    parts = [f'db;dur={timing.sql_seconds * 1000:.1f};desc="SQL x{timing.sql_count}"']
+    if timing.model_calls:
+        parts.append(f'model;dur={timing.model_seconds * 1000:.1f};desc="Gemini x{timing.model_calls}"')
+    if timing.storage_seconds:
+        parts.append(f'storage;dur={timing.storage_seconds * 1000:.1f};desc="Blob storage"')
+    parts.append(f'total;dur={elapsed * 1000:.1f}')
+    # Streamed bodies are produced after this point, so their work is not included
+    response.headers['Server-Timing'] = ', '.join(parts)
+    if timing.profiler is not None:
+        _log_slow_request(timing, elapsed)
+    return response
+
+def init_request_metrics(app):
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+def _format_labels(names, values):
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, values)) + '}'
+
+def _render_histogram(lines, name, help_text, histogram):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for blueprint, series in sorted(histogram.series().items()):
+        for bound, count in zip(histogram.buckets, series):
+            lines.append(f'{name}_bucket{{blueprint="{blueprint}",le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{blueprint="{blueprint}",le="+Inf"}} {series[-2]}')
+        lines.append(f'{name}_count{{blueprint="{blueprint}"}} {series[-2]}')
+        lines.append(f'{name}_sum{{blueprint="{blueprint}"}} {series[-1]:.6f}')
+
+def _render_counter(lines, name, help_text, counter, label_names):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for labels, value in sorted(counter.values().items()):
+        lines.append(f'{name}{_format_labels(label_names, labels)} {value}')
+
+def _render_gauges(lines, name, help_text, samples, metric_type='gauge'):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {metric_type}')
+    for labels, value in samples:
+        if value is not None:
+            lines.append(f'{name}{_format_labels(*zip(*labels)) if labels else ""} {value}')
+
+def render_prometheus(pools=None, uploads=None, model=None):
+    """The process's metrics in Prometheus text format; pools, uploads and model are the
+    pool_metrics(), upload_metrics.snapshot() and model_metrics.snapshot() dicts, when given."""
+    lines = []
+    _render_histogram(lines, 'caresync_request_seconds', 'Request wall time.', request_seconds)
+    _render_counter(lines, 'caresync_requests_total', 'Requests by response status.', requests_total, ('blueprint', 'status'))
+    _render_histogram(lines, 'caresync_sql_seconds', 'Time per SQL statement.', sql_seconds)
+    _render_counter(lines, 'caresync_sql_statements_total', 'SQL statements executed.', sql_statements_total, ('blueprint',))
+    _render_histogram(lines, 'caresync_model_seconds', 'Time per Gemini call.', model_seconds)
+    _render_counter(lines, 'caresync_model_calls_total', 'Gemini calls.', model_calls_total, ('blueprint',))
+    _render_counter(lines, 'caresync_model_tokens_total', 'Gemini tokens used.', model_tokens_total, ('blueprint', 'kind'))
+    _render_histogram(lines, 'caresync_storage_seconds', 'Time per document storage operation.', storage_seconds)
+    if pools:
+        for key, metric_type in (('checked_out', 'gauge'), ('idle', 'gauge'), ('overflow', 'gauge'), ('size', 'gauge'),
+                                 ('checkouts', 'counter'), ('waits', 'counter'), ('timeouts', 'counter'), ('wait_seconds', 'counter')):
+            suffix = '_total' if metric_type == 'counter' else ''
+            _render_gauges(lines, f'caresync_pool_{key}{suffix}', f'Connection pool {key.replace("_", " ")}.', [
+                ((('pool', name),), stats.get(key)) for name, stats in sorted(pools.items())
+            ], metric_type)
+    if uploads:
+        for key in ('uploads', 'failures', 'bytes', 'skipped'):
+            _render_gauges(lines, f'caresync_upload_{key}_total', f'Document uploads: {key}.', [((), uploads[key])], 'counter')
+    if model:
+        for key in ('successes', 'failures', 'retries', 'timeouts', 'rejected_open', 'rejected_busy'):
+            _render_gauges(lines, f'caresync_model_{key}_total', f'Gemini calls: {key.replace("_", " ")}.', [((), model[key])], 'counter')
+        _render_gauges(lines, 'caresync_model_in_flight', 'Gemini calls in flight.', [((), model['in_flight'])])
+        _render_gauges(lines, 'caresync_model_breaker_open', 'Whether the Gemini circuit breaker is open (1) or half open (0.5).', [
+            ((), {'closed': 0, 'half_open': 0.5, 'open': 1}[model['breaker_state']])
+        ])
+    return '\n'.join(lines) + '\n'
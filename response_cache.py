@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from functools import wraps
+from flask import g, has_request_context, request, make_response
+from clients import get_client
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '3600'))
+
+# Every cached response is stored under the user's current version. A write bumps the
+# version, so entries computed before (or during) the write can never be served again.
+
+class FileResponseStore:
+    """Stores responses on local disk, shared by all workers on the host."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, 'versions'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'entries'), exist_ok=True)
+
+    def _path(self, kind, user_id, *parts):
+        # user_id becomes a directory name; callers pass cache_user_key()'s digits, never raw input
+        if not user_id.isdigit():
+            raise ValueError(f"Invalid user id {user_id!r}")
+        return os.path.join(self.root, kind, user_id, *parts)
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'w') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def version(self, user_id):
+        try:
+            with open(self._path('versions', user_id)) as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            return '0'
+
+    def bump(self, user_id):
+        self._write(self._path('versions', user_id), str(time.time_ns()))
+        shutil.rmtree(self._path('entries', user_id), ignore_errors=True)
+
+    def last_write(self, user_id):
+        # The version file is rewritten on every bump, so its mtime is the user's last write
+        try:
+            return os.path.getmtime(self._path('versions', user_id))
+        except FileNotFoundError:
+            return 0.0
+
+    def get(self, user_id, key):
+        path = self._path('entries', user_id, key)
+        try:
+            if time.time() - os.path.getmtime(path) > RESPONSE_CACHE_TTL:
+                return None
+            with open(path) as file:
+                return file.read()
+        except (FileNotFoundError, OSError):
+            return None
+
+    def set(self, user_id, key, value):
+        directory = self._path('entries', user_id)
+        os.makedirs(directory, exist_ok=True)
+        self._write(os.path.join(directory, key), value)
+
+class RedisResponseStore:
+    """Stores responses in Redis, shared by every worker and host."""
+
+    def __init__(self, url):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+
+    def version(self, user_id):
+        version = self.redis.get(f"response_cache:version:{user_id}")
+        return version.decode('utf-8') if version else '0'
+
+    def bump(self, user_id):
+        pipeline = self.redis.pipeline()
+        pipeline.incr(f"response_cache:version:{user_id}")
+        pipeline.set(f"response_cache:written:{user_id}", time.time(), ex=RESPONSE_CACHE_TTL)
+        pipeline.execute()
+
+    def last_write(self, user_id):
+        written = self.redis.get(f"response_cache:written:{user_id}")
+        return float(written) if written else 0.0
+
+    def get(self, user_id, key):
+        value = self.redis.get(f"response_cache:entry:{user_id}:{key}")
+        return value.decode('utf-8') if value else None
+
+    def set(self, user_id, key, value):
+        self.redis.setex(f"response_cache:entry:{user_id}:{key}", RESPONSE_CACHE_TTL, value)
+
+def _build_store():
+    url = os.getenv('RESPONSE_CACHE_URL')
+    if url and url.startswith('redis'):
+        return RedisResponseStore(url)
+    return FileResponseStore(os.getenv('RESPONSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'caresync-response-cache')))
+
+def get_response_store():
+    return get_client('response_store', _build_store)
+
+def cache_user_key(user_id):
+    """The user's id as the store keys it; raises ValueError for anything but an integer,
+    since the file store builds paths from it."""
+    if isinstance(user_id, bool):
+        raise ValueError(f"Invalid user id {user_id!r}")
+    if isinstance(user_id, str) and not user_id.strip().isdigit():
+        raise ValueError(f"Invalid user id {user_id!r}")
+    return str(int(user_id))
+
+def invalidate_user(user_id):
+    """Drops every cached read response for the user; call after a committed write."""
+    if user_id is None:
+        return
+    try:
+        get_response_store().bump(cache_user_key(user_id))
+    except Exception as e:
+        logging.error(f"Error invalidating response cache for user {user_id}: {e}")
+
+def skip_response_cache():
+    """Keeps the current request's response out of the cache, e.g. when it carries a fallback
+    that a later request should replace."""
+    if has_request_context():
+        g.skip_response_cache = True
+
+def cached_user_response(view):
+    """Caches a per-user GET view's successful responses and answers conditional requests."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            user_id = cache_user_key(kwargs['user_id'])
+        except (TypeError, ValueError):
+            # Not a user id the cache can key on; the view answers it uncached
+            return view(*args, **kwargs)
+        try:
+            store = get_response_store()
+            version = store.version(user_id)
+        except Exception as e:
+            logging.error(f"Response cache unavailable: {e}")
+            return view(*args, **kwargs)
+
+        key = f"{version}-{hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()}"
+        cached = store.get(user_id, key)
+        if cached:
+            entry = json.loads(cached)
+            response = make_response(entry['body'], 200)
+            response.mimetype = entry['mimetype']
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed or g.pop('skip_response_cache', False):
+                return response
+            entry = {'body': response.get_data(as_text=True), 'mimetype': response.mimetype}
+            try:
+                store.set(user_id, key, json.dumps(entry))
+            except Exception as e:
+                logging.error(f"Error storing cached response: {e}")
+
+        response.set_etag(hashlib.sha1(entry['body'].encode('utf-8')).hexdigest())
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+    return wrapper
@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import os
+import time
+import numpy as np
+import yaml
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func
+from models import db, MLModelData, LifestyleInformation, PredictionResults
+from sharding import each_shard
+from clients import get_client
+
+SCORING_CHUNK_SIZE = 5000
+# The trained model artifact; without one, nothing is scored
+RISK_MODEL_PATH = os.getenv('RISK_MODEL_PATH')
+
+SMOKING_LEVELS = {'Never': 0.0, 'Former': 0.5, 'Current': 1.0}
+ALCOHOL_LEVELS = {'None': 0.0, 'Light': 1.0, 'Moderate': 2.0, 'Heavy': 3.0}
+ACTIVITY_LEVELS = {'None': 0.0, 'Light': 1.0, 'Moderate': 2.0, 'High': 3.0}
+STRESS_LEVELS = {'Low': 0.0, 'Medium': 1.0, 'High': 2.0}
+
+class RiskModel:
+    """Logistic models for every condition, compiled into one weight matrix.
+
+    Built from the training job's artifact, a YAML (or JSON) document with `thresholds` (Medium,
+    High), `features` ({name: [mean, scale]}) and `conditions` ({name: {intercept, weights}}).
+    """
+
+    def __init__(self, config):
+        self.feature_names = list(config['features'])
+        self.means = np.array([config['features'][name][0] for name in self.feature_names], dtype=np.float64)
+        self.scales = np.array([config['features'][name][1] for name in self.feature_names], dtype=np.float64)
+        self.conditions = list(config['conditions'])
+        self.intercepts = np.array([config['conditions'][name]['intercept'] for name in self.conditions], dtype=np.float64)
+        self.weights = np.zeros((len(self.feature_names), len(self.conditions)), dtype=np.float64)
+        for column, condition in enumerate(self.conditions):
+            for feature, weight in config['conditions'][condition]['weights'].items():
+                self.weights[self.feature_names.index(feature), column] = weight
+        self.medium_threshold = config['thresholds']['Medium']
+        self.high_threshold = config['thresholds']['High']
+
+    def predict(self, features):
+        """Returns an (n_users, n_conditions) array of probabilities."""
+        z = (features - self.means) / self.scales
+        return 1.0 / (1.0 + np.exp(-(z @ self.weights + self.intercepts)))
+
+    def risk_levels(self, probabilities):
+        levels = np.full(probabilities.shape, 'Low', dtype=object)
+        levels[probabilities >= self.medium_threshold] = 'Medium'
+        levels[probabilities >= self.high_threshold] = 'High'
+        return levels
+
+def _load_risk_model():
+    with open(RISK_MODEL_PATH, 'r') as file:
+        return RiskModel(yaml.safe_load(file))
+
+def get_risk_model():
+    """The trained model at RISK_MODEL_PATH, or None when none is configured."""
+    if not RISK_MODEL_PATH:
+        return None
+    return get_client('risk_model', _load_risk_model)
+
+def _feature_columns():
+    return [
+        MLModelData.user_id, MLModelData.Age, MLModelData.BMI, MLModelData.Systolic_BP, MLModelData.Diastolic_BP,
+        MLModelData.Cholesterol_Total, MLModelData.Cholesterol_HDL, MLModelData.Cholesterol_LDL,
+        MLModelData.Triglycerides, MLModelData.Blood_Glucose_Fasting, MLModelData.HbA1c,
+        func.coalesce(LifestyleInformation.smoking_status, MLModelData.Smoking_Status),
+        func.coalesce(LifestyleInformation.alcohol_consumption, MLModelData.Alcohol_Consumption),
+        func.coalesce(LifestyleInformation.physical_activity, MLModelData.Physical_Activity),
+        func.coalesce(LifestyleInformation.stress_level, MLModelData.Stress_Level),
+        func.coalesce(LifestyleInformation.sleep_hours, MLModelData.Sleep_Hours),
+        func.coalesce(LifestyleInformation.family_history_CVD, MLModelData.Family_History_CVD),
+        func.coalesce(LifestyleInformation.family_history_diabetes, MLModelData.Family_History_Diabetes),
+        func.coalesce(LifestyleInformation.family_history_cancer, MLModelData.Family_History_Cancer)
+    ]
+
+def _feature_vector(row, model):
+    # Looked up by the artifact's feature names, in the artifact's order
+    values = {
+        'age': row[1], 'bmi': row[2], 'systolic_bp': row[3], 'diastolic_bp': row[4],
+        'cholesterol_total': row[5], 'cholesterol_hdl': row[6], 'cholesterol_ldl': row[7],
+        'triglycerides': row[8], 'blood_glucose_fasting': row[9], 'hba1c': row[10],
+        'smoking': SMOKING_LEVELS.get(row[11]), 'alcohol': ALCOHOL_LEVELS.get(row[12]),
+        'physical_activity': ACTIVITY_LEVELS.get(row[13]), 'stress': STRESS_LEVELS.get(row[14]),
+        'sleep_hours': row[15], 'family_history_cvd': row[16],
+        'family_history_diabetes': row[17], 'family_history_cancer': row[18]
+    }
+    # Missing inputs fall back to the population mean, i.e. a neutral contribution
+    return [
+        float(values[name]) if values[name] is not None else model.means[index]
+        for index, name in enumerate(model.feature_names)
+    ]
+
+def load_features(model, user_ids=None, after_user_id=0, limit=SCORING_CHUNK_SIZE):
+    """Loads the feature matrix for a chunk of users from their newest MLModelData row."""
+    latest = db.session.query(
+        MLModelData.user_id, func.max(MLModelData.model_data_id).label('model_data_id')
+    ).filter(MLModelData.user_id > after_user_id).group_by(MLModelData.user_id)
+    if user_ids is not None:
+        latest = latest.filter(MLModelData.user_id.in_(user_ids))
+    latest = latest.subquery()
+
+    rows = db.session.query(*_feature_columns()).join(
+        latest, latest.c.model_data_id == MLModelData.model_data_id
+    ).outerjoin(
+        LifestyleInformation, LifestyleInformation.user_id == MLModelData.user_id
+    ).filter(MLModelData.user_id > after_user_id).order_by(MLModelData.user_id).limit(limit).all()
+
+    seen = set()
+    ids = []
+    features = []
+    for row in rows:
+        # Users with several lifestyle rows would otherwise be scored twice
+        if row[0] in seen:
+            continue
+        seen.add(row[0])
+        ids.append(row[0])
+        features.append(_feature_vector(row, model))
+    return np.array(ids, dtype=np.int64), np.array(features, dtype=np.float64).reshape(len(ids), len(model.feature_names))
+
+def _fingerprints(features, model):
+    # Hash the features together with the model so a coefficient change rescores everyone
+    model_key = np.concatenate([model.intercepts, model.weights.ravel()]).tobytes()
+    return [hashlib.sha256(model_key + row.tobytes()).hexdigest() for row in features]
+
+def score_chunk(model, user_ids, features, force=False):
+    """Scores one chunk and bulk-replaces PredictionResults for users whose inputs changed."""
+    if len(user_ids) == 0:
+        return 0
+    fingerprints = _fingerprints(features, model)
+    id_list = [int(user_id) for user_id in user_ids]
+
+    if not force:
+        existing = dict(db.session.query(PredictionResults.user_id, PredictionResults.input_fingerprint).filter(
+            PredictionResults.user_id.in_(id_list)
+        ).distinct().all())
+        changed = [index for index, user_id in enumerate(id_list) if existing.get(user_id) != fingerprints[index]]
+    else:
+        changed = list(range(len(id_list)))
+    if not changed:
+        return 0
+
+    probabilities = model.predict(features[changed])
+    levels = model.risk_levels(probabilities)
+    changed_ids = [id_list[index] for index in changed]
+
+    PredictionResults.query.filter(
+        PredictionResults.user_id.in_(changed_ids),
+        PredictionResults.condition_name.in_(model.conditions)
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(PredictionResults, [
+        {
+            'user_id': changed_ids[row],
+            'condition_name': condition,
+            'probability': round(float(probabilities[row, column]), 2),
+            'risk_level': levels[row, column],
+            'input_fingerprint': fingerprints[changed[row]]
+        }
+        for row in range(len(changed_ids))
+        for column, condition in enumerate(model.conditions)
+    ])
+    db.session.commit()
+    return len(changed_ids)
+
+def score_users(user_ids=None, force=False):
+    """Scores the given users (or everyone) in chunks; returns (users_seen, users_rescored).
+
+    Without a configured model nobody is scored, and existing PredictionResults are left as they are.
+    """
+    model = get_risk_model()
+    if model is None:
+        return 0, 0
+    seen = 0
+    rescored = 0
+    after_user_id = 0
+    while True:
+        ids, features = load_features(model, user_ids=user_ids, after_user_id=after_user_id)
+        if len(ids) == 0:
+            break
+        rescored += score_chunk(model, ids, features, force=force)
+        seen += len(ids)
+        after_user_id = int(ids[-1])
+        db.session.expunge_all()
+    return seen, rescored
+
+def score_user(user_id):
+    try:
+        return score_users([user_id])[1]
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error scoring risk for user {user_id}: {e}")
+        return 0
+
+@click.command('score-risk')
+@click.option('--force', is_flag=True, help='Rescore every user even if inputs are unchanged.')
+@with_appcontext
+def score_risk_command(force):
+    """Populate PredictionResults for users whose inputs changed."""
+    if get_risk_model() is None:
+        click.echo("RISK_MODEL_PATH is not set; no risk model to score with")
+        return
+    start = time.perf_counter()
+    seen = rescored = 0
+    for _ in each_shard():
+        shard_seen, shard_rescored = score_users(force=force)
+        seen += shard_seen
+        rescored += shard_rescored
+    elapsed = time.perf_counter() - start
+    rate = seen / elapsed if elapsed else 0
+    click.echo(f"Scored {rescored} of {seen} users in {elapsed:.2f}s ({rate:.0f} users/s)")
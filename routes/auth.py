@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify
 from models import db, User, UserProfile, InsurancePlans
 from utils import hash_password, check_password
+from passwords import needs_rehash, PasswordHashingBusy
+from response_cache import cached_user_response
+from read_routing import replica_reads
+from sharding import sharding_enabled, register_user, find_user, user_shard, use_shard, ShardMoving
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -13,11 +17,22 @@ def register():
     if not email or not password:
         return jsonify({'message': 'Email and password are required'}), 400
 
-    if User.query.filter_by(email=email).first():
-        return jsonify({'message': 'User already exists'}), 409
-
-    hashed_password = hash_password(password)
-    new_user = User(email=email, password_hash=hashed_password)
+    try:
+        if sharding_enabled():
+            # Emails are only unique per shard, so the directory is the authority
+            if find_user(email):
+                return jsonify({'message': 'User already exists'}), 409
+            hashed_password = hash_password(password)
+            user_id, shard = register_user(email)
+            use_shard(shard)
+            new_user = User(user_id=user_id, email=email, password_hash=hashed_password)
+        elif User.query.filter_by(email=email).first():
+            return jsonify({'message': 'User already exists'}), 409
+        else:
+            hashed_password = hash_password(password)
+            new_user = User(email=email, password_hash=hashed_password)
+    except PasswordHashingBusy as e:
+        return jsonify({'message': 'Server is busy, please retry'}), 503, e.headers()
     db.session.add(new_user)
     db.session.commit()
 
@@ -32,14 +47,37 @@ def login():
     if not email or not password:
         return jsonify({'message': 'Email and password are required'}), 400
 
+    if sharding_enabled():
+        placement = find_user(email)
+        if not placement:
+            return jsonify({'message': 'Invalid email or password'}), 401
+        try:
+            use_shard(user_shard(placement[0]))
+        except ShardMoving:
+            return jsonify({'message': 'Account is being moved, please retry'}), 503, {'Retry-After': '3'}
+
     user = User.query.filter_by(email=email).first()
 
-    if user and check_password(user.password_hash, password):
+    try:
+        valid = user is not None and check_password(user.password_hash, password)
+    except PasswordHashingBusy as e:
+        return jsonify({'message': 'Server is busy, please retry'}), 503, e.headers()
+    if valid:
+        # Upgrade hashes made at an older cost while the plain password is at hand
+        if needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hash_password(password)
+                db.session.commit()
+            except PasswordHashingBusy:
+                # The login itself succeeded; the upgrade waits for the next one
+                pass
         return jsonify({'UserID': user.user_id, 'message': 'Login successful', 'user_details': user.user_details}), 200
     else:
         return jsonify({'message': 'Invalid email or password'}), 401
 
 @auth_bp.route('/user-details-status/<int:user_id>', methods=['GET'])
+@cached_user_response
+@replica_reads
 def get_user_details_status(user_id):
     # Query User and UserProfile using correct joins, without including InsurancePlans
     user_data = db.session.query(User, UserProfile).join(
@@ -8,7 +8,9 @@ import base64
 from io import BytesIO
 import dotenv
 import re
-import google.generativeai as genai  # Import Google Gemini API
+from model_client import generate_content, ModelUnavailable
+from response_cache import cached_user_response, invalidate_user
+from read_routing import replica_reads
 
 # Load environment variables
 dotenv.load_dotenv()
@@ -16,10 +18,6 @@ dotenv.load_dotenv()
 # Initialize blueprint
 claim_bp = Blueprint('claim', __name__)
 
-# Configure Generative AI API
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-1.5-flash-latest')
-
 @claim_bp.route('/process_claim', methods=['POST'])
 def process_claim_api():
     try:
@@ -61,9 +59,13 @@ def process_claim_api():
             )
             db.session.add(new_claim_status)
             db.session.commit()
+            invalidate_user(user_id)
 
         return jsonify({"message": "Claim processed successfully"}), 200
 
+    except ModelUnavailable as e:
+        logging.error(f"Gemini unavailable: {str(e)}")
+        return jsonify({"error": "Claim processing is temporarily unavailable, please retry"}), 503, e.headers()
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}")
         return jsonify({"error": "An internal error occurred"}), 500
@@ -77,7 +79,7 @@ def process_claim(bill_base64, mime_type, reason_for_treatment, user_id):
         Extract the exact text content from the hospital bill. Do not alter or interpret the content.
         Provide the extracted text as is.
         """
-        genai_response = model.generate_content([prompt, {"mime_type": mime_type, "data": bill_base64}])
+        genai_response = generate_content([prompt, {"mime_type": mime_type, "data": bill_base64}])
 
         if not genai_response or not genai_response.text:
             logging.error("No response from Gemini API or response is empty.")
@@ -86,6 +88,8 @@ def process_claim(bill_base64, mime_type, reason_for_treatment, user_id):
         bill_text = genai_response.text.strip()
         logging.info(f"Extracted bill text: {bill_text}")
 
+    except ModelUnavailable:
+        raise
     except Exception as e:
         logging.error(f"Error processing hospital bill: {str(e)}")
         return {"error": f"Error processing hospital bill: {str(e)}"}
@@ -169,7 +173,7 @@ def verify_treatment(reason, medical_details, bill_text, query):
     Return format: 'Answer: Claim Approved/Claim Cancelled/Claim in review. Reason: <reason>'
     """
     
-    response = model.generate_content(prompt)
+    response = generate_content(prompt)
     response_text = response.text.strip()
     logging.info(f"Response from Gemini: {response_text}")
     
@@ -185,6 +189,8 @@ def verify_treatment(reason, medical_details, bill_text, query):
 
 
 @claim_bp.route('/retrieve_claims/<int:user_id>', methods=['GET'])
+@cached_user_response
+@replica_reads
 def retrieve_claims(user_id):
     try:
         # Fetch claim statuses for the given user_id with required details
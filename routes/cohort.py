@@ -0,0 +1,30 @@
+from flask import Blueprint, request, jsonify
+from cohort_store import member_percentiles, health_distribution, GENDER_CODES
+
+cohort_bp = Blueprint('cohort', __name__)
+
+@cohort_bp.route('/percentiles/<int:user_id>', methods=['GET'])
+def get_member_percentiles(user_id):
+    try:
+        result = member_percentiles(user_id)
+        if result is None:
+            return jsonify({"error": "No cohort data for this user"}), 404
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"Error computing cohort percentiles: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@cohort_bp.route('/health-distribution', methods=['GET'])
+def get_health_distribution():
+    age_band = request.args.get('age_band', type=int)
+    gender = request.args.get('gender')
+    if gender is not None and gender not in GENDER_CODES:
+        return jsonify({"error": "Unknown gender"}), 400
+    try:
+        result = health_distribution(age_band=age_band, gender=gender)
+        if result is None:
+            return jsonify({"error": "Cohort store has not been built yet"}), 503
+        return jsonify(result), 200
+    except Exception as e:
+        print(f"Error computing health distribution: {e}")
+        return jsonify({"error": str(e)}), 500
@@ -1,47 +1,27 @@
-import os
 import re
 import logging
 from flask import Blueprint, request, jsonify
 from models import db
 from utils import clean_json_response
-from langchain_community.utilities.sql_database import SQLDatabase
-from dotenv import load_dotenv
+from clients import get_sql_database
+from sharding import sharding_enabled, user_shard, ShardMoving
+from model_client import generate_content, ModelUnavailable
 from sqlalchemy.exc import SQLAlchemyError
-import google.generativeai as genai  # Import Google Gemini API
 
 context_bp = Blueprint('context', __name__)
 
-# Load environment variables
-load_dotenv()
-
-# Verify and load SQLALCHEMY_DATABASE_URI
-database_uri = os.getenv('SQLALCHEMY_DATABASE_URI')
-if not database_uri:
-    raise ValueError("SQLALCHEMY_DATABASE_URI is not set in the environment variables.")
-
-# Initialize Gemini API
-gemini_api_key = os.getenv("GEMINI_API_KEY")
-if not gemini_api_key:
-    raise ValueError("GEMINI_API_KEY is not set in the environment variables.")
-genai.configure(api_key=gemini_api_key)
-
-# Initialize the SQL database connection
-db_llm = SQLDatabase.from_uri(database_uri)
-
-# Initialize the LLM (using Gemini as the model)
-llm = genai.GenerativeModel('gemini-1.5-flash-latest')
-
 # Cache schema information to reduce repeated fetches
 db_schema_cache = None
 
 # Dictionary to store chat history for each user
 user_chat_history = {}
 
-def get_db_schema():
+def get_db_schema(sql_database):
+    # Every shard holds the same tables, so one copy serves them all
     global db_schema_cache
     if db_schema_cache is None:
         try:
-            db_schema_cache = db_llm.get_table_info()
+            db_schema_cache = sql_database.get_table_info()
         except SQLAlchemyError as e:
             logging.error(f"Error fetching schema info: {e}")
             raise
@@ -68,13 +48,26 @@ def process_context():
     if not question:
         return jsonify({"error": "No context provided"}), 400
 
+    shard = None
+    if sharding_enabled():
+        # The primary only holds the shard directory; the user's rows are on their shard
+        if user_id is None:
+            return jsonify({"error": "userId is required"}), 400
+        try:
+            shard = user_shard(user_id)
+        except ShardMoving:
+            return jsonify({"error": "User data is being moved, please retry"}), 503, {'Retry-After': '3'}
+        except (TypeError, ValueError):
+            return jsonify({"error": "userId must be an integer"}), 400
+    sql_database = get_sql_database(shard)
+
     # Fetch the chat history for context
     chat_history = get_chat_history(user_id)
     history_context = "\n".join(
         [f"Q: {item['question']}\nA: {item['answer']}" for item in chat_history]
     )
 
-    db_schema = get_db_schema()
+    db_schema = get_db_schema(sql_database)
     prompt = f"""
         You are an expert in converting English questions to SQL query!
         The SQL database has tables, and these are the schemas: {db_schema}. 
@@ -92,12 +85,15 @@ def process_context():
 
     # Enhanced error handling for blocked responses
     try:
-        genai_response = llm.generate_content(prompt)
+        genai_response = generate_content(prompt)
         response_text = genai_response.text.strip()
         if not response_text:
             # Log detailed information if response is blocked
             logging.error(f"Blocked response from Gemini API: {genai_response}")
             return jsonify({"error": "No valid response from Gemini API or response blocked. Check content moderation settings."}), 500
+    except ModelUnavailable as e:
+        logging.error(f"Gemini unavailable: {e}")
+        return jsonify({"error": "The assistant is temporarily unavailable, please retry"}), 503, e.headers()
     except Exception as e:
         logging.error(f"Error calling Gemini API: {str(e)}")
         return jsonify({"error": f"Error calling Gemini API: {str(e)}"}), 500
@@ -109,7 +105,7 @@ def process_context():
         print(f"Generated SQL Query: {sql_query}")
         sql_response = f"Generated SQL Query: {sql_query}"
         try:
-            result = db_llm.run(sql_query)
+            result = sql_database.run(sql_query)
             sql_response += f"\nQuery Result: {result}"
             print(f"Query Result: {result}")
         except Exception as e:
@@ -128,8 +124,11 @@ def process_context():
         """
 
         try:
-            answer_response = llm.generate_content(answer_prompt)
+            answer_response = generate_content(answer_prompt)
             answer_text = answer_response.text.strip()
+        except ModelUnavailable as e:
+            logging.error(f"Gemini unavailable: {e}")
+            return jsonify({"error": "The assistant is temporarily unavailable, please retry"}), 503, e.headers()
         except Exception as e:
             logging.error(f"Error calling Gemini API for answer generation: {str(e)}")
             return jsonify({"error": f"Error generating answer: {str(e)}"}), 500
@@ -151,8 +150,11 @@ def process_context():
         """
 
         try:
-            fallback_response = llm.generate_content(fallback_answer_prompt)
+            fallback_response = generate_content(fallback_answer_prompt)
             fallback_answer_text = fallback_response.text.strip()
+        except ModelUnavailable as e:
+            logging.error(f"Gemini unavailable: {e}")
+            return jsonify({"error": "The assistant is temporarily unavailable, please retry"}), 503, e.headers()
         except Exception as e:
             logging.error(f"Error calling Gemini API for fallback answer: {str(e)}")
             return jsonify({"error": f"Error generating fallback answer: {str(e)}"}), 500
@@ -1,101 +1,198 @@
-from flask import Blueprint, jsonify, request
-from models import db, UserProfile, HealthInformation, LifestyleInformation, MLModelData, Prescription, ClaimStatus, InsurancePlans
-from datetime import datetime, date
-from sqlalchemy import func
-import google.generativeai as genai
-import os
-
-# Load environment variables for AI API keys
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-1.5-flash-latest')
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from models import db, UserProfile, LifestyleInformation, MLModelData, Prescription, ClaimStatus, InsurancePlans
+from collections import namedtuple
+import json
+from sqlalchemy import and_, func, case
+from health_tips import get_health_tip
+from response_cache import cached_user_response
+from read_routing import replica_reads
+from user_context import load_user_context
+from sharding import group_by_shard, use_shard
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
-def generate_health_tip(user_profile, lifestyle_info):
-    prompt = f"""
-    Based on the following user profile and lifestyle data, generate a personalized health improvement tip.
-    User Profile:
-    - Age: {user_profile.age}
-    - Gender: {user_profile.gender}
-    - Height: {user_profile.height} cm
-    - Weight: {user_profile.weight} kg
-
-    Lifestyle Information:
-    - Smoking Status: {lifestyle_info.smoking_status}
-    - Alcohol Consumption: {lifestyle_info.alcohol_consumption}
-    - Physical Activity: {lifestyle_info.physical_activity}
-    - Stress Level: {lifestyle_info.stress_level}
-    - Sleep Hours: {lifestyle_info.sleep_hours}
-
-    Provide a concise and actionable health tip for the user. Below 200 characters
-    """
-    try:
-        response = model.generate_content(prompt)
-
-        return response.text.strip()
-    except Exception as e:
-        print(f"AI error: {e}")
-        return "Stay active and maintain a balanced diet for optimal health."
+MAX_BATCH_USERS = 1000
+BATCH_CHUNK_SIZE = 100
+
+DashboardSummary = namedtuple('DashboardSummary', [
+    'insurance_count', 'insurance_expiration', 'claims_approved',
+    'claims_in_review', 'claims_rejected', 'last_prescription_date'
+])
+
+def load_dashboard_summary(user_id):
+    """Computes claim counts, insurance expiry and the latest prescription date in one round trip."""
+    claims = db.session.query(
+        func.count(case((ClaimStatus.decision == 'Claim Approved', 1))).label('approved'),
+        func.count(case((ClaimStatus.decision == 'Claim in review', 1))).label('in_review'),
+        func.count(case((ClaimStatus.decision == 'Claim Cancelled', 1))).label('rejected')
+    ).filter(ClaimStatus.user_id == user_id).subquery()
+
+    insurance_count = db.session.query(func.count(InsurancePlans.plan_id)).filter(
+        InsurancePlans.user_id == user_id
+    ).scalar_subquery()
+    insurance_expiration = db.session.query(func.max(InsurancePlans.expiration_date)).filter(
+        InsurancePlans.user_id == user_id
+    ).scalar_subquery()
+    last_prescription_date = db.session.query(func.max(Prescription.date)).filter(
+        Prescription.user_id == user_id
+    ).scalar_subquery()
+
+    return db.session.query(
+        insurance_count.label('insurance_count'),
+        insurance_expiration.label('insurance_expiration'),
+        claims.c.approved.label('claims_approved'),
+        claims.c.in_review.label('claims_in_review'),
+        claims.c.rejected.label('claims_rejected'),
+        last_prescription_date.label('last_prescription_date')
+    ).select_from(claims).one()
+
+def load_dashboard_batch(user_ids):
+    """Fetches dashboard records and summaries for many users with IN-list and grouped queries."""
+    # Only each user's newest MLModelData row, as load_user_context picks for /dashboard/<user_id>
+    latest_ml = db.session.query(
+        MLModelData.user_id, func.max(MLModelData.model_data_id).label('model_data_id')
+    ).filter(MLModelData.user_id.in_(user_ids)).group_by(MLModelData.user_id).subquery()
+    rows = db.session.query(UserProfile, LifestyleInformation, MLModelData).outerjoin(
+        LifestyleInformation, LifestyleInformation.user_id == UserProfile.user_id
+    ).outerjoin(
+        latest_ml, latest_ml.c.user_id == UserProfile.user_id
+    ).outerjoin(
+        MLModelData, and_(MLModelData.user_id == UserProfile.user_id, MLModelData.model_data_id == latest_ml.c.model_data_id)
+    ).filter(UserProfile.user_id.in_(user_ids)).all()
+    records = {row[0].user_id: tuple(row) for row in rows}
+
+    claim_counts = {
+        row.user_id: row for row in db.session.query(
+            ClaimStatus.user_id,
+            func.count(case((ClaimStatus.decision == 'Claim Approved', 1))).label('approved'),
+            func.count(case((ClaimStatus.decision == 'Claim in review', 1))).label('in_review'),
+            func.count(case((ClaimStatus.decision == 'Claim Cancelled', 1))).label('rejected')
+        ).filter(ClaimStatus.user_id.in_(user_ids)).group_by(ClaimStatus.user_id)
+    }
+    insurance = {
+        row.user_id: row for row in db.session.query(
+            InsurancePlans.user_id,
+            func.count(InsurancePlans.plan_id).label('plan_count'),
+            func.max(InsurancePlans.expiration_date).label('expiration')
+        ).filter(InsurancePlans.user_id.in_(user_ids)).group_by(InsurancePlans.user_id)
+    }
+    last_prescriptions = dict(
+        db.session.query(Prescription.user_id, func.max(Prescription.date)).filter(
+            Prescription.user_id.in_(user_ids)
+        ).group_by(Prescription.user_id).all()
+    )
+
+    summaries = {}
+    for user_id in user_ids:
+        claims = claim_counts.get(user_id)
+        plans = insurance.get(user_id)
+        summaries[user_id] = DashboardSummary(
+            insurance_count=plans.plan_count if plans else 0,
+            insurance_expiration=plans.expiration if plans else None,
+            claims_approved=claims.approved if claims else 0,
+            claims_in_review=claims.in_review if claims else 0,
+            claims_rejected=claims.rejected if claims else 0,
+            last_prescription_date=last_prescriptions.get(user_id)
+        )
+    return records, summaries
+
+def build_dashboard_payload(ml_model_data, lifestyle_info, summary, health_tip):
+    # Calculate overall health percentage
+    health_percentage = calculate_health_percentage(ml_model_data)
+
+    payload = {
+        "insurance_count": summary.insurance_count,
+        "insurance_expiration": summary.insurance_expiration.strftime('%Y-%m-%d') if summary.insurance_expiration else None,
+        "claims": {
+            "approved": summary.claims_approved or 0,
+            "in_review": summary.claims_in_review or 0,
+            "rejected": summary.claims_rejected or 0
+        },
+        "last_prescription_date": summary.last_prescription_date.strftime('%Y-%m-%d') if summary.last_prescription_date else None,
+        "health_profile": {
+            "percentage": health_percentage,
+            "status": determine_health_status(health_percentage)
+        },
+        "risk_contributors": identify_risk_contributors(ml_model_data, lifestyle_info)
+    }
+    if health_tip is not None:
+        payload["tip"] = health_tip
+    return payload
 
 @dashboard_bp.route('/dashboard/<int:user_id>', methods=['GET'])
+@cached_user_response
+@replica_reads
 def get_dashboard_data(user_id):
     try:
-        user_profile = UserProfile.query.filter_by(user_id=user_id).first()
-        lifestyle_info = LifestyleInformation.query.filter_by(user_id=user_id).first()
-        ml_model_data = MLModelData.query.filter_by(user_id=user_id).first()
-        prescriptions = Prescription.query.filter_by(user_id=user_id).order_by(Prescription.date.desc()).first()
-        claims = ClaimStatus.query.filter_by(user_id=user_id).all()
-        insurance = InsurancePlans.query.filter_by(user_id=user_id).all()
-
-        if not user_profile or not lifestyle_info or not ml_model_data:
-            return jsonify({"error": "User data is incomplete"}), 400
-
-        # Insurance count and expiration date
-        insurance_count = len(insurance)
-        active_insurance = max(insurance, key=lambda x: x.expiration_date) if insurance else None
-        insurance_expiration = active_insurance.expiration_date.strftime('%Y-%m-%d') if active_insurance else None
-
-        # Claims status counts
-        claims_approved = len([claim for claim in claims if claim.decision == 'Claim Approved'])
-        claims_in_review = len([claim for claim in claims if claim.decision == 'Claim in review'])
-        claims_rejected = len([claim for claim in claims if claim.decision == 'Claim Cancelled'])
+        context = load_user_context(user_id)
+        user_profile, lifestyle_info, ml_model_data = context.profile, context.lifestyle, context.ml_data
 
-        # Last uploaded prescription date
-        last_prescription_date = prescriptions.date.strftime('%Y-%m-%d') if prescriptions else None
-
-        # Calculate overall health percentage
-        health_percentage = calculate_health_percentage(ml_model_data)
+        if not context.has('profile', 'lifestyle', 'ml_data'):
+            return jsonify({"error": "User data is incomplete"}), 400
 
-        # Determine health status
-        health_status = determine_health_status(health_percentage)
+        summary = load_dashboard_summary(user_id)
 
         # Generate AI-based health tip
-        health_tip = generate_health_tip(user_profile, lifestyle_info)
-
-        # Identify risk contributors
-        risk_contributors = identify_risk_contributors(ml_model_data, lifestyle_info)
-
-        return jsonify({
-            "insurance_count": insurance_count,
-            "insurance_expiration": insurance_expiration,
-            "claims": {
-                "approved": claims_approved,
-                "in_review": claims_in_review,
-                "rejected": claims_rejected
-            },
-            "last_prescription_date": last_prescription_date,
-            "health_profile": {
-                "percentage": health_percentage,
-                "status": health_status
-            },
-            "tip": health_tip,
-            "risk_contributors": risk_contributors
-        }), 200
+        health_tip = get_health_tip(user_id, user_profile, lifestyle_info)
+
+        return jsonify(build_dashboard_payload(ml_model_data, lifestyle_info, summary, health_tip)), 200
 
     except Exception as e:
         print(f"Error fetching dashboard data: {e}")
         return jsonify({"error": str(e)}), 500
 
+@dashboard_bp.route('/dashboard/batch', methods=['POST'])
+@replica_reads
+def get_dashboard_batch():
+    data = request.get_json() or {}
+    user_ids = data.get('user_ids')
+    include_tips = bool(data.get('include_tips', False))
+
+    if not isinstance(user_ids, list) or not user_ids:
+        return jsonify({"error": "user_ids must be a non-empty list"}), 400
+    try:
+        user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))
+    except (TypeError, ValueError):
+        return jsonify({"error": "user_ids must be integers"}), 400
+    if len(user_ids) > MAX_BATCH_USERS:
+        return jsonify({"error": f"At most {MAX_BATCH_USERS} user_ids per request"}), 400
+
+    groups, moving = group_by_shard(user_ids)
+    # Each chunk is one query set against a single shard
+    chunks = [
+        (shard, shard_ids[start:start + BATCH_CHUNK_SIZE])
+        for shard, shard_ids in groups.items()
+        for start in range(0, len(shard_ids), BATCH_CHUNK_SIZE)
+    ]
+
+    def generate():
+        # One JSON object per line, flushed a chunk at a time so the panel can render progressively
+        if moving:
+            yield "\n".join(json.dumps({"user_id": user_id, "error": "User data is being moved, please retry"}) for user_id in moving) + "\n"
+        for shard, chunk in chunks:
+            use_shard(shard)
+            try:
+                records, summaries = load_dashboard_batch(chunk)
+            except Exception as e:
+                print(f"Error fetching batch dashboard data: {e}")
+                yield json.dumps({"user_ids": chunk, "error": "Failed to load dashboard data"}) + "\n"
+                continue
+            lines = []
+            for user_id in chunk:
+                user_profile, lifestyle_info, ml_model_data = records.get(user_id, (None, None, None))
+                if not user_profile or not lifestyle_info or not ml_model_data:
+                    lines.append(json.dumps({"user_id": user_id, "error": "User data is incomplete"}))
+                    continue
+                # Never waits on Gemini: users without a tip get the fallback while theirs is generated
+                health_tip = get_health_tip(user_id, user_profile, lifestyle_info, wait=False) if include_tips else None
+                entry = build_dashboard_payload(ml_model_data, lifestyle_info, summaries[user_id], health_tip)
+                entry["user_id"] = user_id
+                lines.append(json.dumps(entry))
+            yield "\n".join(lines) + "\n"
+            db.session.expunge_all()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 def calculate_health_percentage(ml_model_data):
     # A simplified way to calculate health percentage
     # Modify as needed based on specific health metrics from ml_model_data
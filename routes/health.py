@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import db, HealthInformation
+from response_cache import invalidate_user
+from user_context import forget_user_context
+from user_sections import health_information_values, save_section
 
 health_bp = Blueprint('health', __name__)
 
@@ -8,27 +11,9 @@ def add_health_information():
     data = request.get_json()
     user_id = data.get('user_id')
 
-    # Check if the user already has health information
-    health_info = HealthInformation.query.filter_by(user_id=user_id).first()
-
-    if health_info:
-        # Update existing health information
-        health_info.medical_history = data['medical_history']
-        health_info.allergies = data['allergies']
-        health_info.family_medical_history = data['family_medical_history']
-        health_info.current_medications = data['current_medications']
-        message = 'Health information updated successfully'
-    else:
-        # Create new health information record
-        health_info = HealthInformation(
-            user_id=user_id,
-            medical_history=data['medical_history'],
-            allergies=data['allergies'],
-            family_medical_history=data['family_medical_history'],
-            current_medications=data['current_medications']
-        )
-        db.session.add(health_info)
-        message = 'Health information added successfully'
-
+    # Insert or update the user's health information with a single upsert
+    message = save_section(HealthInformation, health_information_values(user_id, data), 'Health information')
     db.session.commit()
+    forget_user_context(user_id)
+    invalidate_user(user_id)
     return jsonify({'message': message}), 201
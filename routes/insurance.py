@@ -1,22 +1,36 @@
-from flask import Blueprint, jsonify
-from models import db, User, UserProfile, HealthInformation, LifestyleInformation, MLModelData, PredictionResults, InsurancePlans, CoverageDetails, Copayments, AdditionalBenefits, PolicyExclusions
+from flask import Blueprint, jsonify, request
+from models import db, InsurancePlans, CoverageDetails, Copayments, AdditionalBenefits, PolicyExclusions
+from sqlalchemy import insert
 from datetime import date, timedelta
+from collections import Counter, OrderedDict
+import hashlib
+import json
 import random
-import yaml
-
-# Load YAML configuration
-with open('config.yml', 'r') as file:
-    insurance_config = yaml.safe_load(file)['insurance']
+import threading
+from pricing import TIERS, get_pricing_tables, get_pricing_digest
+from response_cache import invalidate_user
+from read_routing import replica_reads
+from user_context import load_user_context
 
 # Initialize blueprint
 insurance_bp = Blueprint('insurance', __name__)
 
+QUOTE_CACHE_SIZE = 1024
+BENEFIT_COUNTS = {"Bronze": 2, "Silver": 3, "Gold": 4, "Platinum": 5}
+
+# Quote grids keyed by a fingerprint of the pricing inputs (LRU)
+_quote_cache = OrderedDict()
+_quote_cache_lock = threading.Lock()
+
 # Insurance Plan Generator
 class InsurancePlanGenerator:
-    def __init__(self):
-        self.companies = insurance_config['companies']
-        self.plan_types = insurance_config['plan_types']
-        self.network_types = insurance_config['network_types']
+    def __init__(self, seed=None):
+        self.config = get_pricing_tables()
+        # Seeded per user and inputs so identical requests produce identical plans
+        self.rng = random.Random(seed)
+        self.companies = self.config['companies']
+        self.plan_types = self.config['plan_types']
+        self.network_types = self.config['network_types']
 
     def generate_plan(self, user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions):
         plan = self._generate_fallback_plan(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
@@ -25,10 +39,10 @@ class InsurancePlanGenerator:
     def _generate_fallback_plan(self, user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions):
         risk_score = self._calculate_risk_score(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
         coverage_type = self._determine_coverage_type(risk_score, user_profile.annual_income)
-        network_type = random.choice(self.network_types)
+        network_type = self.rng.choice(self.network_types)
 
         plan = {
-            "company": random.choice(self.companies),
+            "company": self.rng.choice(self.companies),
             "plan_name": f"{coverage_type} {network_type} Health Shield",
             "plan_type": self._determine_plan_type(user_profile, risk_predictions),
             "network_type": network_type,
@@ -36,16 +50,60 @@ class InsurancePlanGenerator:
             "sum_insured": self._calculate_sum_insured(coverage_type, user_profile.annual_income, risk_predictions),
             "deductible": self._calculate_deductible(coverage_type, risk_score),
             "out_of_pocket_max": self._calculate_out_of_pocket_max(coverage_type, risk_score),
+            "effective_date": date.today(),
+            "expiration_date": date.today() + timedelta(days=365)
+        }
+        plan.update(self.plan_details(coverage_type, network_type, risk_score, risk_predictions))
+        plan["annual_premium"] = plan["monthly_premium"] * 12
+        return plan
+
+    def plan_details(self, coverage_type, network_type, risk_score, risk_predictions):
+        """Copayments, coverage, benefits, exclusions and waiting periods of a plan whose tier and
+        network are already chosen. Draws from the generator's seed after anything the caller drew,
+        so a renewal, which draws no network or company, gets different picks than generate_plan."""
+        return {
             "copayments": self._generate_copayments(coverage_type, risk_score),
             "coverage_details": self._generate_coverage_details(coverage_type, network_type, risk_predictions),
             "additional_benefits": self._determine_benefits(coverage_type, risk_score, risk_predictions),
-            "effective_date": date.today(),
-            "expiration_date": date.today() + timedelta(days=365),
             "general_exclusions": self._generate_general_exclusions(),
             "waiting_periods": self._generate_waiting_periods(risk_predictions)
         }
-        plan["annual_premium"] = plan["monthly_premium"] * 12
-        return plan
+
+    def generate_quotes(self, user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions):
+        """Prices every tier for every company and network without picking or persisting a plan."""
+        risk_score = self._calculate_risk_score(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
+        risk_programs = self._risk_programs(risk_predictions)
+        quotes = []
+        for coverage_type in TIERS:
+            monthly_premium = self._calculate_premium(risk_score, coverage_type, user_profile, risk_predictions)
+            pricing = {
+                "coverage_type": coverage_type,
+                "monthly_premium": monthly_premium,
+                "annual_premium": monthly_premium * 12,
+                "sum_insured": self._calculate_sum_insured(coverage_type, user_profile.annual_income, risk_predictions),
+                "deductible": self._calculate_deductible(coverage_type, risk_score),
+                "out_of_pocket_max": self._calculate_out_of_pocket_max(coverage_type, risk_score),
+                "copayments": self._generate_copayments(coverage_type, risk_score),
+                "additional_benefits_count": BENEFIT_COUNTS[coverage_type] + len(risk_programs)
+            }
+            for network_type in self.network_types:
+                coverage = self._generate_coverage_details(coverage_type, network_type, risk_predictions)
+                for company in self.companies:
+                    quotes.append(dict(
+                        pricing,
+                        company=company,
+                        network_type=network_type,
+                        plan_name=f"{coverage_type} {network_type} Health Shield",
+                        coverage_details=coverage
+                    ))
+        return {
+            "risk_score": round(risk_score, 2),
+            "recommended_tier": self._determine_coverage_type(risk_score, user_profile.annual_income),
+            "plan_type": self._determine_plan_type(user_profile, risk_predictions),
+            "risk_programs": risk_programs,
+            "waiting_periods": self._generate_waiting_periods(risk_predictions),
+            "quotes": quotes
+        }
 
     def _calculate_risk_score(self, user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions):
         base_score = 0.5
@@ -86,14 +144,14 @@ class InsurancePlanGenerator:
         return "Individual"
 
     def _calculate_premium(self, risk_score, coverage_type, user_profile, risk_predictions):
-        base_premium = insurance_config['base_premium'][coverage_type]
+        base_premium = self.config['base_premium'][coverage_type]
         age_factor = 1 + (user_profile.age - 18) * 0.02
         risk_factor = 1 + (risk_score * 0.5)
         premium = base_premium * age_factor * risk_factor
         return round(max(500, min(20000, premium)), 2)
 
     def _calculate_sum_insured(self, coverage_type, annual_income, risk_predictions):
-        base_multiplier = insurance_config['base_multiplier'][coverage_type]
+        base_multiplier = self.config['base_multiplier'][coverage_type]
         risk_factor = 1.0
         high_risk_count = sum(1 for risk in risk_predictions if risk.risk_level == 'High')
         risk_factor += (high_risk_count * 0.1)
@@ -102,18 +160,22 @@ class InsurancePlanGenerator:
         return round(sum_insured, -5)
 
     def _calculate_deductible(self, coverage_type, risk_score):
-        base_deductible = insurance_config['base_deductible'][coverage_type]
+        base_deductible = self.config['base_deductible'][coverage_type]
         risk_adjusted_deductible = base_deductible * (1 + risk_score)
         return f"₹{int(risk_adjusted_deductible)}"
 
     def _calculate_out_of_pocket_max(self, coverage_type, risk_score):
-        base_oop = insurance_config['base_out_of_pocket_max'][coverage_type]
+        base_oop = self.config['base_out_of_pocket_max'][coverage_type]
         risk_adjusted_oop = base_oop * (1 + (risk_score * 0.5))
         return f"₹{int(risk_adjusted_oop)}"
 
     def _generate_copayments(self, coverage_type, risk_score):
-        base_copay = insurance_config['base_copay'][coverage_type]
+        base_copay = self.config['base_copay'][coverage_type]
         risk_adjusted_copay = int(base_copay * (1 + (risk_score * 0.5)))
+        return self._format_copayments(risk_adjusted_copay)
+
+    @staticmethod
+    def _format_copayments(risk_adjusted_copay):
         return {
             "Primary Care Visit": f"₹{risk_adjusted_copay}",
             "Specialist Visit": f"₹{risk_adjusted_copay * 2}",
@@ -122,155 +184,257 @@ class InsurancePlanGenerator:
         }
 
     def _generate_coverage_details(self, coverage_type, network_type, risk_predictions):
-        coverage = insurance_config['coverage']['basic']
+        # Copy the frozen table; the shared config must never grow between requests
+        coverage = list(self.config['coverage']['basic'])
         if network_type == "PPO":
-            coverage.extend(insurance_config['coverage']['additional'])
+            coverage.extend(self.config['coverage']['additional'])
         if coverage_type in ["Gold", "Platinum"]:
-            coverage.extend(insurance_config['coverage']['gold_platinum'])
+            coverage.extend(self.config['coverage']['gold_platinum'])
         for risk in risk_predictions:
             if risk.risk_level == 'High':
                 coverage.append(f"Enhanced coverage for {risk.condition_name.replace('_', ' ')}")
         return coverage
 
     def _determine_benefits(self, coverage_type, risk_score, risk_predictions):
-        all_benefits = insurance_config['benefits']
-        num_benefits = {"Bronze": 2, "Silver": 3, "Gold": 4, "Platinum": 5}[coverage_type]
-        benefits = random.sample(all_benefits, num_benefits)
+        all_benefits = self.config['benefits']
+        num_benefits = BENEFIT_COUNTS[coverage_type]
+        benefits = self.rng.sample(all_benefits, num_benefits)
+        benefits.extend(self._risk_programs(risk_predictions))
+        return benefits
+
+    def _risk_programs(self, risk_predictions):
+        programs = []
         if any(risk.condition_name == 'Heart_Disease_Risk' and risk.risk_level == 'High' for risk in risk_predictions):
-            benefits.append("Cardiovascular Health Program")
+            programs.append("Cardiovascular Health Program")
         if any(risk.condition_name == 'Diabetes' and risk.risk_level == 'High' for risk in risk_predictions):
-            benefits.append("Diabetes Management Program")
+            programs.append("Diabetes Management Program")
         if any(risk.condition_name == 'Cancer_Risk' and risk.risk_level == 'High' for risk in risk_predictions):
-            benefits.append("Cancer Screening Program")
-        return benefits
+            programs.append("Cancer Screening Program")
+        return programs
 
     def _generate_general_exclusions(self):
-        exclusions = insurance_config['exclusions']
-        return random.sample(exclusions, 3)
+        exclusions = self.config['exclusions']
+        return self.rng.sample(exclusions, 3)
 
     def _generate_waiting_periods(self, risk_predictions):
         waiting_periods = {
-            "General Waiting Period": insurance_config['waiting_periods']['general'],
-            "Pre-existing Diseases": insurance_config['waiting_periods']['pre_existing_high'] if any(risk.risk_level == 'High' for risk in risk_predictions) else insurance_config['waiting_periods']['pre_existing_low'],
-            "Specific Procedures": insurance_config['waiting_periods']['specific_procedures']
+            "General Waiting Period": self.config['waiting_periods']['general'],
+            "Pre-existing Diseases": self.config['waiting_periods']['pre_existing_high'] if any(risk.risk_level == 'High' for risk in risk_predictions) else self.config['waiting_periods']['pre_existing_low'],
+            "Specific Procedures": self.config['waiting_periods']['specific_procedures']
         }
         return waiting_periods
 
+def pricing_fingerprint(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions):
+    """Hashes exactly the inputs InsurancePlanGenerator reads, plus the pricing tables."""
+    inputs = {
+        'age': user_profile.age,
+        'annual_income': str(user_profile.annual_income),
+        'medical_history': health_info.medical_history,
+        'smoking_status': lifestyle_info.smoking_status,
+        'alcohol_consumption': lifestyle_info.alcohol_consumption,
+        'bmi': str(ml_model_data.BMI),
+        'systolic_bp': ml_model_data.Systolic_BP,
+        'diastolic_bp': ml_model_data.Diastolic_BP,
+        'risks': sorted((risk.condition_name, risk.risk_level) for risk in risk_predictions),
+        'pricing': get_pricing_digest()
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+@insurance_bp.route('/quotes/<int:user_id>', methods=['GET'])
+@replica_reads
+def get_quotes(user_id):
+    context = load_user_context(user_id)
+    if not context.has('profile', 'health', 'lifestyle', 'ml_data', 'predictions'):
+        return jsonify({"error": "User data is incomplete"}), 400
+    user_profile, health_info, lifestyle_info = context.profile, context.health, context.lifestyle
+    ml_model_data, risk_predictions = context.ml_data, context.predictions
+
+    try:
+        generator = InsurancePlanGenerator()
+        # Quotes priced with older tables must not be served after a config reload
+        fingerprint = pricing_fingerprint(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
+        if fingerprint in request.if_none_match:
+            return '', 304
+
+        with _quote_cache_lock:
+            quotes = _quote_cache.get(fingerprint)
+            if quotes is not None:
+                _quote_cache.move_to_end(fingerprint)
+        if quotes is None:
+            quotes = generator.generate_quotes(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
+            with _quote_cache_lock:
+                _quote_cache[fingerprint] = quotes
+                if len(_quote_cache) > QUOTE_CACHE_SIZE:
+                    _quote_cache.popitem(last=False)
+
+        response = jsonify(quotes)
+        response.set_etag(fingerprint)
+        return response, 200
+
+    except Exception as e:
+        return jsonify({"error": f"An error occurred while generating quotes: {str(e)}"}), 500
+
+def _sync_items(model, column, plan_id, wanted):
+    # Keep rows whose value is still wanted, delete the rest, insert what is missing
+    remaining = Counter(wanted)
+    for row in model.query.filter_by(plan_id=plan_id).all():
+        value = getattr(row, column)
+        if remaining[value] > 0:
+            remaining[value] -= 1
+        else:
+            db.session.delete(row)
+    for value, count in remaining.items():
+        for _ in range(count):
+            db.session.add(model(plan_id=plan_id, **{column: value}))
+
+def _plan_exclusions(plan):
+    general_exclusions = ', '.join(plan['general_exclusions'])
+    waiting_periods = ', '.join([f"{k}: {v} months" for k, v in plan['waiting_periods'].items()])
+    return general_exclusions, waiting_periods
+
+def insert_plan_details(plan_id, plan):
+    """Writes a newly created plan's child rows, one executemany per table; does not commit."""
+    general_exclusions, waiting_periods = _plan_exclusions(plan)
+    tables = [
+        (CoverageDetails, [{'plan_id': plan_id, 'coverage_item': item} for item in plan['coverage_details']]),
+        (Copayments, [{'plan_id': plan_id, 'service': service, 'amount': amount} for service, amount in plan['copayments'].items()]),
+        (AdditionalBenefits, [{'plan_id': plan_id, 'benefit_description': benefit} for benefit in plan['additional_benefits']]),
+        (PolicyExclusions, [{'plan_id': plan_id, 'general_exclusions': general_exclusions, 'waiting_periods': waiting_periods}])
+    ]
+    for model, rows in tables:
+        if rows:
+            db.session.execute(insert(model), rows)
+
+def sync_plan_details(plan_id, plan):
+    """Writes the plan's child rows as a minimal diff against what is stored; does not commit."""
+    _sync_items(CoverageDetails, 'coverage_item', plan_id, plan['coverage_details'])
+    _sync_items(AdditionalBenefits, 'benefit_description', plan_id, plan['additional_benefits'])
+
+    copayments = dict(plan['copayments'])
+    for row in Copayments.query.filter_by(plan_id=plan_id).all():
+        if row.service in copayments:
+            amount = copayments.pop(row.service)
+            if row.amount != amount:
+                row.amount = amount
+        else:
+            db.session.delete(row)
+    for service, amount in copayments.items():
+        db.session.add(Copayments(plan_id=plan_id, service=service, amount=amount))
+
+    general_exclusions, waiting_periods = _plan_exclusions(plan)
+    exclusions = PolicyExclusions.query.filter_by(plan_id=plan_id).all()
+    if exclusions:
+        for extra in exclusions[1:]:
+            db.session.delete(extra)
+        if exclusions[0].general_exclusions != general_exclusions:
+            exclusions[0].general_exclusions = general_exclusions
+        if exclusions[0].waiting_periods != waiting_periods:
+            exclusions[0].waiting_periods = waiting_periods
+    else:
+        db.session.add(PolicyExclusions(plan_id=plan_id, general_exclusions=general_exclusions, waiting_periods=waiting_periods))
+
+def load_stored_plan(insurance_plan):
+    """Rebuilds the generator's plan dict from a stored plan and its child rows."""
+    exclusions = PolicyExclusions.query.filter_by(plan_id=insurance_plan.plan_id).first()
+    waiting_periods = {}
+    if exclusions and exclusions.waiting_periods:
+        for entry in exclusions.waiting_periods.split(', '):
+            name, _, months = entry.rpartition(': ')
+            waiting_periods[name] = int(months.replace(' months', ''))
+    return {
+        'company': insurance_plan.company,
+        'plan_name': insurance_plan.plan_name,
+        'plan_type': insurance_plan.plan_type,
+        'network_type': insurance_plan.network_type,
+        'monthly_premium': float(insurance_plan.monthly_premium),
+        'annual_premium': float(insurance_plan.annual_premium),
+        'sum_insured': float(insurance_plan.sum_insured),
+        'deductible': insurance_plan.deductible,
+        'out_of_pocket_max': insurance_plan.out_of_pocket_max,
+        'effective_date': insurance_plan.effective_date,
+        'expiration_date': insurance_plan.expiration_date,
+        'coverage_details': [row.coverage_item for row in CoverageDetails.query.filter_by(plan_id=insurance_plan.plan_id).order_by(CoverageDetails.coverage_id)],
+        'copayments': {row.service: row.amount for row in Copayments.query.filter_by(plan_id=insurance_plan.plan_id).order_by(Copayments.copayment_id)},
+        'additional_benefits': [row.benefit_description for row in AdditionalBenefits.query.filter_by(plan_id=insurance_plan.plan_id).order_by(AdditionalBenefits.benefit_id)],
+        'general_exclusions': exclusions.general_exclusions.split(', ') if exclusions and exclusions.general_exclusions else [],
+        'waiting_periods': waiting_periods
+    }
+
+def build_plan_response(plan):
+    # Prepare the JSON response with all insurance details
+    return {
+        'message': 'Insurance plan generated successfully',
+        'insurance_details': {
+            'company': plan['company'],
+            'plan_name': plan['plan_name'],
+            'plan_type': plan['plan_type'],
+            'network_type': plan['network_type'],
+            'monthly_premium': plan['monthly_premium'],
+            'annual_premium': plan['annual_premium'],
+            'sum_insured': plan['sum_insured'],
+            'deductible': plan['deductible'],
+            'out_of_pocket_max': plan['out_of_pocket_max'],
+            'effective_date': plan['effective_date'].strftime('%Y-%m-%d'),
+            'expiration_date': plan['expiration_date'].strftime('%Y-%m-%d'),
+            'coverage_details': list(plan['coverage_details']),
+            'copayments': [{'service': service, 'amount': amount} for service, amount in plan['copayments'].items()],
+            'additional_benefits': list(plan['additional_benefits']),
+            'general_exclusions': list(plan['general_exclusions']),
+            'waiting_periods': plan['waiting_periods']
+        }
+    }
+
 @insurance_bp.route('/generate_plan/<int:user_id>', methods=['GET'])
 def generate_plan(user_id):
-    # Retrieve user details from the database
-    user = User.query.filter_by(user_id=user_id).first()
-    user_profile = UserProfile.query.filter_by(user_id=user_id).first()
-    health_info = HealthInformation.query.filter_by(user_id=user_id).first()
-    lifestyle_info = LifestyleInformation.query.filter_by(user_id=user_id).first()
-    ml_model_data = MLModelData.query.filter_by(user_id=user_id).first()
-    risk_predictions = PredictionResults.query.filter_by(user_id=user_id).all()
-
-    if not user_profile or not health_info or not lifestyle_info or not ml_model_data or not risk_predictions:
+    # Retrieve user details from the database in one round trip
+    context = load_user_context(user_id)
+    if not context.has('profile', 'health', 'lifestyle', 'ml_data', 'predictions'):
         return jsonify({"error": "User data is incomplete"}), 400
+    user, user_profile, health_info = context.user, context.profile, context.health
+    lifestyle_info, ml_model_data, risk_predictions = context.lifestyle, context.ml_data, context.predictions
 
     # Check if an existing insurance plan exists for the user
     existing_plan = InsurancePlans.query.filter_by(user_id=user_id).first()
+    fingerprint = pricing_fingerprint(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
 
-    # Generate insurance plan
     try:
-        generator = InsurancePlanGenerator()
-        plan = generator.generate_plan(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
+        # Same inputs as the stored, unexpired plan: return it as is, without touching the database
+        if existing_plan and existing_plan.input_fingerprint == fingerprint and existing_plan.expiration_date and existing_plan.expiration_date >= date.today():
+            return jsonify(build_plan_response(load_stored_plan(existing_plan))), 200
 
-        if existing_plan:
-            # Update the existing insurance plan
-            existing_plan.company = plan['company']
-            existing_plan.plan_name = plan['plan_name']
-            existing_plan.plan_type = plan['plan_type']
-            existing_plan.network_type = plan['network_type']
-            existing_plan.monthly_premium = plan['monthly_premium']
-            existing_plan.annual_premium = plan['annual_premium']
-            existing_plan.sum_insured = plan['sum_insured']
-            existing_plan.deductible = plan['deductible']
-            existing_plan.out_of_pocket_max = plan['out_of_pocket_max']
-            existing_plan.effective_date = plan['effective_date']
-            existing_plan.expiration_date = plan['expiration_date']
-            db.session.commit()
-
-            # Clear and update related details
-            CoverageDetails.query.filter_by(plan_id=existing_plan.plan_id).delete()
-            Copayments.query.filter_by(plan_id=existing_plan.plan_id).delete()
-            AdditionalBenefits.query.filter_by(plan_id=existing_plan.plan_id).delete()
-            PolicyExclusions.query.filter_by(plan_id=existing_plan.plan_id).delete()
+        # Generate insurance plan
+        generator = InsurancePlanGenerator(seed=f"{user_id}:{fingerprint}")
+        plan = generator.generate_plan(user_profile, health_info, lifestyle_info, ml_model_data, risk_predictions)
 
-        else:
-            # Create a new insurance plan
-            existing_plan = InsurancePlans(
-                user_id=user_id,
-                company=plan['company'],
-                plan_name=plan['plan_name'],
-                plan_type=plan['plan_type'],
-                network_type=plan['network_type'],
-                monthly_premium=plan['monthly_premium'],
-                annual_premium=plan['annual_premium'],
-                sum_insured=plan['sum_insured'],
-                deductible=plan['deductible'],
-                out_of_pocket_max=plan['out_of_pocket_max'],
-                effective_date=plan['effective_date'],
-                expiration_date=plan['expiration_date']
-            )
+        created = existing_plan is None
+        if created:
+            existing_plan = InsurancePlans(user_id=user_id)
             db.session.add(existing_plan)
-            db.session.commit()
-
-        # Insert related details
-        coverage_details_list = []
-        for item in plan['coverage_details']:
-            coverage_detail = CoverageDetails(plan_id=existing_plan.plan_id, coverage_item=item)
-            db.session.add(coverage_detail)
-            coverage_details_list.append(item)
-
-        copayments_list = []
-        for service, amount in plan['copayments'].items():
-            copayment = Copayments(plan_id=existing_plan.plan_id, service=service, amount=amount)
-            db.session.add(copayment)
-            copayments_list.append({'service': service, 'amount': amount})
-
-        additional_benefits_list = []
-        for benefit in plan['additional_benefits']:
-            additional_benefit = AdditionalBenefits(plan_id=existing_plan.plan_id, benefit_description=benefit)
-            db.session.add(additional_benefit)
-            additional_benefits_list.append(benefit)
-
-        policy_exclusion = PolicyExclusions(
-            plan_id=existing_plan.plan_id,
-            general_exclusions=', '.join(plan['general_exclusions']),
-            waiting_periods=', '.join([f"{k}: {v} months" for k, v in plan['waiting_periods'].items()])
-        )
-        db.session.add(policy_exclusion)
-        db.session.commit()
-
+        existing_plan.company = plan['company']
+        existing_plan.plan_name = plan['plan_name']
+        existing_plan.plan_type = plan['plan_type']
+        existing_plan.network_type = plan['network_type']
+        existing_plan.monthly_premium = plan['monthly_premium']
+        existing_plan.annual_premium = plan['annual_premium']
+        existing_plan.sum_insured = plan['sum_insured']
+        existing_plan.deductible = plan['deductible']
+        existing_plan.out_of_pocket_max = plan['out_of_pocket_max']
+        existing_plan.effective_date = plan['effective_date']
+        existing_plan.expiration_date = plan['expiration_date']
+        existing_plan.input_fingerprint = fingerprint
+        db.session.flush()
+
+        # A new plan has no details to diff against; otherwise apply only the differences, all in one transaction
+        if created:
+            insert_plan_details(existing_plan.plan_id, plan)
+        else:
+            sync_plan_details(existing_plan.plan_id, plan)
         user.user_details = True
         db.session.commit()
+        invalidate_user(user_id)
 
-        # Prepare the JSON response with all insurance details
-        response = {
-            'message': 'Insurance plan generated successfully',
-            'insurance_details': {
-                'company': plan['company'],
-                'plan_name': plan['plan_name'],
-                'plan_type': plan['plan_type'],
-                'network_type': plan['network_type'],
-                'monthly_premium': plan['monthly_premium'],
-                'annual_premium': plan['annual_premium'],
-                'sum_insured': plan['sum_insured'],
-                'deductible': plan['deductible'],
-                'out_of_pocket_max': plan['out_of_pocket_max'],
-                'effective_date': plan['effective_date'].strftime('%Y-%m-%d'),
-                'expiration_date': plan['expiration_date'].strftime('%Y-%m-%d'),
-                'coverage_details': coverage_details_list,
-                'copayments': copayments_list,
-                'additional_benefits': additional_benefits_list,
-                'general_exclusions': plan['general_exclusions'],
-                'waiting_periods': plan['waiting_periods']
-            }
-        }
-        
-        return jsonify(response), 200
+        return jsonify(build_plan_response(plan)), 200
 
     except Exception as e:
-        return jsonify({"error": f"An error occurred while generating the insurance plan: {str(e)}"}), 500
\ No newline at end of file
+        db.session.rollback()
+        return jsonify({"error": f"An error occurred while generating the insurance plan: {str(e)}"}), 500
@@ -0,0 +1,22 @@
+from flask import Blueprint, Response, jsonify
+from blob_storage import upload_metrics
+from database import pool_metrics
+from model_client import model_metrics
+from request_metrics import render_prometheus
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def get_prometheus_metrics():
+    # Per worker process; scrape each worker, or run one worker per pod
+    body = render_prometheus(pools=pool_metrics(), uploads=upload_metrics.snapshot(), model=model_metrics.snapshot())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@metrics_bp.route('/pools', methods=['GET'])
+def get_pool_metrics():
+    # Per worker process, like every other in-memory counter
+    return jsonify(pool_metrics()), 200
+
+@metrics_bp.route('/model', methods=['GET'])
+def get_model_metrics():
+    return jsonify(model_metrics.snapshot()), 200
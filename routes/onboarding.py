@@ -0,0 +1,42 @@
+from flask import Blueprint, request, jsonify
+from models import db, UserProfile, HealthInformation, LifestyleInformation
+from database import upsert
+from response_cache import invalidate_user
+from risk_engine import score_user
+from user_context import forget_user_context
+from user_sections import user_profile_values, health_information_values, lifestyle_information_values
+
+onboarding_bp = Blueprint('onboarding', __name__)
+
+@onboarding_bp.route('/onboarding', methods=['POST'])
+def onboard_user():
+    data = request.get_json() or {}
+    user_id = data.get('user_id')
+    profile, health, lifestyle = data.get('profile'), data.get('health'), data.get('lifestyle')
+
+    if not user_id or not profile or not health or not lifestyle:
+        return jsonify({'message': 'user_id, profile, health and lifestyle are required'}), 400
+
+    try:
+        values = [
+            (UserProfile, user_profile_values(user_id, profile)),
+            (HealthInformation, health_information_values(user_id, health)),
+            (LifestyleInformation, lifestyle_information_values(user_id, lifestyle))
+        ]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'message': f'Invalid onboarding data: {e}'}), 400
+
+    # All three upserts commit together or not at all
+    try:
+        for model, row in values:
+            upsert(model, row, ['user_id'])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error onboarding user: {e}")
+        return jsonify({'message': 'Onboarding failed'}), 500
+
+    forget_user_context(user_id)
+    score_user(user_id)
+    invalidate_user(user_id)
+    return jsonify({'message': 'User onboarded successfully'}), 201
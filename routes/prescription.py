@@ -1,19 +1,42 @@
+import base64
 from flask import Blueprint, request, jsonify
-from models import db, Prescription
-from utils import upload_file_and_get_url
+from sqlalchemy import func
+from models import db, Prescription, StoredBlob
+from document_store import store_document
+from previews import schedule_previews
+from prescription_index import index_prescription, search_filter, after_cursor
+from blob_storage import blob_name_from_link, sign_blob_url
+from response_cache import cached_user_response, invalidate_user
+from read_routing import replica_reads
 from datetime import datetime
 
 prescription_bp = Blueprint('prescription', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SUMMARY_DESCRIPTION_LENGTH = 200
+
+def encode_cursor(prescription_date, prescription_id):
+    return base64.urlsafe_b64encode(f"{prescription_date.isoformat()}:{prescription_id}".encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    value = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    prescription_date, prescription_id = value.split(':')
+    return datetime.strptime(prescription_date, '%Y-%m-%d').date(), int(prescription_id)
+
 @prescription_bp.route('/upload_prescription', methods=['POST'])
 def upload_prescription():
     try:
-        user_id = request.form['user_id']
+        try:
+            user_id = int(request.form['user_id'])
+        except ValueError:
+            return jsonify({"error": "user_id must be an integer"}), 400
         clinic_name = request.form['clinic_name']
         description = request.form['description']
         date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
         file = request.files['file']
-        file_link = upload_file_and_get_url(file)
+        # Stored under its content hash; only the blob name is kept and links are signed on every read
+        digest, blob_name = store_document(file)
 
         new_prescription = Prescription(
             user_id=user_id,
@@ -21,29 +44,77 @@ def upload_prescription():
             description=description,
             filename=file.filename,
             date=date,
-            file_link=file_link
+            file_link=blob_name,
+            content_hash=digest
         )
         db.session.add(new_prescription)
+        db.session.flush()
+        index_prescription(new_prescription)
         db.session.commit()
+        invalidate_user(user_id)
+        schedule_previews(digest, blob_name, file)
 
-        response = {"message": "Prescription uploaded successfully", "file_link": file_link}
+        response = {"message": "Prescription uploaded successfully", "file_link": sign_blob_url(blob_name)}
         return jsonify(response), 201
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": str(e)}), 500
 
 @prescription_bp.route('/get_prescriptions/<user_id>', methods=['GET'])
+@cached_user_response
+@replica_reads
 def get_prescriptions(user_id):
-    prescriptions = Prescription.query.filter_by(user_id=user_id).all()
+    """All of the user's prescriptions as a bare list, as this endpoint has always returned.
+
+    Passing `limit` or `cursor` pages instead: newest first, `limit` at a time, as
+    {"prescriptions": [...], "next_cursor": ...}; pass back `next_cursor` as `cursor` for the
+    next page, and `view=full` for whole descriptions instead of a summary. `q` keeps
+    prescriptions whose clinic name or description contains every word, in either form.
+    """
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    full = not paginated or request.args.get('view') == 'full'
+    description = Prescription.description if full else func.substr(Prescription.description, 1, SUMMARY_DESCRIPTION_LENGTH)
+
+    # Only the columns the list shows, never whole rows
+    query = db.session.query(
+        Prescription.prescription_id, Prescription.clinic_name, Prescription.filename,
+        description.label('description'), Prescription.date, Prescription.file_link,
+        StoredBlob.thumbnail_name, StoredBlob.preview_name
+    ).outerjoin(
+        StoredBlob, StoredBlob.content_hash == Prescription.content_hash
+    ).filter(Prescription.user_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            query = query.filter(after_cursor(*decode_cursor(cursor)))
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({"error": "Invalid cursor"}), 400
+    condition = search_filter(request.args.get('q', ''), user_id)
+    if condition is not None:
+        query = query.filter(condition)
+
+    if paginated:
+        # One extra row tells whether another page follows
+        rows = query.order_by(Prescription.date.desc(), Prescription.prescription_id.desc()).limit(limit + 1).all()
+    else:
+        rows = query.order_by(Prescription.prescription_id).all()
     output = []
-    for prescription in prescriptions:
+    for row in rows[:limit] if paginated else rows:
         output.append({
-            'prescription_id': prescription.prescription_id,
-            'user_id': prescription.user_id,
-            'clinic_name': prescription.clinic_name,
-            'filename': prescription.filename,
-            'description': prescription.description,
-            'date': prescription.date.isoformat(),
-            'file_link': prescription.file_link
+            'prescription_id': row.prescription_id,
+            'user_id': int(user_id),
+            'clinic_name': row.clinic_name,
+            'filename': row.filename,
+            'description': row.description,
+            'date': row.date.isoformat(),
+            'file_link': sign_blob_url(blob_name_from_link(row.file_link)),
+            # None until the background job has rendered them
+            'thumbnail_link': sign_blob_url(row.thumbnail_name) if row.thumbnail_name else None,
+            'preview_link': sign_blob_url(row.preview_name) if row.preview_name else None
         })
-    return jsonify(output)
+    if not paginated:
+        return jsonify(output)
+    next_cursor = encode_cursor(rows[limit - 1].date, rows[limit - 1].prescription_id) if len(rows) > limit else None
+    return jsonify({'prescriptions': output, 'next_cursor': next_cursor})
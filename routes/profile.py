@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import db, UserProfile
-from datetime import datetime
+from response_cache import invalidate_user
+from user_context import forget_user_context
+from user_sections import user_profile_values, save_section
 
 profile_bp = Blueprint('profile', __name__)
 
@@ -9,45 +11,9 @@ def add_user_profile():
     data = request.get_json()
     user_id = data.get('user_id')
 
-    # Convert DOB
-    dob = data.get('dob')
-    dob_converted = datetime.strptime(dob, "%Y-%m-%d").date()
-
-    # Check if the user already has a profile
-    user_profile = UserProfile.query.filter_by(user_id=user_id).first()
-
-    if user_profile:
-        # Update existing user profile
-        user_profile.full_name = data['full_name']
-        user_profile.DOB = dob_converted
-        user_profile.age = data['age']
-        user_profile.gender = data['gender']
-        user_profile.phone_number = data['phone_number']
-        user_profile.district = data['district']
-        user_profile.state = data['state']
-        user_profile.occupation = data['occupation']
-        user_profile.annual_income = data['annual_income']
-        user_profile.height = data['height']
-        user_profile.weight = data['weight']
-        message = 'User profile updated successfully'
-    else:
-        # Create new user profile
-        user_profile = UserProfile(
-            user_id=user_id,
-            full_name=data['full_name'],
-            DOB=dob_converted,
-            age=data['age'],
-            gender=data['gender'],
-            phone_number=data['phone_number'],
-            district=data['district'],
-            state=data['state'],
-            occupation=data['occupation'],
-            annual_income=data['annual_income'],
-            height=data['height'],
-            weight=data['weight']
-        )
-        db.session.add(user_profile)
-        message = 'User profile added successfully'
-
+    # Insert or update the profile with a single upsert
+    message = save_section(UserProfile, user_profile_values(user_id, data), 'User profile')
     db.session.commit()
+    forget_user_context(user_id)
+    invalidate_user(user_id)
     return jsonify({'message': message}), 201
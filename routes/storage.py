@@ -0,0 +1,37 @@
+import mimetypes
+import os
+from flask import Blueprint, jsonify, request, send_file
+from blob_storage import upload_metrics, get_storage, LocalFileStorage
+from document_store import dedup_savings, content_type_for
+
+storage_bp = Blueprint('storage', __name__)
+
+DOWNLOAD_MAX_AGE = 3600
+
+@storage_bp.route('/metrics', methods=['GET'])
+def get_storage_metrics():
+    # Upload counters are per worker process; deduplication totals come from the database
+    return jsonify({'uploads': upload_metrics.snapshot(), 'dedup': dedup_savings()}), 200
+
+@storage_bp.route('/files/<path:name>', methods=['GET'])
+def download_file(name):
+    # Only the local driver serves files itself; Azure links point straight at the blob
+    storage = get_storage()
+    if not isinstance(storage, LocalFileStorage):
+        return jsonify({'error': 'Not found'}), 404
+    if not storage.verify(name, request.args.get('expires', type=int), request.args.get('signature')):
+        return jsonify({'error': 'Invalid or expired link'}), 403
+
+    try:
+        path = storage.path(name)
+    except ValueError:
+        return jsonify({'error': 'Not found'}), 404
+    if not os.path.isfile(path):
+        return jsonify({'error': 'Not found'}), 404
+
+    mimetype = content_type_for(name) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    # send_file answers Range and conditional requests and hands the open file to the server's
+    # wsgi.file_wrapper (sendfile under gunicorn), or to the proxy when USE_X_SENDFILE is set
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=DOWNLOAD_MAX_AGE)
+    response.headers['Cache-Control'] = f'private, max-age={DOWNLOAD_MAX_AGE}'
+    return response
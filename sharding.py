@@ -0,0 +1,333 @@
+import bisect
+import hashlib
+import logging
+import os
+import threading
+import time
+import click
+from flask import g, jsonify, request
+from flask.cli import with_appcontext
+from sqlalchemy import select, insert, delete, update
+from database import db, get_engine, shard_names, DIRECTORY_TABLES
+from models import ShardUser, StoredBlob
+
+RING_VNODES = 128
+# How long a worker trusts its copy of a user's directory entry; moves wait this out
+DIRECTORY_TTL = float(os.getenv('SHARD_DIRECTORY_TTL', '2'))
+# Tables that several users' rows point at, so a move adjusts reference counts instead
+SHARED_TABLES = frozenset(['StoredBlobs'])
+
+class ShardMoving(Exception):
+    """The user's rows are being moved between shards; retry shortly."""
+
+class HashRing:
+    """Consistent-hash ring over shard names; adding a shard moves only ~1/N of the users."""
+
+    def __init__(self, shards, vnodes=RING_VNODES):
+        if not shards:
+            raise ValueError("A hash ring needs at least one shard")
+        points = sorted((self._hash(f"{shard}#{replica}"), shard) for shard in shards for replica in range(vnodes))
+        self._keys = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(str(value).encode('utf-8')).digest()[:8], 'big')
+
+    def shard_for(self, user_id):
+        index = bisect.bisect(self._keys, self._hash(int(user_id))) % len(self._keys)
+        return self._shards[index]
+
+def sharding_enabled():
+    return bool(shard_names())
+
+def get_ring(exclude=()):
+    return HashRing([name for name in shard_names() if name not in exclude])
+
+# user_id -> (shard, moving, fetched_at), refreshed from the directory after DIRECTORY_TTL
+_placements = {}
+_placements_lock = threading.Lock()
+
+def user_shard(user_id):
+    """The shard holding the user's rows; raises ShardMoving during a move."""
+    user_id = int(user_id)
+    cached = _placements.get(user_id)
+    if cached is None or time.monotonic() - cached[2] > DIRECTORY_TTL:
+        entry = db.session.execute(
+            select(ShardUser.shard, ShardUser.moving).where(ShardUser.user_id == user_id)
+        ).first()
+        # Unknown users still get a stable shard, so their lookups miss the same way as before
+        cached = (entry.shard, entry.moving, time.monotonic()) if entry else (get_ring().shard_for(user_id), False, time.monotonic())
+        with _placements_lock:
+            _placements[user_id] = cached
+    if cached[1]:
+        raise ShardMoving(user_id)
+    return cached[0]
+
+def group_by_shard(user_ids):
+    """Splits user ids by shard, keeping their order; returns ({shard: ids}, moving_ids).
+
+    Unsharded deployments get everything under None.
+    """
+    if not sharding_enabled():
+        return {None: list(user_ids)}, []
+    groups, moving = {}, []
+    for user_id in user_ids:
+        try:
+            groups.setdefault(user_shard(user_id), []).append(user_id)
+        except ShardMoving:
+            moving.append(user_id)
+    return groups, moving
+
+def _request_user_id():
+    user_id = (request.view_args or {}).get('user_id')
+    if user_id is None and request.is_json:
+        body = request.get_json(silent=True) or {}
+        user_id = body.get('user_id') or body.get('userId') if isinstance(body, dict) else None
+    if user_id is None:
+        user_id = request.form.get('user_id')
+    try:
+        return int(user_id) if user_id is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def route_request_to_shard():
+    """before_request hook: points db.session at the shard of the user the request is about."""
+    if not sharding_enabled():
+        return None
+    user_id = _request_user_id()
+    if user_id is None:
+        return None
+    try:
+        g.shard = user_shard(user_id)
+    except ShardMoving:
+        response = jsonify({'error': 'User data is being moved, please retry'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(DIRECTORY_TTL) + 1)
+        return response
+    return None
+
+def use_shard(shard):
+    """Points db.session at a shard for the rest of the app context (None for the directory)."""
+    if shard is None:
+        g.pop('shard', None)
+    else:
+        g.shard = shard
+
+def each_shard():
+    """Yields every shard name with db.session pointed at it, for batch jobs; a single None when unsharded."""
+    shards = shard_names()
+    if not shards:
+        yield None
+        return
+    try:
+        for shard in shards:
+            use_shard(shard)
+            yield shard
+    finally:
+        use_shard(None)
+
+def register_user(email):
+    """Allocates a global user id in the directory and places the user; returns (user_id, shard)."""
+    entry = ShardUser(email=email, shard='pending')
+    db.session.add(entry)
+    db.session.flush()
+    entry.shard = get_ring().shard_for(entry.user_id)
+    db.session.commit()
+    return entry.user_id, entry.shard
+
+def find_user(email):
+    """(user_id, shard) for an email from the directory, or None."""
+    entry = db.session.execute(select(ShardUser.user_id, ShardUser.shard).where(ShardUser.email == email)).first()
+    return (entry.user_id, entry.shard) if entry else None
+
+def _user_tables():
+    # Parents before children, following foreign keys, so inserts never dangle
+    tables = []
+    owned = set()
+    for table in db.metadata.sorted_tables:
+        if table.name in DIRECTORY_TABLES or table.name in SHARED_TABLES:
+            continue
+        if 'user_id' in table.c or any(fk.column.table.name in owned for fk in table.foreign_keys):
+            tables.append(table)
+            owned.add(table.name)
+    return tables
+
+def _owner_filter(table, copied_ids):
+    if 'user_id' in table.c:
+        return None
+    for fk in table.foreign_keys:
+        parent_ids = copied_ids.get(fk.column.table.name, {}).get(fk.column.name)
+        if parent_ids is not None:
+            return fk.parent.in_(list(parent_ids))
+    return None
+
+def _autoincrement_key(table):
+    # Surrogate keys are only unique per shard, so moved rows get fresh ones
+    keys = list(table.primary_key.columns)
+    if len(keys) != 1 or keys[0].foreign_keys or keys[0].name == 'user_id':
+        return None
+    return keys[0] if keys[0].autoincrement in (True, 'auto') and keys[0].type.python_type is int else None
+
+def _load_rows(connection, tables, user_id):
+    """Every row the user owns on one shard, keyed by table name."""
+    rows = {}
+    # table name -> column name -> ids, for children that only reference their parent
+    ids = {}
+    for table in tables:
+        condition = table.c.user_id == user_id if 'user_id' in table.c else _owner_filter(table, ids)
+        if condition is None:
+            continue
+        rows[table.name] = [dict(row._mapping) for row in connection.execute(select(table).where(condition))]
+        for key in table.primary_key.columns:
+            ids.setdefault(table.name, {})[key.name] = {row[key.name] for row in rows[table.name]}
+    return rows, ids
+
+def _delete_rows(connection, tables, rows):
+    for table in reversed(tables):
+        table_rows = rows.get(table.name)
+        if not table_rows:
+            continue
+        keys = list(table.primary_key.columns)
+        for row in table_rows:
+            connection.execute(delete(table).where(*[key == row[key.name] for key in keys]))
+
+def _stored_blob_counts(rows):
+    counts = {}
+    for row in rows.get('Prescriptions', []):
+        if row.get('content_hash'):
+            counts[row['content_hash']] = counts.get(row['content_hash'], 0) + 1
+    return counts
+
+def _copy_rows(source, target, tables, rows):
+    # Shared blobs first: take references on the target, creating rows it doesn't have yet
+    for digest, references in _stored_blob_counts(rows).items():
+        existing = target.execute(select(StoredBlob.__table__).where(StoredBlob.content_hash == digest)).first()
+        if existing:
+            target.execute(update(StoredBlob.__table__).where(StoredBlob.content_hash == digest).values(
+                ref_count=StoredBlob.__table__.c.ref_count + references
+            ))
+        else:
+            blob = dict(source.execute(select(StoredBlob.__table__).where(StoredBlob.content_hash == digest)).first()._mapping)
+            target.execute(insert(StoredBlob.__table__).values(**dict(blob, ref_count=references)))
+
+    remapped = {}
+    for table in tables:
+        key = _autoincrement_key(table)
+        for row in rows.get(table.name, []):
+            values = dict(row)
+            for fk in table.foreign_keys:
+                mapping = remapped.get((fk.column.table.name, fk.column.name))
+                if mapping and values.get(fk.parent.name) in mapping:
+                    values[fk.parent.name] = mapping[values[fk.parent.name]]
+            if key is None:
+                target.execute(insert(table).values(**values))
+                continue
+            old_id = values.pop(key.name)
+            new_id = target.execute(insert(table).values(**values)).inserted_primary_key[0]
+            remapped.setdefault((table.name, key.name), {})[old_id] = new_id
+
+def _release_blobs(source, rows):
+    for digest, references in _stored_blob_counts(rows).items():
+        source.execute(update(StoredBlob.__table__).where(StoredBlob.content_hash == digest).values(
+            ref_count=StoredBlob.__table__.c.ref_count - references
+        ))
+
+def move_user(user_id, target_shard, settle=None):
+    """Moves every row of one user to target_shard while their requests get 503 + Retry-After.
+
+    Returns the number of rows moved. Safe to rerun after a crash: leftovers on the
+    target are cleared first, and the directory only flips once the copy has committed.
+    """
+    from response_cache import invalidate_user
+
+    entry = db.session.get(ShardUser, user_id)
+    if entry is None:
+        raise ValueError(f"User {user_id} is not in the shard directory")
+    source_shard = entry.shard
+    if source_shard == target_shard:
+        return 0
+
+    entry.moving = True
+    db.session.commit()
+    # Let every worker's cached placement expire and in-flight requests finish
+    time.sleep(DIRECTORY_TTL + 1 if settle is None else settle)
+
+    tables = _user_tables()
+    try:
+        with get_engine(source_shard).connect() as source, get_engine(target_shard).begin() as target:
+            rows, _ = _load_rows(source, tables, user_id)
+            stale, _ = _load_rows(target, tables, user_id)
+            _delete_rows(target, tables, stale)
+            _release_blobs(target, stale)
+            _copy_rows(source, target, tables, rows)
+
+        entry = db.session.get(ShardUser, user_id)
+        entry.shard = target_shard
+        entry.moving = False
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        entry = db.session.get(ShardUser, user_id)
+        entry.moving = False
+        db.session.commit()
+        raise
+
+    with get_engine(source_shard).begin() as source:
+        _delete_rows(source, tables, rows)
+        _release_blobs(source, rows)
+    with _placements_lock:
+        _placements.pop(user_id, None)
+    invalidate_user(user_id)
+    return sum(len(table_rows) for table_rows in rows.values())
+
+def rebalance(exclude=(), limit=None, dry_run=False, settle=None):
+    """Moves users whose ring placement differs from their directory entry; returns (planned, moved)."""
+    ring = get_ring(exclude)
+    planned = []
+    for entry in db.session.execute(select(ShardUser.user_id, ShardUser.shard).order_by(ShardUser.user_id)):
+        target = ring.shard_for(entry.user_id)
+        if target != entry.shard:
+            planned.append((entry.user_id, entry.shard, target))
+            if limit is not None and len(planned) >= limit:
+                break
+    if dry_run:
+        return planned, 0
+    moved = 0
+    for user_id, source, target in planned:
+        try:
+            rows = move_user(user_id, target, settle=settle)
+        except Exception as e:
+            logging.error(f"Moving user {user_id} from {source} to {target} failed: {e}")
+            continue
+        moved += 1
+        click.echo(f"Moved user {user_id} ({rows} rows) {source} -> {target}")
+    return planned, moved
+
+@click.command('rebalance-shards')
+@click.option('--exclude', multiple=True, help='Shard to drain (leave out of the ring); repeatable.')
+@click.option('--limit', default=None, type=int, help='Maximum number of users to move.')
+@click.option('--dry-run', is_flag=True, help='Only report which users would move.')
+@with_appcontext
+def rebalance_shards_command(exclude, limit, dry_run):
+    """Move users onto the shard the consistent-hash ring assigns them, e.g. after adding a shard."""
+    if not sharding_enabled():
+        click.echo("SHARD_DATABASE_URIS is not set; nothing to rebalance")
+        return
+    start = time.perf_counter()
+    planned, moved = rebalance(exclude=exclude, limit=limit, dry_run=dry_run)
+    if dry_run:
+        for user_id, source, target in planned:
+            click.echo(f"Would move user {user_id}: {source} -> {target}")
+    click.echo(f"Moved {moved} of {len(planned)} misplaced users in {time.perf_counter() - start:.2f}s")
+
+@click.command('move-user')
+@click.argument('user_id', type=int)
+@click.argument('shard')
+@with_appcontext
+def move_user_command(user_id, shard):
+    """Move one user's rows to the named shard (e.g. shard_2)."""
+    if shard not in shard_names():
+        raise click.BadParameter(f"Unknown shard {shard}; configured: {', '.join(shard_names())}")
+    rows = move_user(user_id, shard)
+    click.echo(f"Moved {rows} rows of user {user_id} to {shard}")
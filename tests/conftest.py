@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Read at import by the modules under test, so they are set before anything imports app
+os.environ['RESPONSE_CACHE_DIR'] = tempfile.mkdtemp()
+os.environ['BCRYPT_ROUNDS'] = '4'
+os.environ['BCRYPT_WORKERS'] = '0'
+os.environ.pop('GEMINI_API_KEY', None)
+
+SHARDS = ['shard_0', 'shard_1']
+
+@pytest.fixture
+def sharded_app(tmp_path):
+    """An app on a SQLite directory database with two SQLite shards."""
+    directory_uri = f"sqlite:///{tmp_path / 'directory.db'}"
+    # app.py builds an app at import from this variable
+    os.environ['SQLALCHEMY_DATABASE_URI'] = directory_uri
+    from app import create_app
+    from sharding import _placements
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': directory_uri,
+        'SHARD_DATABASE_URIS': [f"sqlite:///{tmp_path / f'{name}.db'}" for name in SHARDS],
+        'DB_CREATE_ALL': True,
+        'TESTING': True
+    })
+    _placements.clear()
+    yield app
+    _placements.clear()
+
+@pytest.fixture
+def app(tmp_path):
+    """An app on a single SQLite database."""
+    database_uri = f"sqlite:///{tmp_path / 'app.db'}"
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    # Every test's database starts ids at 1, so responses cached by an earlier test must not be served
+    os.environ['RESPONSE_CACHE_DIR'] = str(tmp_path / 'response-cache')
+    from app import create_app
+    from clients import reset_client
+
+    reset_client('response_store')
+    return create_app({'SQLALCHEMY_DATABASE_URI': database_uri, 'DB_CREATE_ALL': True, 'TESTING': True})
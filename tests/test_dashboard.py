@@ -0,0 +1,31 @@
+import json
+
+import health_tips
+from models import db, User, UserProfile, LifestyleInformation, MLModelData
+
+def seed_user(email):
+    user = User(email=email, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([
+        UserProfile(user_id=user.user_id, age=40, gender='Male', height=175, weight=80, annual_income=900000),
+        LifestyleInformation(user_id=user.user_id, smoking_status='Never', alcohol_consumption='Light',
+                             physical_activity='Moderate', stress_level='Low', sleep_hours=7),
+        MLModelData(user_id=user.user_id, BMI=26.1, Systolic_BP=120, Diastolic_BP=80)
+    ])
+    return user.user_id
+
+def test_batch_tips_never_wait_on_the_model(app, monkeypatch):
+    called, scheduled = [], []
+    monkeypatch.setattr(health_tips, 'request_health_tip', lambda *args, **kwargs: called.append(args) or 'Tip')
+    monkeypatch.setattr(health_tips, '_schedule_refresh', lambda user_id, inputs, fingerprint: scheduled.append(user_id))
+    with app.app_context():
+        user_ids = [seed_user('first@example.com'), seed_user('second@example.com')]
+        db.session.commit()
+
+    response = app.test_client().post('/dashboard/batch', json={'user_ids': user_ids, 'include_tips': True})
+
+    entries = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [entry['tip'] for entry in entries] == [health_tips.FALLBACK_TIP] * 2
+    assert scheduled == user_ids
+    assert called == []
@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+from models import (db, User, UserProfile, HealthInformation, LifestyleInformation, MLModelData,
+                    PredictionResults, InsurancePlans, CoverageDetails)
+from plan_renewal import renew_expiring_plans
+
+def seed_user(email, annual_income=900000):
+    user = User(email=email, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([
+        UserProfile(user_id=user.user_id, age=35, annual_income=annual_income),
+        HealthInformation(user_id=user.user_id, medical_history='No major issues'),
+        LifestyleInformation(user_id=user.user_id, smoking_status='Never', alcohol_consumption='None'),
+        MLModelData(user_id=user.user_id, BMI=24.5, Systolic_BP=120, Diastolic_BP=80),
+        PredictionResults(user_id=user.user_id, condition_name='Diabetes', risk_level='Low')
+    ])
+    return user.user_id
+
+def add_plan(user_id, network_type='HMO'):
+    plan = InsurancePlans(user_id=user_id, company='Acme', plan_name='Old plan', network_type=network_type,
+                          expiration_date=date.today() + timedelta(days=5))
+    db.session.add(plan)
+    db.session.flush()
+    return plan.plan_id
+
+def test_renewal_reprices_every_plan_a_user_holds(app):
+    with app.app_context():
+        user_id = seed_user('two-plans@example.com')
+        plan_ids = [add_plan(user_id, 'HMO'), add_plan(user_id, 'PPO')]
+        db.session.commit()
+
+        assert renew_expiring_plans(days=30) == (2, 2)
+        for plan_id, network_type in zip(plan_ids, ('HMO', 'PPO')):
+            plan = db.session.get(InsurancePlans, plan_id)
+            assert plan.plan_name.endswith(f"{network_type} Health Shield")
+            assert plan.expiration_date > date.today() + timedelta(days=300)
+            assert CoverageDetails.query.filter_by(plan_id=plan_id).count() > 0
+
+def test_renewal_skips_users_with_missing_pricing_values(app):
+    with app.app_context():
+        priced = add_plan(seed_user('complete@example.com'))
+        no_income = add_plan(seed_user('no-income@example.com', annual_income=None))
+        no_bmi_user = seed_user('no-bmi@example.com')
+        no_bmi = add_plan(no_bmi_user)
+        # The column default fills in a BMI left as None on insert, so clear it afterwards
+        MLModelData.query.filter_by(user_id=no_bmi_user).update({MLModelData.BMI: None})
+        db.session.commit()
+
+        assert renew_expiring_plans(days=30) == (3, 1)
+        assert db.session.get(InsurancePlans, priced).plan_name != 'Old plan'
+        assert db.session.get(InsurancePlans, no_income).plan_name == 'Old plan'
+        assert db.session.get(InsurancePlans, no_bmi).plan_name == 'Old plan'
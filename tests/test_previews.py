@@ -0,0 +1,15 @@
+import io
+
+from werkzeug.datastructures import FileStorage
+
+import previews
+
+class UnseekableStream(io.BytesIO):
+    def seek(self, *args):
+        raise OSError("stream closed")
+
+def test_failing_to_queue_previews_never_fails_the_upload(app):
+    file = FileStorage(stream=UnseekableStream(b'%PDF-1.4'), filename='scan.pdf', content_type='application/pdf')
+    with app.test_request_context('/upload_prescription', method='POST'):
+        assert previews.schedule_previews('b' * 64, 'sha256/bb/scan', file) is False
+    assert not previews._pending
@@ -0,0 +1,62 @@
+"""Budgets for the number of SQL statements each hot endpoint issues.
+
+Gemini is not called (no API key), so the dashboard serves its fallback tip.
+"""
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from models import (db, User, UserProfile, HealthInformation, LifestyleInformation, MLModelData,
+                    PredictionResults)
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        user = User(email='queries@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([
+            UserProfile(user_id=user.user_id, full_name='Query Count', DOB=date(1980, 1, 1), age=45, gender='Female',
+                        height=165, weight=60, annual_income=1200000),
+            HealthInformation(user_id=user.user_id, medical_history='No major issues', allergies='', family_medical_history='', current_medications=''),
+            LifestyleInformation(user_id=user.user_id, smoking_status='Never', alcohol_consumption='Light', physical_activity='Moderate',
+                                 stress_level='Low', sleep_hours=7, family_history_CVD=False, family_history_diabetes=False, family_history_cancer=False),
+            MLModelData(user_id=user.user_id, Age=45, Gender='Female', BMI=22.0, Systolic_BP=118, Diastolic_BP=76),
+        ])
+        for condition, level in (('Heart_Disease_Risk', 'Low'), ('Diabetes', 'Medium'), ('Cancer_Risk', 'Low')):
+            db.session.add(PredictionResults(user_id=user.user_id, condition_name=condition, probability=0.2, risk_level=level))
+        db.session.commit()
+        return app.test_client(), db.engine, user.user_id
+
+def queries_for(seeded, path):
+    client, engine, user_id = seeded
+    with count_queries(engine) as statements:
+        response = client.get(path.format(user_id=user_id))
+    assert response.status_code == 200
+    return len(statements)
+
+def test_dashboard_query_budget(seeded):
+    assert queries_for(seeded, '/dashboard/{user_id}') <= 4
+
+def test_quotes_query_budget(seeded):
+    assert queries_for(seeded, '/insurance/quotes/{user_id}') <= 1
+
+def test_generate_plan_query_budget(seeded):
+    assert queries_for(seeded, '/insurance/generate_plan/{user_id}') <= 8
+    # Unchanged inputs serve the stored plan
+    assert queries_for(seeded, '/insurance/generate_plan/{user_id}') <= 6
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from response_cache import FileResponseStore, cache_user_key, invalidate_user, get_response_store
+
+@pytest.mark.parametrize('user_id', ['../../victim/sub', '1/../2', '', ' ', 'abc', True])
+def test_cache_user_key_rejects_non_integers(user_id):
+    with pytest.raises(ValueError):
+        cache_user_key(user_id)
+
+def test_cache_user_key_normalises_integers():
+    assert cache_user_key(7) == '7'
+    assert cache_user_key('007') == '7'
+
+def test_file_store_refuses_paths_outside_its_root(tmp_path):
+    store = FileResponseStore(str(tmp_path / 'cache'))
+    with pytest.raises(ValueError):
+        store.bump('../../victim')
+    assert not (tmp_path / 'victim').exists()
+
+def test_invalidate_user_ignores_traversal(tmp_path):
+    victim = tmp_path / 'victim' / 'sub'
+    victim.mkdir(parents=True)
+    root = get_response_store().root
+    invalidate_user(os.path.relpath(victim, os.path.join(root, 'versions')))
+    assert victim.exists()
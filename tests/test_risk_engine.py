@@ -0,0 +1,50 @@
+import pytest
+import yaml
+
+import risk_engine
+from clients import reset_client
+from models import db, User, MLModelData, PredictionResults
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(email='risk@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(MLModelData(user_id=user.user_id, Age=60, BMI=31.0, Systolic_BP=150, Diastolic_BP=95))
+        db.session.commit()
+        return user.user_id
+
+@pytest.fixture
+def use_model(monkeypatch):
+    def configure(path):
+        monkeypatch.setattr(risk_engine, 'RISK_MODEL_PATH', path)
+        reset_client('risk_model')
+    yield configure
+    reset_client('risk_model')
+
+def write_model(path):
+    path.write_text(yaml.safe_dump({
+        'thresholds': {'Medium': 0.3, 'High': 0.6},
+        'features': {'age': [45, 15], 'bmi': [25, 4], 'systolic_bp': [125, 15]},
+        'conditions': {
+            'Heart_Disease_Risk': {'intercept': -1.0, 'weights': {'age': 0.7, 'systolic_bp': 0.5}},
+            'Diabetes': {'intercept': -2.0, 'weights': {'bmi': 0.6}}
+        }
+    }))
+    return str(path)
+
+def test_without_a_model_nothing_is_scored(app, user_id, use_model):
+    use_model(None)
+    with app.app_context():
+        assert risk_engine.score_user(user_id) == 0
+        assert PredictionResults.query.count() == 0
+
+def test_scores_with_the_configured_artifact(app, user_id, use_model, tmp_path):
+    use_model(write_model(tmp_path / 'risk_model.yml'))
+    with app.app_context():
+        assert risk_engine.score_user(user_id) == 1
+        levels = {row.condition_name: row.risk_level for row in PredictionResults.query.filter_by(user_id=user_id)}
+        assert levels == {'Heart_Disease_Risk': 'High', 'Diabetes': 'Low'}
+        # Unchanged inputs and model are not rescored
+        assert risk_engine.score_user(user_id) == 0
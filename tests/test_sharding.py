@@ -0,0 +1,191 @@
+from datetime import date, datetime
+
+from flask import g
+from sqlalchemy import func, select
+
+from conftest import SHARDS
+from models import (db, User, UserProfile, ShardUser, Prescription, StoredBlob, InsurancePlans,
+                    CoverageDetails, HealthTip)
+from sharding import HashRing, move_user, route_request_to_shard, use_shard
+
+def register(client, email):
+    response = client.post('/register', json={'email': email, 'password': 'secret'})
+    assert response.status_code == 201
+    return response.get_json()['UserID']
+
+def placement(user_id):
+    return db.session.get(ShardUser, user_id).shard
+
+def other_shard(shard):
+    return next(name for name in SHARDS if name != shard)
+
+def count_on(shard, model, **filters):
+    use_shard(shard)
+    return db.session.scalar(select(func.count()).select_from(model).filter_by(**filters))
+
+def test_ring_is_stable_and_moves_few_users():
+    before = HashRing(['shard_0', 'shard_1', 'shard_2'])
+    after = HashRing(['shard_0', 'shard_1', 'shard_2', 'shard_3'])
+    assert all(before.shard_for(user_id) == HashRing(['shard_0', 'shard_1', 'shard_2']).shard_for(user_id) for user_id in range(100))
+    moved = [user_id for user_id in range(1, 2001) if before.shard_for(user_id) != after.shard_for(user_id)]
+    # Only users placed on the new shard move
+    assert all(after.shard_for(user_id) == 'shard_3' for user_id in moved)
+    assert 0.1 < len(moved) / 2000 < 0.4
+
+def test_register_writes_user_to_its_shard_only(sharded_app):
+    user_id = register(sharded_app.test_client(), 'placed@example.com')
+    with sharded_app.app_context():
+        shard = placement(user_id)
+        assert count_on(shard, User, user_id=user_id) == 1
+        assert count_on(other_shard(shard), User, user_id=user_id) == 0
+
+def test_requests_are_routed_to_the_users_shard(sharded_app):
+    user_id = register(sharded_app.test_client(), 'routed@example.com')
+    with sharded_app.app_context():
+        shard = placement(user_id)
+    with sharded_app.test_request_context(f'/user-details-status/{user_id}'):
+        assert route_request_to_shard() is None
+        assert g.shard == shard
+        assert db.session.get_bind(mapper=User.__mapper__) is db.engines[shard]
+
+def test_directory_queries_stay_on_the_primary(sharded_app):
+    with sharded_app.app_context():
+        use_shard('shard_1')
+        assert db.session.get_bind(mapper=ShardUser.__mapper__) is db.engine
+        assert db.session.get_bind(clause=select(ShardUser.user_id)) is db.engine
+        assert db.session.get_bind(mapper=User.__mapper__) is db.engines['shard_1']
+
+def test_moving_user_gets_503_with_retry_after(sharded_app):
+    client = sharded_app.test_client()
+    user_id = register(client, 'moving@example.com')
+    with sharded_app.app_context():
+        db.session.get(ShardUser, user_id).moving = True
+        db.session.commit()
+    response = client.get(f'/user-details-status/{user_id}')
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+
+def seed_user_rows(shard, user_id, digest):
+    use_shard(shard)
+    db.session.add(UserProfile(user_id=user_id, full_name='Moved User', DOB=date(1990, 1, 1), age=35,
+                               gender='Female', height=160, weight=55, annual_income=900000))
+    db.session.add(StoredBlob(content_hash=digest, blob_name=f'{digest}.pdf', size=10, ref_count=1, created_at=datetime.utcnow()))
+    db.session.add(Prescription(user_id=user_id, clinic_name='City Clinic', filename='scan.pdf', description='Follow-up',
+                                date=date(2024, 1, 1), file_link=f'{digest}.pdf', content_hash=digest))
+    plan = InsurancePlans(user_id=user_id, company='Acme', plan_name='Gold PPO Health Shield')
+    db.session.add(plan)
+    db.session.flush()
+    db.session.add_all([CoverageDetails(plan_id=plan.plan_id, coverage_item=item) for item in ('Hospitalization', 'Day care')])
+    db.session.commit()
+
+def test_move_user_moves_rows_remaps_ids_and_flips_directory(sharded_app):
+    client = sharded_app.test_client()
+    user_id = register(client, 'mover@example.com')
+    neighbour_id = register(client, 'neighbour@example.com')
+    digest = 'a' * 64
+    with sharded_app.app_context():
+        source = placement(user_id)
+        target = other_shard(source)
+        seed_user_rows(source, user_id, digest)
+        # A plan already on the target takes the ids the moved plan had on its source
+        use_shard(target)
+        db.session.add(InsurancePlans(user_id=neighbour_id, company='Acme', plan_name='Bronze HMO Health Shield'))
+        db.session.commit()
+        use_shard(None)
+
+        moved = move_user(user_id, target, settle=0)
+
+        assert moved == 6
+        assert placement(user_id) == target
+        assert not db.session.get(ShardUser, user_id).moving
+        for model in (User, UserProfile, Prescription, InsurancePlans):
+            assert count_on(source, model, user_id=user_id) == 0
+            assert count_on(target, model, user_id=user_id) == 1
+        use_shard(target)
+        plan_id = db.session.scalar(select(InsurancePlans.plan_id).filter_by(user_id=user_id))
+        assert count_on(target, CoverageDetails, plan_id=plan_id) == 2
+        assert db.session.get(StoredBlob, digest).ref_count == 1
+        use_shard(source)
+        assert count_on(source, CoverageDetails) == 0
+        assert db.session.get(StoredBlob, digest).ref_count == 0
+
+    response = client.get(f'/user-details-status/{user_id}')
+    assert response.status_code == 200
+
+def test_move_user_to_its_own_shard_is_a_no_op(sharded_app):
+    user_id = register(sharded_app.test_client(), 'stay@example.com')
+    with sharded_app.app_context():
+        assert move_user(user_id, placement(user_id), settle=0) == 0
+
+def test_storage_metrics_sum_dedup_savings_over_every_shard(sharded_app):
+    with sharded_app.app_context():
+        for shard, references in zip(SHARDS, (3, 2)):
+            use_shard(shard)
+            db.session.add(StoredBlob(content_hash=shard[-1] * 64, blob_name=shard, size=10,
+                                      ref_count=references, created_at=datetime.utcnow()))
+            db.session.commit()
+        use_shard(None)
+
+    dedup = sharded_app.test_client().get('/storage/metrics').get_json()['dedup']
+    assert dedup == {'blobs': 2, 'references': 5, 'stored_bytes': 20, 'referenced_bytes': 50, 'saved_bytes': 30}
+
+def test_background_tip_refresh_writes_to_the_users_shard(sharded_app, monkeypatch):
+    import health_tips
+
+    user_id = register(sharded_app.test_client(), 'tips@example.com')
+    monkeypatch.setattr(health_tips, 'request_health_tip', lambda inputs: 'Walk after dinner.')
+    with sharded_app.app_context():
+        shard = placement(user_id)
+    health_tips._refreshing.add(user_id)
+    health_tips._refresh_in_background(sharded_app, shard, user_id, {}, 'f' * 64)
+
+    with sharded_app.app_context():
+        use_shard(shard)
+        assert db.session.get(HealthTip, user_id).tip == 'Walk after dinner.'
+        assert count_on(other_shard(shard), HealthTip) == 0
+    assert user_id not in health_tips._refreshing
+
+def test_cohort_refresh_reads_every_shard_with_its_own_watermark(sharded_app, monkeypatch, tmp_path):
+    import cohort_store
+    from models import MLModelData
+
+    monkeypatch.setattr(cohort_store, 'COHORT_STORE_DIR', str(tmp_path / 'cohort'))
+    monkeypatch.setattr(cohort_store, '_snapshot', None)
+    client = sharded_app.test_client()
+    user_ids = [register(client, f'cohort{index}@example.com') for index in range(8)]
+    with sharded_app.app_context():
+        for user_id in user_ids:
+            use_shard(placement(user_id))
+            db.session.add(MLModelData(user_id=user_id, Age=40, Gender='Female', BMI=22.0))
+            db.session.commit()
+        use_shard(None)
+        shards = {placement(user_id) for user_id in user_ids}
+        assert shards == set(SHARDS)
+
+        assert cohort_store.refresh_cohort_store() == len(user_ids)
+        snapshot = cohort_store.get_cohort_snapshot()
+        assert sorted(snapshot.columns['user_id']) == sorted(user_ids)
+        assert set(snapshot.watermarks) == shards
+
+        # A newer row on one shard replaces that user's entry; nothing else is re-read
+        use_shard(placement(user_ids[0]))
+        db.session.add(MLModelData(user_id=user_ids[0], Age=41, Gender='Female', BMI=30.0))
+        db.session.commit()
+        use_shard(None)
+        assert cohort_store.refresh_cohort_store() == 1
+        snapshot = cohort_store.get_cohort_snapshot()
+        assert len(snapshot) == len(user_ids)
+        assert int(snapshot.columns['age'][snapshot.row_for_user(user_ids[0])]) == 41
+
+def test_chatbot_sql_runs_on_the_users_shard(sharded_app, monkeypatch):
+    import clients
+    from database import get_engine
+
+    monkeypatch.setattr(clients, '_build_sql_database', lambda pool: pool)
+    clients.reset_client()
+    with sharded_app.app_context():
+        for shard in SHARDS:
+            assert get_engine(f'llm_{shard}').url == get_engine(shard).url
+            assert clients.get_sql_database(shard) == f'llm_{shard}'
+        assert clients.get_sql_database() == 'llm'
+    clients.reset_client()
@@ -0,0 +1,30 @@
+import pytest
+
+from models import db, User
+
+PROFILE = {'full_name': 'Sam Doe', 'dob': '1990-01-01', 'age': 35, 'gender': 'Female', 'phone_number': '555',
+           'district': 'Central', 'state': 'Delhi', 'occupation': 'Engineer', 'annual_income': 900000,
+           'height': 160, 'weight': 55}
+HEALTH = {'medical_history': 'No major issues', 'allergies': '', 'family_medical_history': '', 'current_medications': ''}
+LIFESTYLE = {'smoking_status': 'Never', 'alcohol_consumption': 'Light', 'physical_activity': 'Moderate',
+             'family_history_CVD': False, 'family_history_diabetes': False, 'family_history_cancer': False,
+             'stress_level': 'Low', 'sleep_hours': 7}
+
+@pytest.mark.parametrize('path, data, label', [
+    ('/user-profile', PROFILE, 'User profile'),
+    ('/health-information', HEALTH, 'Health information'),
+    ('/lifestyle-information', LIFESTYLE, 'Lifestyle information'),
+])
+def test_saving_a_section_says_whether_it_was_added_or_updated(app, path, data, label):
+    with app.app_context():
+        user = User(email='sections@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.user_id
+    client = app.test_client()
+
+    first = client.post(path, json={'user_id': user_id, **data})
+    second = client.post(path, json={'user_id': user_id, **data})
+
+    assert (first.status_code, first.get_json()['message']) == (201, f'{label} added successfully')
+    assert (second.status_code, second.get_json()['message']) == (201, f'{label} updated successfully')
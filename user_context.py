@@ -0,0 +1,68 @@
+from flask import g, has_app_context
+from sqlalchemy import and_, func
+from models import db, User, UserProfile, HealthInformation, LifestyleInformation, MLModelData, PredictionResults
+
+class UserContext:
+    """Everything the hot endpoints read about one user, loaded in a single round trip."""
+
+    __slots__ = ('user_id', 'user', 'profile', 'health', 'lifestyle', 'ml_data', 'predictions')
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.user = None
+        self.profile = None
+        self.health = None
+        self.lifestyle = None
+        self.ml_data = None
+        self.predictions = []
+
+    def has(self, *parts):
+        """True if every named part is present, e.g. ctx.has('profile', 'lifestyle')."""
+        return all(getattr(self, part) for part in parts)
+
+def _fetch_user_context(user_id):
+    # Only the newest MLModelData row; every OCR report adds one
+    latest_ml = db.session.query(func.max(MLModelData.model_data_id)).filter(
+        MLModelData.user_id == user_id
+    ).scalar_subquery()
+    rows = db.session.query(
+        User, UserProfile, HealthInformation, LifestyleInformation, MLModelData, PredictionResults
+    ).outerjoin(
+        UserProfile, UserProfile.user_id == User.user_id
+    ).outerjoin(
+        HealthInformation, HealthInformation.user_id == User.user_id
+    ).outerjoin(
+        LifestyleInformation, LifestyleInformation.user_id == User.user_id
+    ).outerjoin(
+        MLModelData, and_(MLModelData.user_id == User.user_id, MLModelData.model_data_id == latest_ml)
+    ).outerjoin(
+        PredictionResults, PredictionResults.user_id == User.user_id
+    ).filter(User.user_id == user_id).all()
+
+    context = UserContext(user_id)
+    for user, profile, health, lifestyle, ml_data, prediction in rows:
+        context.user = context.user or user
+        context.profile = context.profile or profile
+        context.health = context.health or health
+        context.lifestyle = context.lifestyle or lifestyle
+        context.ml_data = context.ml_data or ml_data
+        # The identity map hands back the same object for repeated rows
+        if prediction is not None and all(prediction is not seen for seen in context.predictions):
+            context.predictions.append(prediction)
+    return context
+
+def load_user_context(user_id):
+    """Returns the user's context, cached for the rest of the current request."""
+    user_id = int(user_id)
+    if not has_app_context():
+        return _fetch_user_context(user_id)
+    cache = g.setdefault('user_contexts', {})
+    context = cache.get(user_id)
+    if context is None:
+        context = cache[user_id] = _fetch_user_context(user_id)
+    return context
+
+def forget_user_context(user_id):
+    """Drops the request-scoped copy after a write so later reads see fresh data."""
+    if has_app_context():
+        g.setdefault('user_contexts', {}).pop(int(user_id), None)
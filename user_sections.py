@@ -0,0 +1,56 @@
+from datetime import datetime
+from models import db, UserProfile, HealthInformation, LifestyleInformation
+from database import upsert
+
+# Row values of the profile, health and lifestyle sections, shared by their routes and onboarding
+
+def user_profile_values(user_id, data):
+    # Convert DOB
+    dob = data.get('dob')
+    dob_converted = datetime.strptime(dob, "%Y-%m-%d").date()
+    return {
+        'user_id': user_id,
+        'full_name': data['full_name'],
+        'DOB': dob_converted,
+        'age': data['age'],
+        'gender': data['gender'],
+        'phone_number': data['phone_number'],
+        'district': data['district'],
+        'state': data['state'],
+        'occupation': data['occupation'],
+        'annual_income': data['annual_income'],
+        'height': data['height'],
+        'weight': data['weight']
+    }
+
+def health_information_values(user_id, data):
+    return {
+        'user_id': user_id,
+        'medical_history': data['medical_history'],
+        'allergies': data['allergies'],
+        'family_medical_history': data['family_medical_history'],
+        'current_medications': data['current_medications']
+    }
+
+def lifestyle_information_values(user_id, data):
+    return {
+        'user_id': user_id,
+        'smoking_status': data['smoking_status'],
+        'alcohol_consumption': data['alcohol_consumption'],
+        'physical_activity': data['physical_activity'],
+        'family_history_CVD': data['family_history_CVD'],
+        'family_history_diabetes': data['family_history_diabetes'],
+        'family_history_cancer': data['family_history_cancer'],
+        'stress_level': data['stress_level'],
+        'sleep_hours': data['sleep_hours']
+    }
+
+def save_section(model, values, label):
+    """Upserts one of the user's section rows; does not commit.
+
+    Returns the message the routes have always sent: "<label> added successfully" for a new row,
+    "<label> updated successfully" for an existing one.
+    """
+    existed = db.session.query(model.query.filter_by(user_id=values['user_id']).exists()).scalar()
+    upsert(model, values, ['user_id'])
+    return f"{label} {'updated' if existed else 'added'} successfully"
@@ -1,49 +1,10 @@
-import bcrypt
-import os
 import re
 import json
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
-from datetime import datetime, timedelta
-import urllib
 import dotenv
+from passwords import hash_password, check_password
 
 dotenv.load_dotenv()
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-
-def check_password(hashed_password, password):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-def upload_file_and_get_url(file):
-    connection_str = os.getenv("AZURE_CONNECTION_STR")
-    container_name = 'storage-container'
-    blob_service_client = BlobServiceClient.from_connection_string(conn_str=connection_str)
-    
-    try:
-        filename = file.filename
-        encoded_filename = urllib.parse.quote(filename)
-        container_client = blob_service_client.get_container_client(container=container_name)
-
-        container_client.upload_blob(name=filename, data=file, overwrite=True)
-        start_time = datetime.utcnow()
-        expiry_time = start_time + timedelta(hours=1)
-        sas_token = generate_blob_sas(
-            account_name=blob_service_client.account_name,
-            container_name=container_name,
-            blob_name=filename,
-            account_key=blob_service_client.credential.account_key,
-            permission=BlobSasPermissions(read=True),
-            expiry=expiry_time,
-            start=start_time
-        )
-
-        blob_url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{container_name}/{encoded_filename}?{sas_token}"
-        return blob_url
-    except Exception as e:
-        print(f"Error uploading file: {e}")
-        raise
-
 def safe_float(value, default=None):
     try:
         return float(value) if value is not None else default